@@ -0,0 +1,309 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Benchmarks for the construction, serialization and export of
+    provenance graphs on synthetic graphs of configurable size and fan-out
+
+usage:
+    python benchmarks/benchmark.py --sizes 1000 100000 1000000 --output results.json
+    python benchmarks/benchmark.py --compare baseline.json results.json
+"""
+
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from provo.columnargraph import ColumnarProvOntologyGraph  # noqa: E402
+from provo.provontologygraph import ProvOntologyGraph  # noqa: E402
+from provo.sqlitegraph import SQLiteProvOntologyGraph  # noqa: E402
+
+# formats that are streamed into the file (as long as no rdflib graph was built)
+STREAMED_FORMATS = ["nt", "nquads"]
+# formats that are serialized by rdflib ("trix" requires a context-aware graph)
+RDFLIB_FORMATS = ["turtle", "xml", "pretty-xml", "n3", "trig", "json-ld", "hext"]
+OPERATIONS = ["add_nodes", "add_relations", "str", "mermaid",
+              "serialize_streamed", "get_rdflib_graph", "serialize"]
+GRAPHS = {
+    "objects": lambda file_name: ProvOntologyGraph(namespace_abbreviation="ex"),
+    "columnar": lambda file_name: ColumnarProvOntologyGraph(namespace_abbreviation="ex"),
+    "sqlite": lambda file_name: SQLiteProvOntologyGraph(file_name, namespace_abbreviation="ex"),
+}
+# kinds of nodes in the plan
+ENTITY, ACTIVITY, AGENT = 0, 1, 2
+
+
+@dataclass
+class GraphPlan:
+    """a synthetic provenance graph: the nodes (ids per kind) and the relations
+    (relation, kind and index of the source, kind and index of the target)"""
+
+    entities: list[str] = field(default_factory=list)
+    activities: list[str] = field(default_factory=list)
+    agents: list[str] = field(default_factory=list)
+    relations: list[tuple[str, int, int, int, int]] = field(default_factory=list)
+
+
+def generate_plan(nodes: int, fan_out: int = 2, seed: int = 0) -> GraphPlan:
+    """generates a workflow like graph of (about) the number of nodes: every
+    activity uses up to fan_out earlier entities and is associated with an
+    agent, every entity is generated by the last activity, derived from up to
+    fan_out earlier entities and attributed to an agent. two thirds of the
+    nodes are entities, one percent are agents."""
+
+    generator = random.Random(seed)
+    plan = GraphPlan()
+    plan.agents = [f"agent_{i}" for i in range(max(1, nodes // 100))]
+    agent_count = len(plan.agents)
+    remaining = nodes - agent_count
+    plan.activities = [f"activity_{i}" for i in range(max(1, remaining // 3))]
+    plan.entities = [f"entity_{i}" for i in range(max(1, remaining - len(plan.activities)))]
+    entities_per_activity = len(plan.entities) / len(plan.activities)
+
+    relations = plan.relations
+    for activity in range(len(plan.activities)):
+        first_entity = int(activity * entities_per_activity)
+        for entity in {generator.randrange(first_entity) for _ in range(fan_out)} if first_entity else ():
+            relations.append(("used", ACTIVITY, activity, ENTITY, entity))
+        relations.append(("was_associated_with", ACTIVITY, activity,
+                          AGENT, generator.randrange(agent_count)))
+        if activity:
+            relations.append(("was_informed_by", ACTIVITY, activity, ACTIVITY, activity - 1))
+        for entity in range(first_entity, int((activity + 1) * entities_per_activity)):
+            relations.append(("was_generated_by", ENTITY, entity, ACTIVITY, activity))
+            relations.append(("was_attributed_to", ENTITY, entity,
+                              AGENT, generator.randrange(agent_count)))
+            for source in {generator.randrange(first_entity) for _ in range(fan_out)} if first_entity else ():
+                relations.append(("was_derived_from", ENTITY, entity, ENTITY, source))
+    for agent in range(1, agent_count):
+        relations.append(("acted_on_behalf_of", AGENT, agent, AGENT, 0))
+    return plan
+
+
+@dataclass
+class Result:
+    graph: str
+    nodes: int
+    fan_out: int
+    operation: str
+    format: str
+    seconds: float
+    peak_bytes: Optional[int] = None
+    retained_bytes: Optional[int] = None
+
+
+def add_nodes(graph, plan: GraphPlan) -> list[list]:
+    """adds the nodes of the plan, returns them per kind"""
+
+    return [
+        [graph.add_entity(id=id, label=id) for id in plan.entities],
+        [graph.add_activity(id=id, label=id) for id in plan.activities],
+        [graph.add_agent(id=id, label=id) for id in plan.agents],
+    ]
+
+
+def add_relations(nodes: list[list], plan: GraphPlan) -> None:
+    """adds the relations (and start and end times of the activities) of the plan"""
+
+    start = datetime(2023, 1, 1)
+    for index, activity in enumerate(nodes[ACTIVITY]):
+        activity.started_at_time(start + timedelta(seconds=index))
+        activity.ended_at_time(start + timedelta(seconds=index + 1))
+    for relation, source_kind, source, target_kind, target in plan.relations:
+        getattr(nodes[source_kind][source], relation)(nodes[target_kind][target])
+
+
+def measure(function: Callable, trace_memory: bool) -> tuple[float, Optional[int], Optional[int], object]:
+    """runs the function, returns the duration, the peak and the retained
+    memory (if traced) and the return value"""
+
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - start
+    if not trace_memory:
+        return seconds, None, None, value
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak - before, current - before, value
+
+
+def run_once(graph_name: str, plan: GraphPlan, operations: list[str], formats: list[str],
+             directory: str, trace_memory: bool) -> list[tuple[str, str, float, Optional[int], Optional[int]]]:
+    """builds the graph of the plan and runs the operations on it in a fixed
+    order (streamed serializations run before the rdflib graph is built)"""
+
+    measurements = []
+
+    def step(operation: str, export_format: str, function: Callable):
+        seconds, peak, retained, value = measure(function, trace_memory)
+        measurements.append((operation, export_format, seconds, peak, retained))
+        return value
+
+    graph = GRAPHS[graph_name](os.path.join(directory, f"{graph_name}.sqlite"))
+    nodes = step("add_nodes", "", lambda: add_nodes(graph, plan))
+    step("add_relations", "", lambda: add_relations(nodes, plan))
+    if "str" in operations:
+        step("str", "", lambda: str(graph))
+    if "mermaid" in operations and hasattr(graph, "export_as_mermaid_flowchart") \
+            and graph_name != "sqlite":
+        step("mermaid", "", lambda: graph.export_as_mermaid_flowchart(
+            os.path.join(directory, "flowchart.md")))
+    if "serialize_streamed" in operations:
+        for export_format in STREAMED_FORMATS:
+            if export_format in formats:
+                step("serialize_as_rdf", export_format, lambda: graph.serialize_as_rdf(
+                    os.path.join(directory, f"graph.{export_format}"), export_format=export_format))
+    if "get_rdflib_graph" in operations:
+        step("get_rdflib_graph", "", graph.get_rdflib_graph)
+    if "serialize" in operations:
+        for export_format in formats:
+            if export_format in STREAMED_FORMATS:
+                continue
+            try:
+                step("serialize_as_rdf", export_format, lambda: graph.serialize_as_rdf(
+                    os.path.join(directory, f"graph.{export_format}"), export_format=export_format))
+            except Exception as error:
+                # e.g., an optional dependency of an rdflib serializer is missing
+                tracemalloc.stop()
+                print(f"skipped serialize_as_rdf ({export_format}): {error!r}", file=sys.stderr)
+    if graph_name == "sqlite":
+        graph.close()
+    del nodes, graph
+    return measurements
+
+
+def run(graph_names: list[str], sizes: list[int], fan_out: int, operations: list[str],
+        formats: list[str], repeat: int, trace_memory: bool, seed: int = 0) -> list[Result]:
+    """runs the benchmarks, the time of a measurement is the minimum of the repetitions,
+    the memory is measured in an additional run with tracemalloc"""
+
+    results = []
+    for nodes in sizes:
+        plan = generate_plan(nodes, fan_out, seed)
+        for graph_name in graph_names:
+            seconds: dict[tuple[str, str], float] = {}
+            memory: dict[tuple[str, str], tuple] = {}
+            for _ in range(repeat):
+                with tempfile.TemporaryDirectory() as directory:
+                    for operation, export_format, duration, _, _ in run_once(
+                            graph_name, plan, operations, formats, directory, False):
+                        key = (operation, export_format)
+                        seconds[key] = min(seconds.get(key, duration), duration)
+            if trace_memory:
+                with tempfile.TemporaryDirectory() as directory:
+                    for operation, export_format, _, peak, retained in run_once(
+                            graph_name, plan, operations, formats, directory, True):
+                        memory[(operation, export_format)] = (peak, retained)
+            for (operation, export_format), duration in seconds.items():
+                peak, retained = memory.get((operation, export_format), (None, None))
+                result = Result(graph_name, nodes, fan_out, operation, export_format,
+                                duration, peak, retained)
+                print(format_result(result), file=sys.stderr)
+                results.append(result)
+    return results
+
+
+def format_result(result: Result) -> str:
+    operation = f"{result.operation} ({result.format})" if result.format else result.operation
+    memory = "" if result.peak_bytes is None else \
+        f"  peak {result.peak_bytes / 2**20:9.1f} MiB  retained {result.retained_bytes / 2**20:9.1f} MiB"
+    return f"{result.graph:9} {result.nodes:>9} nodes  {operation:32} {result.seconds:10.4f} s{memory}"
+
+
+def environment() -> dict:
+    """describes the machine and the revision the benchmarks ran on"""
+
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ""
+    return {
+        "revision": revision,
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(baseline_file: str, results_file: str, threshold: float) -> int:
+    """prints the ratios of the durations (results / baseline), returns
+    the number of measurements that are slower than the threshold"""
+
+    def load(file_name: str) -> dict:
+        with open(file_name, encoding="utf-8") as f:
+            return {(r["graph"], r["nodes"], r["fan_out"], r["operation"], r["format"]): r
+                    for r in json.load(f)["results"]}
+
+    baseline, results = load(baseline_file), load(results_file)
+    regressions = 0
+    for key in sorted(baseline.keys() & results.keys()):
+        ratio = results[key]["seconds"] / max(baseline[key]["seconds"], 1e-9)
+        regressed = ratio > threshold
+        regressions += regressed
+        graph, nodes, _, operation, export_format = key
+        operation = f"{operation} ({export_format})" if export_format else operation
+        print(f"{graph:9} {nodes:>9} nodes  {operation:32} "
+              f"{baseline[key]['seconds']:10.4f} s -> {results[key]['seconds']:10.4f} s "
+              f"({ratio:5.2f}x){'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(arguments: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("@summary")[1].split("usage:")[0].strip())
+    parser.add_argument("--graphs", nargs="+", choices=list(GRAPHS), default=["objects"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 100000],
+                        help="numbers of nodes of the synthetic graphs (e.g., 1000 100000 1000000)")
+    parser.add_argument("--fan-out", type=int, default=2,
+                        help="maximum number of used/derived entities per activity/entity")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS,
+                        help="add_nodes and add_relations are always measured")
+    parser.add_argument("--formats", nargs="+", choices=STREAMED_FORMATS + RDFLIB_FORMATS,
+                        default=STREAMED_FORMATS + RDFLIB_FORMATS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the (slower) memory run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file for the results as JSON (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULTS"),
+                        help="compares two result files instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="ratio of the durations above which --compare reports a regression")
+    options = parser.parse_args(arguments)
+
+    if options.compare:
+        return 1 if compare(*options.compare, options.threshold) else 0
+
+    results = run(options.graphs, options.sizes, options.fan_out, options.operations,
+                  options.formats, options.repeat, not options.no_memory, options.seed)
+    report = {"environment": environment(), "results": [asdict(result) for result in results]}
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Measures how much the graph wide lock of a thread safe
+    ProvOntologyGraph costs when several threads record provenance
+
+usage:
+    python benchmarks/contention.py --threads 1 2 4 8 --nodes 20000
+"""
+
+
+import argparse
+import os
+import sys
+import sysconfig
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from provo.provontologygraph import ProvOntologyGraph  # noqa: E402
+
+
+class TimedLock:
+    """wraps the lock of the graph and sums up the time spent waiting for it"""
+
+    def __init__(self, lock) -> None:
+        self._lock = lock
+        self.waited = 0.0
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        self.waited += time.perf_counter() - start
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._lock.release()
+
+
+def record(graph: ProvOntologyGraph, worker: int, nodes: int) -> None:
+    """the workload of a thread: entities generated by and attributed to shared nodes"""
+
+    activity = graph.add_activity(label=f"job {worker}")
+    agent = graph.add_agent(label=f"worker {worker}")
+    for i in range(nodes):
+        entity = graph.add_entity(label=f"entity {worker}-{i}")
+        entity.was_generated_by(activity)
+        entity.was_attributed_to(agent)
+
+
+def timed_lock(graph: ProvOntologyGraph) -> TimedLock:
+    lock = TimedLock(graph._lock)
+    graph._lock = lock  # type: ignore
+    graph._relation_hook.lock = lock
+    return lock
+
+
+def shared_graph(threads: int, nodes: int) -> tuple[float, Optional[float]]:
+    """all threads record into one thread safe graph (the graph wide lock)"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", thread_safe=True)
+    lock = timed_lock(graph)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(record, [graph] * threads, range(threads), [nodes // threads] * threads))
+    return time.perf_counter() - start, lock.waited
+
+
+def separate_graphs(threads: int, nodes: int, merge: bool = False) -> tuple[float, Optional[float]]:
+    """every thread records into its own graph without a lock (the upper bound
+    of per thread staging or striped locks), optionally the graphs are merged"""
+
+    graphs = [ProvOntologyGraph(namespace_abbreviation="ex") for _ in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(record, graphs, range(threads), [nodes // threads] * threads))
+    if merge:
+        ProvOntologyGraph.from_shards(graphs)
+    return time.perf_counter() - start, None
+
+
+def unlocked_graph(threads: int, nodes: int) -> tuple[float, Optional[float]]:
+    """a single thread records into a graph that is not thread safe (reference)"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    start = time.perf_counter()
+    for worker in range(threads):
+        record(graph, worker, nodes // threads)
+    return time.perf_counter() - start, None
+
+
+SETUPS: dict[str, Callable[[int, int], tuple[float, Optional[float]]]] = {
+    "sequential, no lock": unlocked_graph,
+    "shared graph, graph wide lock": shared_graph,
+    "graph per thread, no lock": separate_graphs,
+    "graph per thread + merge": lambda threads, nodes: separate_graphs(threads, nodes, merge=True),
+}
+
+
+def main(arguments: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--nodes", type=int, default=20000, help="entities recorded in total")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(arguments)
+
+    gil = "disabled" if sysconfig.get_config_var("Py_GIL_DISABLED") else "enabled"
+    print(f"python {sys.version.split()[0]}, GIL {gil}, {args.nodes} entities")
+    print(f"{'threads':>7}  {'setup':<30}  {'seconds':>8}  {'entities/s':>10}  {'lock wait':>9}")
+    for threads in args.threads:
+        for name, setup in SETUPS.items():
+            seconds, waited = min((setup(threads, args.nodes) for _ in range(args.repeat)),
+                                  key=lambda result: result[0])
+            wait = "" if waited is None else f"{waited / threads / seconds:.0%}"
+            print(f"{threads:>7}  {name:<30}  {seconds:>8.3f}  {args.nodes / seconds:>10.0f}  {wait:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
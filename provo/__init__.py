@@ -1 +1,6 @@
+import logging
+
 from provo.provontologygraph import ProvOntologyGraph
+
+# provo logs on DEBUG level only, the application decides where the records go
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,266 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Recorder that collects provenance events inside an asyncio event loop
+    and adds them to a ProvOntologyGraph in batches on a background executor
+"""
+
+
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, TextIO, Union
+from uuid import uuid4
+
+from rdflib import PROV, XSD, Literal, URIRef
+
+from provo.provontologygraph import _PROV_RELATIONS, _RELATION_ATTRIBUTES, BatchMalformed, ProvOntologyGraph
+from provo.startingpointclasses import Node
+from provo.staticfunctions import ntriples_line
+
+# relation -> PROV-O property
+_RELATION_PROPERTIES = {
+    relation: URIRef(predicate) for predicate, (relation, _, _) in _PROV_RELATIONS.items()
+}
+
+
+@dataclass(frozen=True)
+class RecorderClosed(Exception):
+    """Raised if an event is recorded after the recorder was closed."""
+
+    message: str
+
+
+@dataclass(frozen=True)
+class EventsNotApplied(Exception):
+    """Raised by flush if events of a batch could not be added to the graph
+    (e.g., an id was already used). the other events of the batch are added
+    and written, the events that failed are kept in events."""
+
+    message: str
+    # the events that were not applied, with the error of each event
+    events: tuple = ()
+
+
+@dataclass
+class AsyncProvRecorder:
+    """collects node, relation and time events without blocking the event loop.
+    the events are added to the graph in batches by a background executor, which
+    also appends the resulting triples as N-Triples to the file (if given).
+    the graph should be thread safe, if it is used outside of the recorder
+    while the recorder is flushing."""
+
+    graph: ProvOntologyGraph
+    # N-Triples file the triples of every flushed batch are appended to
+    file_name: Optional[str] = None
+    # a flush is started in the background once this many events are pending
+    batch_size: int = 10000
+    # drain() waits while more events are pending
+    max_pending: int = 100000
+    # default: a single worker thread, which keeps the batches in order
+    executor: Optional[Executor] = None
+    _pending: list = field(init=False, default_factory=list, repr=False)
+    _file: Optional[TextIO] = field(init=False, default=None, repr=False)
+    _owns_executor: bool = field(init=False, default=False, repr=False)
+    _flush_lock: Optional[asyncio.Lock] = field(init=False, default=None, repr=False)
+    _background: set = field(init=False, default_factory=set, repr=False)
+    _error: Optional[BaseException] = field(init=False, default=None, repr=False)
+    _closed: bool = field(init=False, default=False, repr=False)
+
+    def __post_init__(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="provo-recorder")
+            self._owns_executor = True
+        if self.file_name is not None:
+            self._file = open(self.file_name, "a", encoding="utf-8", newline="\n", buffering=2**20)
+
+    async def __aenter__(self) -> "AsyncProvRecorder":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def _record(self, event: tuple) -> None:
+        """queues the event and starts a background flush if a batch is complete"""
+
+        if self._closed:
+            raise RecorderClosed("The recorder is closed, no further events can be recorded.")
+        self._pending.append(event)
+        if len(self._pending) % self.batch_size == 0:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # outside of an event loop the events wait for the next flush
+                return
+            task = loop.create_task(self._apply_pending())
+            self._background.add(task)
+            task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        """keeps the first error of a background flush, it is raised by the next flush"""
+
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None and self._error is None:
+            self._error = task.exception()
+
+    def _node_id(self, id: str, use_default_namespace: bool) -> str:
+        """the id of a node is known before the node is created, ids are
+        generated like the ones of the IdVault"""
+
+        if not id:
+            return self.graph.default_namespace + str(uuid4())
+        return self.graph.default_namespace + id if use_default_namespace else id
+
+    def record_entity(
+        self, id: str = "", label: str = "", description: str = "", use_default_namespace: bool = True
+    ) -> str:
+        """queues the creation of an entity and returns its id"""
+
+        node_id = self._node_id(id, use_default_namespace)
+        self._record(("add_entity", node_id, label, description))
+        return node_id
+
+    def record_activity(
+        self, id: str = "", label: str = "", description: str = "", use_default_namespace: bool = True
+    ) -> str:
+        """queues the creation of an activity and returns its id"""
+
+        node_id = self._node_id(id, use_default_namespace)
+        self._record(("add_activity", node_id, label, description))
+        return node_id
+
+    def record_agent(
+        self, id: str = "", label: str = "", description: str = "", use_default_namespace: bool = True
+    ) -> str:
+        """queues the creation of an agent and returns its id"""
+
+        node_id = self._node_id(id, use_default_namespace)
+        self._record(("add_agent", node_id, label, description))
+        return node_id
+
+    def record_relation(self, relation: str, source: Union[Node, str], target: Union[Node, str]) -> None:
+        """queues a relation (e.g., "was_generated_by") between two nodes,
+        given as nodes or ids (e.g., returned by record_entity)"""
+
+        if relation not in _RELATION_ATTRIBUTES:
+            raise BatchMalformed(
+                f'The relation "{relation}" does not exist, available relations are: {", ".join(_RELATION_ATTRIBUTES)}.')
+        self._record((relation,
+                      source if isinstance(source, str) else source.node_id,
+                      target if isinstance(target, str) else target.node_id))
+
+    def record_start_time(self, activity: Union[Node, str], start_time: datetime) -> None:
+        """queues the start time of an activity"""
+        self._record(("started_at_time", activity if isinstance(activity, str) else activity.node_id, start_time))
+
+    def record_end_time(self, activity: Union[Node, str], end_time: datetime) -> None:
+        """queues the end time of an activity"""
+        self._record(("ended_at_time", activity if isinstance(activity, str) else activity.node_id, end_time))
+
+    def pending(self) -> int:
+        """returns the number of events that are not flushed yet"""
+        return len(self._pending)
+
+    def _apply_event(self, event: tuple) -> list[str]:
+        """adds the event to the graph and returns the N-Triples lines of
+        the triples it added"""
+
+        graph = self.graph
+        kind, node_id, value = event[0], event[1], event[2]
+        if kind in ("add_entity", "add_activity", "add_agent"):
+            node = getattr(graph, kind)(id=node_id, label=value, description=event[3],
+                                        use_default_namespace=False)
+            return [ntriples_line(triple) for triple in graph._node_triples(node)]
+        if kind in ("started_at_time", "ended_at_time"):
+            getattr(graph.get_activity(node_id), kind)(value)
+            time_property = PROV.startedAtTime if kind == "started_at_time" else PROV.endedAtTime
+            return [ntriples_line((URIRef(node_id), time_property, Literal(value, datatype=XSD.dateTime)))]
+        relation_count = graph._relation_count
+        graph.add_relations(kind, [node_id], [value])
+        if graph._relation_count == relation_count:
+            # the relation already existed
+            return []
+        return [ntriples_line((URIRef(node_id), _RELATION_PROPERTIES[kind], URIRef(value)))]
+
+    def _apply(self, events: list) -> None:
+        """adds the events to the graph and writes their triples, runs on the
+        executor. an event that fails does not stop the batch, the failed
+        events are raised as EventsNotApplied after the others are written."""
+
+        lines = []
+        failed = []
+        with self.graph._lock:
+            for event in events:
+                try:
+                    lines.extend(self._apply_event(event))
+                except Exception as error:
+                    failed.append((event, error))
+        if self._file is not None:
+            self._file.write("".join(lines))
+            self._file.flush()
+        if failed:
+            raise EventsNotApplied(
+                f"{len(failed)} of {len(events)} events could not be added to the graph: "
+                + "; ".join(f"{event[0]} {event[1]}: {error!r}" for event, error in failed[:10])
+                + (" ..." if len(failed) > 10 else ""),
+                tuple(failed))
+
+    async def _apply_pending(self) -> int:
+        """adds all pending events to the graph (and the file) on the executor,
+        returns the number of applied events. runs as background flush, flushes
+        run one after another, in the order of the events."""
+
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            events, self._pending = self._pending, []
+            if events:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self._apply, events)
+            return len(events)
+
+    async def flush(self) -> int:
+        """adds all pending events to the graph (and the file) without blocking
+        the event loop, returns the number of flushed events. an error of a
+        background flush is raised here (once), after the pending events are added."""
+
+        try:
+            count = await self._apply_pending()
+        except Exception as error:
+            if self._error is None:
+                raise
+            # the earlier error is raised first, this one by the next flush
+            error, self._error = self._error, error
+            raise error
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+        return count
+
+    async def drain(self) -> None:
+        """waits until the number of pending events is below max_pending,
+        producers await it to apply backpressure (like asyncio.StreamWriter.drain)"""
+
+        # lets background flushes proceed
+        await asyncio.sleep(0)
+        while len(self._pending) >= self.max_pending:
+            await self.flush()
+        if self._error is not None:
+            await self.flush()
+
+    async def close(self) -> None:
+        """flushes the pending events, closes the file and shuts down the own executor"""
+
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self._background:
+                await asyncio.gather(*self._background, return_exceptions=True)
+            await self.flush()
+        finally:
+            if self._file is not None:
+                self._file.close()
+            if self._owns_executor:
+                self.executor.shutdown()  # type: ignore
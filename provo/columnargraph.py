@@ -0,0 +1,490 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Implementation of a provenance graph that stores
+    its nodes and relations in columns (arrays) instead of objects
+"""
+
+
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import StringIO
+from itertools import islice
+from typing import ClassVar, Iterator, Optional, TextIO
+from uuid import uuid4
+
+from rdflib import DC, FOAF, PROV, RDF, RDFS, XSD, Graph, Literal, Namespace, URIRef
+
+from provo.idvault import IdAlreadyUsed, IdVault
+from provo.provontologygraph import (_PROV_RELATIONS, _RELATION_ATTRIBUTES, NodeNotFound,
+                                     ProvOntologyGraph)
+from provo.startingpointclasses import (Activity, Agent, Entity,
+                                        InvalidProvClassForThisRelation, NoDateTime,
+                                        NoEndTimeDefined, Node, NoStartTimeDefined)
+from provo.staticfunctions import ntriples_line
+
+# codes of the node classes in the class column
+_ENTITY, _ACTIVITY, _AGENT = 0, 1, 2
+_CLASS_TYPES = (PROV.Entity, PROV.Activity, PROV.Agent)
+
+# relation -> PROV-O property
+_RELATION_PROPERTIES = {
+    relation: URIRef(predicate) for predicate, (relation, _, _) in _PROV_RELATIONS.items()
+}
+_NODE_CLASSES = (Entity, Activity, Agent)
+# class code -> relations of the nodes of the class
+_CLASS_RELATIONS = tuple(
+    tuple(relation for relation, subject_class, _ in _PROV_RELATIONS.values() if subject_class is node_class)
+    for node_class in _NODE_CLASSES
+)
+
+
+class NodeHandle:
+    """ Lightweight reference to a node of a ColumnarProvOntologyGraph (or of
+    a SQLiteProvOntologyGraph), the node itself only exists as row of the graph.
+    the handles access the row through the methods _node_id, _label, _description,
+    _add_relation, _time and _set_time of the graph. """
+
+    __slots__ = ("_graph", "_index")
+    _node_class = -1
+
+    def __init__(self, graph, index: int) -> None:
+        self._graph = graph
+        self._index = index
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(node_id={self.node_id!r})"
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, NodeHandle)
+            and other._graph is self._graph
+            and other._index == self._index
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._graph), self._index))
+
+    def __str__(self) -> str:
+        """prints the node in a nice format (without its relations)"""
+        contents = f"id: {self.node_id}"
+        if self.label:
+            contents += f"\nlabel: {self.label}"
+        if self.description:
+            contents += f"\ndescription: {self.description}"
+        contents += "\n---"
+        return contents
+
+    @property
+    def node_id(self) -> str:
+        return self._graph._node_id(self._index)
+
+    @property
+    def label(self) -> str:
+        return self._graph._label(self._index)
+
+    @property
+    def description(self) -> str:
+        return self._graph._description(self._index)
+
+    def _relate(self, relation: str, target: "NodeHandle", target_class: type) -> None:
+        """adds the relation to the graph after checking the class of the target"""
+
+        if not isinstance(target, target_class) or target._graph is not self._graph:
+            raise InvalidProvClassForThisRelation(
+                f"""The PROV relation "{relation.replace('_', ' ')}" refers to an {target_class._class_name}, thus the provided
+                attribute has to be of type {target_class} (of the same graph).
+                In contradiction to this, the provided attribute is of the type {type(target)}."""
+            )
+        self._graph._add_relation(relation, self._index, target._index)
+
+
+class EntityHandle(NodeHandle):
+    """ Handle of a PROV-O Entity in a ColumnarProvOntologyGraph or SQLiteProvOntologyGraph.
+    https://www.w3.org/TR/prov-o/#Entity """
+
+    __slots__ = ()
+    _node_class = _ENTITY
+    _class_name = "Entity"
+
+    def was_derived_from(self, entity: "EntityHandle") -> None:
+        """ implements the wasDerivedFrom property of PROV-O
+        https://www.w3.org/TR/prov-o/#wasDerivedFrom """
+        self._relate("was_derived_from", entity, EntityHandle)
+
+    def was_generated_by(self, activity: "ActivityHandle") -> None:
+        """ implements the wasGeneratedBy property of PROV-O
+        https://www.w3.org/TR/prov-o/#wasgeneratedBy """
+        self._relate("was_generated_by", activity, ActivityHandle)
+
+    def was_attributed_to(self, agent: "AgentHandle") -> None:
+        """ implements the wasAttributedTo property of PROV-O
+        https://www.w3.org/TR/prov-o/#wasAttributedTo """
+        self._relate("was_attributed_to", agent, AgentHandle)
+
+
+class ActivityHandle(NodeHandle):
+    """ Handle of a PROV-O Activity in a ColumnarProvOntologyGraph or SQLiteProvOntologyGraph.
+    https://www.w3.org/TR/prov-o/#Activity """
+
+    __slots__ = ()
+    _node_class = _ACTIVITY
+    _class_name = "Activity"
+
+    def get_start_time(self) -> datetime:
+        """returns the start time of the activity"""
+        start_time = self._graph._time("started_at_time", self._index)
+        if start_time:
+            return start_time
+        raise NoStartTimeDefined(
+            f"No start time defined for the activity {self.label if self.label else f'with the id <{self.node_id}>'}.")
+
+    def get_end_time(self) -> datetime:
+        """returns the end time of the activity"""
+        end_time = self._graph._time("ended_at_time", self._index)
+        if end_time:
+            return end_time
+        raise NoEndTimeDefined(
+            f"No end time defined for the activity {self.label if self.label else f'with the id <{self.node_id}>'}.")
+
+    def was_informed_by(self, activity: "ActivityHandle") -> None:
+        """ implements the wasInformedBy property of PROV-O
+        https://www.w3.org/TR/prov-o/#wasInformedBy """
+        self._relate("was_informed_by", activity, ActivityHandle)
+
+    def used(self, entity: EntityHandle) -> None:
+        """ implements the used property of PROV-O
+        https://www.w3.org/TR/prov-o/#used """
+        self._relate("used", entity, EntityHandle)
+
+    def was_associated_with(self, agent: "AgentHandle") -> None:
+        """ implements the wasAssociatedWith property of PROV-O
+        https://www.w3.org/TR/prov-o/#wasAssociatedWith """
+        self._relate("was_associated_with", agent, AgentHandle)
+
+    def started_at_time(self, start_time: datetime) -> None:
+        """ implements the startedAtTime property of PROV-O
+        https://www.w3.org/TR/prov-o/#startedAtTime """
+
+        if not isinstance(start_time, datetime):
+            raise NoDateTime(
+                "The attribute `start_time` of the method `started_at_time` has to be a `datetime` object.")
+        self._graph._set_time("started_at_time", self._index, start_time)
+
+    def ended_at_time(self, end_time: datetime) -> None:
+        """ implements the endedAtTime property of PROV-O
+        https://www.w3.org/TR/prov-o/#endedAtTime """
+
+        if not isinstance(end_time, datetime):
+            raise NoDateTime(
+                "The attribute `end_time` of the method `ended_at_time` has to be a `datetime` object.")
+        self._graph._set_time("ended_at_time", self._index, end_time)
+
+
+class AgentHandle(NodeHandle):
+    """ Handle of a PROV-O Agent in a ColumnarProvOntologyGraph or SQLiteProvOntologyGraph.
+    https://www.w3.org/TR/prov-o/#Agent """
+
+    __slots__ = ()
+    _node_class = _AGENT
+    _class_name = "Agent"
+
+    def acted_on_behalf_of(self, agent: "AgentHandle") -> None:
+        """ implements the actedOnBehalfOf property of PROV-O
+        https://www.w3.org/TR/prov-o/#actedOnBehalfOf """
+        self._relate("acted_on_behalf_of", agent, AgentHandle)
+
+
+_HANDLE_CLASSES = (EntityHandle, ActivityHandle, AgentHandle)
+
+
+@dataclass
+class ColumnarProvOntologyGraph:
+    """alternative to ProvOntologyGraph for very large graphs. nodes are rows of
+    typed columns (node ids and labels are interned into string tables, relations
+    are stored as pairs of integer arrays per PROV-O property) instead of objects.
+    add_entity, add_activity and add_agent return lightweight handles that provide
+    the PROV-O relation methods. relations are not deduplicated.
+    use to_prov_ontology_graph() for the features that need node objects
+    (e.g., the mermaid export or lineage queries)."""
+
+    default_namespace: str = "https://provo-example.org/"
+    namespace_abbreviation: str = ""
+    lang: str = "en"
+    # str() lists at most this many nodes per class, see ProvOntologyGraph.summary_limit
+    summary_limit: ClassVar[Optional[int]] = ProvOntologyGraph.summary_limit
+    # node id -> index of the node's row
+    _rows: dict[str, int] = field(init=False, default_factory=dict, repr=False)
+    # only validates the ids, uniqueness is ensured by _rows
+    _id_validator: IdVault = field(init=False, default_factory=IdVault, repr=False)
+    _node_ids: list[str] = field(init=False, default_factory=list, repr=False)
+    _node_classes: array = field(init=False, default_factory=lambda: array("B"), repr=False)
+    # labels and descriptions are indexes into the string table
+    _labels: array = field(init=False, default_factory=lambda: array("I"), repr=False)
+    _descriptions: array = field(init=False, default_factory=lambda: array("I"), repr=False)
+    _strings: list[str] = field(init=False, default_factory=lambda: [""], repr=False)
+    _string_index: dict[str, int] = field(
+        init=False, default_factory=lambda: {"": 0}, repr=False)
+    # relation -> (indexes of the source nodes, indexes of the target nodes)
+    _relations: dict[str, tuple[array, array]] = field(
+        init=False,
+        default_factory=lambda: {relation: (array("I"), array("I")) for relation in _RELATION_ATTRIBUTES},
+        repr=False,
+    )
+    _start_times: dict[int, datetime] = field(init=False, default_factory=dict, repr=False)
+    _end_times: dict[int, datetime] = field(init=False, default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        """check validity of namespace and and namespace abbreviation"""
+        # the same rules as for the object based graph apply
+        ProvOntologyGraph._validate_namespace(self)  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self._node_ids)
+
+    def __str__(self) -> str:
+        """prints the contents of the provenance graph in a nice format,
+        at most summary_limit nodes per class."""
+        summary = StringIO()
+        self.write_summary(summary, limit=self.summary_limit, max_items=self.summary_limit)
+        return summary.getvalue()
+
+    def _iter_nodes(self, node_class: type) -> Iterator[Node]:
+        """yields the nodes of the class as node objects that do not belong to a
+        graph, with their times and relations (the targets only with id and label).
+        the relations are visited in the order of their sources, one node is built at a time."""
+
+        code = _NODE_CLASSES.index(node_class)
+        node_ids, node_classes = self._node_ids, self._node_classes
+        # per relation of the class: sources, targets and the positions sorted by source
+        relations = []
+        for relation in _CLASS_RELATIONS[code]:
+            sources, targets = self._relations[relation]
+            order = array("I", sorted(range(len(sources)), key=sources.__getitem__))
+            relations.append([relation, sources, targets, order, 0])
+        for row in range(len(node_ids)):
+            if node_classes[row] != code:
+                continue
+            node = node_class(label=self._label(row), description=self._description(row), node_id=node_ids[row])
+            if row in self._start_times:
+                node.started_at_time(self._start_times[row])  # type: ignore
+            if row in self._end_times:
+                node.ended_at_time(self._end_times[row])  # type: ignore
+            for position in relations:
+                relation, sources, targets, order, next_position = position
+                while next_position < len(order) and sources[order[next_position]] == row:
+                    target = targets[order[next_position]]
+                    getattr(node, relation)(_NODE_CLASSES[node_classes[target]](
+                        label=self._label(target), node_id=node_ids[target]))
+                    next_position += 1
+                position[4] = next_position
+            yield node
+
+    def iter_lines(self, limit: Optional[int] = None, max_items: Optional[int] = None) -> Iterator[str]:
+        """yields the lines of the contents of the provenance graph in a nice format,
+        see ProvOntologyGraph.iter_lines"""
+
+        yield "Provenance Graph Contents:"
+        for node_class, heading, plural in (
+                (Entity, "Entities", "entities"),
+                (Activity, "Activities", "activities"),
+                (Agent, "Agents", "agents")):
+            yield "    ---"
+            yield f"    {heading}:"
+            yield "        ---"
+            nodes = self._iter_nodes(node_class)
+            for node in nodes if limit is None else islice(nodes, limit):
+                yield from (f"        {line}" for line in node.iter_lines(max_items))
+            if limit is not None:
+                remaining = self._node_classes.count(_NODE_CLASSES.index(node_class)) - limit
+                if remaining > 0:
+                    yield f"        ... ({remaining} more {plural})"
+        yield "    ---"
+
+    def write_summary(self, file: TextIO, limit: Optional[int] = None, max_items: Optional[int] = None) -> None:
+        """writes the contents of the provenance graph in a nice format into the
+        (text) file handle, see iter_lines for limit and max_items"""
+        file.write("\n".join(self.iter_lines(limit, max_items)))
+
+    def _node_id(self, index: int) -> str:
+        return self._node_ids[index]
+
+    def _label(self, index: int) -> str:
+        return self._strings[self._labels[index]]
+
+    def _description(self, index: int) -> str:
+        return self._strings[self._descriptions[index]]
+
+    def _add_relation(self, relation: str, source: int, target: int) -> None:
+        sources, targets = self._relations[relation]
+        sources.append(source)
+        targets.append(target)
+
+    def _time(self, relation: str, index: int) -> Optional[datetime]:
+        """returns the start ("started_at_time") or end time of the activity"""
+        times = self._start_times if relation == "started_at_time" else self._end_times
+        return times.get(index)
+
+    def _set_time(self, relation: str, index: int, time: datetime) -> None:
+        times = self._start_times if relation == "started_at_time" else self._end_times
+        times[index] = time
+
+    def _intern(self, string: str) -> int:
+        """returns the index of the string in the string table"""
+        index = self._string_index.get(string)
+        if index is None:
+            index = self._string_index[string] = len(self._strings)
+            self._strings.append(string)
+        return index
+
+    def _add_node(
+        self, node_class: int, id: str, label: str, description: str, use_default_namespace: bool
+    ) -> NodeHandle:
+        """registers the id and appends the node to the columns"""
+
+        if id:
+            node_id = self.default_namespace + id if use_default_namespace else id
+            if node_id in self._rows:
+                raise IdAlreadyUsed(
+                    f'The Id "{node_id}" was already used in this graph.')
+            self._id_validator._raise_exception_if_uri_invalid(node_id)
+        else:
+            node_id = self.default_namespace + str(uuid4())
+            while node_id in self._rows:
+                node_id = self.default_namespace + str(uuid4())
+            self._id_validator._raise_exception_if_uri_invalid(node_id, trusted=True)
+        index = len(self._node_ids)
+        self._rows[node_id] = index
+        self._node_ids.append(node_id)
+        self._node_classes.append(node_class)
+        self._labels.append(self._intern(label))
+        self._descriptions.append(self._intern(description))
+        return _HANDLE_CLASSES[node_class](self, index)
+
+    def add_entity(
+        self,
+        id: str = "",
+        label: str = "",
+        description: str = "",
+        use_default_namespace: bool = True,
+    ) -> EntityHandle:
+        """creates a new entity, adds it to the graph and returns its handle"""
+        return self._add_node(_ENTITY, id, label, description, use_default_namespace)  # type: ignore
+
+    def add_activity(
+        self,
+        id: str = "",
+        label: str = "",
+        description: str = "",
+        use_default_namespace: bool = True,
+    ) -> ActivityHandle:
+        """creates a new activity, adds it to the graph and returns its handle"""
+        return self._add_node(_ACTIVITY, id, label, description, use_default_namespace)  # type: ignore
+
+    def add_agent(
+        self,
+        id: str = "",
+        label: str = "",
+        description: str = "",
+        use_default_namespace: bool = True,
+    ) -> AgentHandle:
+        """creates a new agent, adds it to the graph and returns its handle"""
+        return self._add_node(_AGENT, id, label, description, use_default_namespace)  # type: ignore
+
+    def get_node(self, id: str, use_default_namespace: bool = False) -> NodeHandle:
+        """returns the handle of the entity, activity or agent with the id"""
+
+        if use_default_namespace:
+            id = self.default_namespace + id
+        index = self._rows.get(id)
+        if index is None:
+            raise NodeNotFound(
+                f'There is no node with the id "{id}" in this graph.')
+        return _HANDLE_CLASSES[self._node_classes[index]](self, index)
+
+    def _triples(self) -> Iterator[tuple]:
+        """yields the rdf triples of the graph, column by column"""
+
+        # the URIRefs are created row by row, not for all nodes at once
+        node_ids, strings = self._node_ids, self._strings
+        for node_id, node_class, label, description in zip(
+            node_ids, self._node_classes, self._labels, self._descriptions
+        ):
+            subject = URIRef(node_id)
+            yield (subject, RDF.type, _CLASS_TYPES[node_class])
+            if label:
+                yield (subject, RDFS.label, Literal(strings[label], lang=self.lang))
+            if description:
+                yield (subject, RDFS.comment, Literal(strings[description], lang=self.lang))
+        for index, start_time in self._start_times.items():
+            yield (URIRef(node_ids[index]), PROV.startedAtTime, Literal(start_time, datatype=XSD.dateTime))
+        for index, end_time in self._end_times.items():
+            yield (URIRef(node_ids[index]), PROV.endedAtTime, Literal(end_time, datatype=XSD.dateTime))
+        for relation, (sources, targets) in self._relations.items():
+            predicate = _RELATION_PROPERTIES[relation]
+            for source, target in zip(sources, targets):
+                yield (URIRef(node_ids[source]), predicate, URIRef(node_ids[target]))
+
+    def get_rdflib_graph(self) -> Graph:
+        """returns the provenance graph as rdflib.Graph()."""
+
+        provenance_graph = Graph()
+        provenance_graph.bind("dc", DC)
+        provenance_graph.bind("foaf", FOAF)
+        provenance_graph.bind("rdf", RDF)
+        provenance_graph.bind("rdfs", RDFS)
+        provenance_graph.bind("prov", PROV)
+        provenance_graph.bind(self.namespace_abbreviation,
+                              Namespace(self.default_namespace))
+        for triple in self._triples():
+            provenance_graph.add(triple)
+        return provenance_graph
+
+    def serialize_as_rdf(self, file_name: str, export_format: str = "turtle") -> None:
+        """serializes the graph as rdf, available formats are:
+        "xml", "n3", "turtle", "nt", "pretty-xml", "trix", "trig", "nquads", "json-ld", "hext"
+
+        "nt" and "nquads" are streamed directly into the file.
+        """
+        if export_format in ("nt", "nt11", "ntriples", "nquads"):
+            with open(file_name, "w", encoding="utf-8", newline="\n", buffering=2**20) as f:
+                self.write_ntriples(f)
+        else:
+            self.get_rdflib_graph().serialize(destination=file_name, format=export_format)
+
+    def write_ntriples(self, file: TextIO) -> None:
+        """writes the graph as N-Triples into the (text) file handle."""
+        file.writelines(ntriples_line(triple) for triple in self._triples())
+
+    def to_prov_ontology_graph(self) -> ProvOntologyGraph:
+        """returns the contents of the graph as (object based) ProvOntologyGraph"""
+
+        graph = ProvOntologyGraph(
+            default_namespace=self.default_namespace,
+            namespace_abbreviation=self.namespace_abbreviation,
+            lang=self.lang,
+        )
+        graph._id_vault.add_ids(self._node_ids)
+        node_lists = (graph._entities, graph._activities, graph._agents)
+        nodes = []
+        for node_id, node_class, label, description in zip(
+            self._node_ids, self._node_classes, self._labels, self._descriptions
+        ):
+            node = _NODE_CLASSES[node_class](
+                label=self._strings[label],
+                description=self._strings[description],
+                node_id=node_id,
+            )
+            node_lists[node_class].append(node)
+            graph._register_node(node)
+            nodes.append(node)
+        for relation, (sources, targets) in self._relations.items():
+            for source, target in zip(sources, targets):
+                getattr(nodes[source], relation)(nodes[target])
+        for index, start_time in self._start_times.items():
+            nodes[index].started_at_time(start_time)  # type: ignore
+        for index, end_time in self._end_times.items():
+            nodes[index].ended_at_time(end_time)  # type: ignore
+        return graph
@@ -7,9 +7,14 @@
 """
 
 
+import logging
 from dataclasses import dataclass, field
+from typing import Iterable
 from uuid import uuid4
-from validators import url
+
+from provo.irivalidator import is_valid_iri
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass(frozen=True)
@@ -30,45 +35,31 @@ class IdAlreadyUsed(Exception):
 class IdVault:
     """manages unique IDs and generates new ones"""
 
-    vault: list[str] = field(init=False, default_factory=list)
+    # dict as insertion ordered set, gives O(1) membership tests
+    vault: dict[str, None] = field(init=False, default_factory=dict)
     _invalid_symbols: str = field(init=False, default='<>" {}|\\^`')
 
-    def _raise_exception_if_uri_invalid(self, uri: str) -> None:
-        "checks if uri is valid and raises exception if not"
+    def _raise_exception_if_uri_invalid(self, uri: str, trusted: bool = False) -> None:
+        """checks if uri is a valid IRI and raises exception if not.
+        trusted skips the check of the local name (see irivalidator.is_valid_iri)"""
 
-        # TODO rethink validation, we technically want to validate an IRI
-        if not url(uri):  # type: ignore
+        if not is_valid_iri(uri, trusted=trusted):
             raise IdMalformed(
-                """
-            The provided namespace is not a valid URL!
+                f"""
+            The id "{uri}" is not a valid IRI!
 
-            See validators package (https://github.com/python-validators/validators),
-            validators.url() or https://gist.github.com/dperini/729294 for more
-            information on what qualifies a URL as valid.
-            
-            https://www.rfc-editor.org/rfc/rfc3986#section-3:
-            3.  Syntax Components
+            See https://www.rfc-editor.org/rfc/rfc3987#section-2.2 for the
+            syntax of IRIs. In contrast to URIs (RFC 3986), IRIs may contain
+            non-ASCII characters, but the following characters must not
+            occur unencoded: <>" {{}}|\\^` and whitespace.
 
-            The generic URI syntax consists of a hierarchical sequence of
+            The generic IRI syntax consists of a hierarchical sequence of
             components referred to as the scheme, authority, path, query, and
             fragment.
 
-                URI         = scheme ":" hier-part [ "?" query ] [ "#" fragment ]
-
-                hier-part   = "//" authority path-abempty
-                            / path-absolute
-                            / path-rootless
-                            / path-empty
+                IRI         = scheme ":" ihier-part [ "?" iquery ] [ "#" ifragment ]
 
-            The scheme and path components are required, though the path may be
-            empty (no characters).  When authority is present, the path must
-            either be empty or begin with a slash ("/") character.  When
-            authority is not present, the path cannot begin with two slash
-            characters ("//").  These restrictions result in five different ABNF
-            rules for a path (Section 3.3), only one of which will match any
-            given URI reference.
-
-            The following are two example URIs and their component parts:
+            The following are two example IRIs and their component parts:
 
                     foo://example.com:8042/over/there?name=ferret#nose
                     \_/   \______________/\_________/ \_________/ \__/
@@ -80,13 +71,22 @@ class IdVault:
             """
             )
 
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self.vault
+
+    def __len__(self) -> int:
+        return len(self.vault)
+
     def generate(self, namespace: str) -> str:
         """generates a new uuid that is not in the vault yet"""
         node_id = namespace + str(uuid4())
         while node_id in self.vault:
             node_id = namespace + str(uuid4())
-        self._raise_exception_if_uri_invalid(node_id)
-        self.vault.append(node_id)
+        self._raise_exception_if_uri_invalid(node_id, trusted=True)
+        self.vault[node_id] = None
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("generated id %s", node_id,
+                         extra={"node_id": node_id, "generated": True})
         return node_id
 
     def add_id(self, node_id: str) -> str:
@@ -94,7 +94,49 @@ class IdVault:
         if node_id in self.vault:
             raise IdAlreadyUsed(
                 f'The Id "{node_id}" was already used in this graph.')
-        print(node_id)
         self._raise_exception_if_uri_invalid(node_id)
-        self.vault.append(node_id)
+        self.vault[node_id] = None
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("added id %s", node_id,
+                         extra={"node_id": node_id, "generated": False})
         return node_id
+
+    def add_ids(self, node_ids: Iterable[str]) -> list[str]:
+        """adds several user defined ids at once and checks if they are valid.
+        the vault stays unchanged if one of the ids is invalid or already used"""
+        node_ids = list(node_ids)
+        batch = dict.fromkeys(node_ids)
+        if len(batch) != len(node_ids):
+            seen = set()
+            for node_id in node_ids:
+                if node_id in seen:
+                    raise IdAlreadyUsed(
+                        f'The Id "{node_id}" occurs more than once in the provided ids.')
+                seen.add(node_id)
+        for node_id in batch:
+            if node_id in self.vault:
+                raise IdAlreadyUsed(
+                    f'The Id "{node_id}" was already used in this graph.')
+            self._raise_exception_if_uri_invalid(node_id)
+        self.vault.update(batch)
+        if logger.isEnabledFor(logging.DEBUG):
+            for node_id in batch:
+                logger.debug("added id %s", node_id,
+                             extra={"node_id": node_id, "generated": False})
+        return node_ids
+
+    def reserve(self, n: int, namespace: str) -> list[str]:
+        """generates n new uuids in the namespace at once and adds them to the vault"""
+        node_ids = []
+        for _ in range(n):
+            node_id = namespace + str(uuid4())
+            while node_id in self.vault:
+                node_id = namespace + str(uuid4())
+            self._raise_exception_if_uri_invalid(node_id, trusted=True)
+            self.vault[node_id] = None
+            node_ids.append(node_id)
+        if logger.isEnabledFor(logging.DEBUG):
+            for node_id in node_ids:
+                logger.debug("generated id %s", node_id,
+                             extra={"node_id": node_id, "generated": True})
+        return node_ids
@@ -0,0 +1,82 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Validation of IRIs according to RFC 3987
+    https://www.rfc-editor.org/rfc/rfc3987#section-2.2 .
+"""
+
+
+import re
+from functools import lru_cache
+
+# character classes of the ABNF in RFC 3987, section 2.2
+_UCSCHAR = (
+    "\u00A0-\uD7FF\uF900-\uFDCF\uFDF0-\uFFEF"
+    "\U00010000-\U0001FFFD\U00020000-\U0002FFFD\U00030000-\U0003FFFD"
+    "\U00040000-\U0004FFFD\U00050000-\U0005FFFD\U00060000-\U0006FFFD"
+    "\U00070000-\U0007FFFD\U00080000-\U0008FFFD\U00090000-\U0009FFFD"
+    "\U000A0000-\U000AFFFD\U000B0000-\U000BFFFD\U000C0000-\U000CFFFD"
+    "\U000D0000-\U000DFFFD\U000E1000-\U000EFFFD"
+)
+_IPRIVATE = "\uE000-\uF8FF\U000F0000-\U000FFFFD\U00100000-\U0010FFFD"
+_IUNRESERVED = "A-Za-z0-9\\-._~" + _UCSCHAR
+_SUB_DELIMS = "!$&'()*+,;="
+_PCT_ENCODED = "%[0-9A-Fa-f]{2}"
+
+_IPCHAR = f"(?:[{_IUNRESERVED}{_SUB_DELIMS}:@]|{_PCT_ENCODED})"
+_ISEGMENT = f"{_IPCHAR}*"
+_ISEGMENT_NZ = f"{_IPCHAR}+"
+_IQUERY = f"(?:{_IPCHAR}|[{_IPRIVATE}/?])*"
+_IFRAGMENT = f"(?:{_IPCHAR}|[/?])*"
+
+_SCHEME = "[A-Za-z][A-Za-z0-9+\\-.]*"
+_IUSERINFO = f"(?:[{_IUNRESERVED}{_SUB_DELIMS}:]|{_PCT_ENCODED})*"
+_IP_LITERAL = f"\\[(?:[0-9A-Fa-f:.]+|v[0-9A-Fa-f]+\\.[A-Za-z0-9\\-._~{_SUB_DELIMS}:]+)\\]"
+_IREG_NAME = f"(?:[{_IUNRESERVED}{_SUB_DELIMS}]|{_PCT_ENCODED})*"
+_IHOST = f"(?:{_IP_LITERAL}|{_IREG_NAME})"
+_IAUTHORITY = f"(?:{_IUSERINFO}@)?{_IHOST}(?::[0-9]*)?"
+_IHIER_PART = (
+    f"(?://{_IAUTHORITY}(?:/{_ISEGMENT})*"
+    f"|/(?:{_ISEGMENT_NZ}(?:/{_ISEGMENT})*)?"
+    f"|{_ISEGMENT_NZ}(?:/{_ISEGMENT})*"
+    "|)"
+)
+
+IRI = re.compile(f"{_SCHEME}:{_IHIER_PART}(?:\\?{_IQUERY})?(?:#{_IFRAGMENT})?")
+
+# patterns for the local name, i.e., the part of an IRI after its last "/" or "#"
+_LOCAL_NAME_IN_PATH = re.compile(f"{_ISEGMENT}(?:\\?{_IQUERY})?")
+_LOCAL_NAME_IN_QUERY = re.compile(_IQUERY)
+_LOCAL_NAME_IN_FRAGMENT = re.compile(_IFRAGMENT)
+
+
+@lru_cache(maxsize=1024)
+def is_valid_namespace(namespace: str) -> bool:
+    """checks if the namespace is a valid IRI, the results are cached"""
+    return IRI.fullmatch(namespace) is not None
+
+
+def is_valid_iri(iri: str, trusted: bool = False) -> bool:
+    """checks if iri is a valid IRI. the namespace of the iri (everything up to
+    its last "/" or "#") is validated once and cached, afterwards only the
+    local name is checked. if trusted is set, the local name is not checked at all,
+    e.g., for ids that were generated within a validated namespace."""
+
+    split = max(iri.rfind("/"), iri.rfind("#")) + 1
+    namespace, local_name = iri[:split], iri[split:]
+    # without a namespace, or if the local name belongs to the authority
+    # component, the split does not help
+    if not namespace or namespace.endswith("//"):
+        return IRI.fullmatch(iri) is not None
+    if not is_valid_namespace(namespace):
+        return False
+    if trusted:
+        return True
+    if "#" in namespace:
+        pattern = _LOCAL_NAME_IN_FRAGMENT
+    elif "?" in namespace:
+        pattern = _LOCAL_NAME_IN_QUERY
+    else:
+        pattern = _LOCAL_NAME_IN_PATH
+    return pattern.fullmatch(local_name) is not None
@@ -0,0 +1,107 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Append-only journal (write-ahead log) of the changes of a provenance graph
+"""
+
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, TextIO
+
+# kinds of records, every record is a JSON array in a line of its own:
+# [HEADER, default namespace, namespace abbreviation, lang]
+# [NODE, class code (see provontologygraph._SHARD_CLASSES), id, label, description]
+# [RELATION, relation, id of the source, id of the target]
+# [TIME, "started_at_time" | "ended_at_time", id of the activity, ISO 8601 time]
+# [ATTRIBUTE, "label" | "description", id of the node, text]
+HEADER, NODE, RELATION, TIME, ATTRIBUTE = "P", "N", "R", "T", "A"
+
+
+@dataclass(frozen=True)
+class JournalMalformed(Exception):
+    """Raised if a record of a journal can not be parsed."""
+
+    message: str
+
+
+@dataclass(frozen=True)
+class JournalMismatch(Exception):
+    """Raised if a journal was written by a graph with another
+    namespace, namespace abbreviation or language."""
+
+    message: str
+
+
+@dataclass
+class Journal:
+    """appends records to the journal file. the records are buffered and
+    written (and fsynced) in batches of sync_every records, i.e., at most
+    the last sync_every - 1 records are lost if the process crashes."""
+
+    file_name: str
+    sync_every: int = 1000
+    _file: Optional[TextIO] = field(init=False, default=None, repr=False)
+    _unsynced: int = field(init=False, default=0, repr=False)
+
+    def __post_init__(self):
+        self._truncate_incomplete_record()
+        self._file = open(self.file_name, "a", encoding="utf-8", newline="\n", buffering=2**20)
+
+    def _truncate_incomplete_record(self) -> None:
+        """removes the incomplete last record a crash may have left,
+        so that appended records start in a line of their own"""
+
+        if not os.path.exists(self.file_name):
+            return
+        with open(self.file_name, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(end - 4096, 0)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                f.truncate(end)
+
+    def append(self, record: list) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")  # type: ignore
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """writes the buffered records and forces them to disk"""
+
+        if self._file is None or self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self) -> None:
+        if self._file is not None and not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def read_journal(file_name: str) -> Iterator[list]:
+    """yields the records of the journal. an incomplete last record (the
+    process crashed while writing it) is skipped."""
+
+    with open(file_name, "r", encoding="utf-8", newline="\n") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.endswith("\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise JournalMalformed(
+                    f'Line {number} of the journal "{file_name}" is no valid record: {line.strip()}') from None
+            yield record
@@ -7,7 +7,19 @@
 """
 
 
+from collections import OrderedDict
+from contextlib import nullcontext
 from dataclasses import dataclass, field
+from functools import wraps
+from datetime import datetime
+from io import StringIO
+from itertools import chain, islice
+import os
+import sys
+from threading import RLock
+from time import perf_counter
+from typing import Any, Callable, ClassVar, Iterable, Iterator, Optional, TextIO, Union
+from weakref import WeakValueDictionary
 
 from rdflib import (
     DC,
@@ -16,6 +28,7 @@ from rdflib import (
     RDF,
     RDFS,
     XSD,
+    BNode,
     Graph,  # type: ignore
     Literal,
     Namespace,
@@ -25,8 +38,12 @@ from validators import url
 import re
 
 from provo.idvault import IdVault
-from provo.startingpointclasses import Activity, Agent, Entity
-from provo.staticfunctions import update_dict, get_option
+from provo.journal import ATTRIBUTE, HEADER, NODE, RELATION, TIME, Journal, JournalMismatch, read_journal
+from provo.spill import SpillStore
+from provo.startingpointclasses import (_NO_RELATIONS, Activity, Agent, Entity,
+                                        InvalidProvClassForThisRelation, Node, RelationHook)
+from provo.staticfunctions import (get_option, ntriples_line, parse_ntriples_line,
+                                   update_dict)
 
 
 @dataclass(frozen=True)
@@ -57,6 +74,258 @@ class PrefixNotAllowed(Exception):
     message: str
 
 
+@dataclass(frozen=True)
+class NodeNotFound(Exception):
+    """Raised if no node with the requested id exists in the graph."""
+
+    message: str
+
+
+@dataclass(frozen=True)
+class BatchMalformed(Exception):
+    """Raised if the columns of a batch differ in length or
+    if the relation of a batch does not exist."""
+
+    message: str
+
+
+@dataclass(frozen=True)
+class SelectionMalformed(Exception):
+    """Raised if the direction of a node selection is not valid."""
+
+    message: str
+
+
+@dataclass(frozen=True)
+class MermaidOptionInvalid(Exception):
+    """Raised if an option of the mermaid export is not valid."""
+
+    message: str
+
+
+@dataclass(frozen=True)
+class NTriplesLineMalformed(Exception):
+    """Raised if a line of an N-Triples file can not be parsed."""
+
+    message: str
+
+
+# PROV-O starting point properties that are read by read_graph:
+# predicate -> (relation method, class of the subject, class of the object)
+_PROV_RELATIONS = {
+    str(PROV.wasDerivedFrom): ("was_derived_from", Entity, Entity),
+    str(PROV.wasGeneratedBy): ("was_generated_by", Entity, Activity),
+    str(PROV.wasAttributedTo): ("was_attributed_to", Entity, Agent),
+    str(PROV.wasInformedBy): ("was_informed_by", Activity, Activity),
+    str(PROV.used): ("used", Activity, Entity),
+    str(PROV.wasAssociatedWith): ("was_associated_with", Activity, Agent),
+    str(PROV.actedOnBehalfOf): ("acted_on_behalf_of", Agent, Agent),
+}
+# relation -> attribute of the source node that holds the targets
+_RELATION_ATTRIBUTES = {
+    "was_derived_from": "_was_derived_from_entities",
+    "was_generated_by": "_was_generated_by_activities",
+    "was_attributed_to": "_was_attributed_to_agents",
+    "was_informed_by": "_was_informed_by_activities",
+    "used": "_used_entities",
+    "was_associated_with": "_was_associated_with_agents",
+    "acted_on_behalf_of": "_acted_on_behalf_of_agents",
+}
+_PROV_CLASSES = {
+    str(PROV.Entity): Entity,
+    str(PROV.Activity): Activity,
+    str(PROV.Agent): Agent,
+}
+# node class -> attributes that hold its relations (its out-degree) and
+# relations that lead to nodes of the class (its in-degree)
+_OUTGOING_ATTRIBUTES = {
+    node_class: tuple(_RELATION_ATTRIBUTES[relation] for relation, subject_class, _
+                      in _PROV_RELATIONS.values() if subject_class is node_class)
+    for node_class in (Entity, Activity, Agent)
+}
+_INCOMING_RELATIONS = {
+    node_class: tuple(relation for relation, _, object_class
+                      in _PROV_RELATIONS.values() if object_class is node_class)
+    for node_class in (Entity, Activity, Agent)
+}
+# rough estimates of the memory of a node (object, its entries in the id vault,
+# the index and the node list, the id without its characters) and of a relation
+# (its entries in the node and in the inverse index, the first relation of a node
+# also allocates the dict). test_stats checks them against tracemalloc.
+_NODE_BYTES = {node_class: sys.getsizeof(node_class()) + 110 for node_class in (Entity, Activity, Agent)}
+_RELATION_BYTES = 200
+
+# predicates of the relations between nodes
+_RELATION_PREDICATES = frozenset(URIRef(predicate) for predicate in _PROV_RELATIONS)
+
+# node classes of a GraphShard, the position is the code used in GraphShard.node_classes
+# (and in the records of a journal)
+_SHARD_CLASSES = (Entity, Activity, Agent)
+_CLASS_CODES = {node_class: code for code, node_class in enumerate(_SHARD_CLASSES)}
+
+# relations of the mermaid flowchart per node class:
+# (relation, PROV-O term, label, label if inverted, class whose relation-style is used)
+_MERMAID_RELATIONS = {
+    Entity: (
+        ("was_derived_from", "wasDerivedFrom", "was derived from", "originated from", "entity"),
+        ("was_generated_by", "wasGeneratedBy", "was generated by", "generated", "activity"),
+        ("was_attributed_to", "wasAttributedTo", "was attributed to", "produced", "agent"),
+    ),
+    Activity: (
+        ("was_informed_by", "wasInformedBy", "was informed by", "informed", "entity"),
+        ("used", "used", "used", "was used by", "activity"),
+        ("was_associated_with", "wasAssociatedWith", "was associated with", "initiated", "agent"),
+    ),
+    Agent: (
+        ("acted_on_behalf_of", "actedOnBehalfOf", "acted on behalf of", "instructed", "agent"),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class GraphShard:
+    """compact, picklable snapshot of the contents of a ProvOntologyGraph,
+    e.g., to send a partial graph from a worker process to its parent.
+    it consists of plain columns only (no node objects), relations refer
+    to the nodes by id."""
+
+    default_namespace: str
+    namespace_abbreviation: str
+    lang: str
+    # one byte per node, see _SHARD_CLASSES
+    node_classes: bytes
+    node_ids: tuple[str, ...]
+    labels: tuple[str, ...]
+    descriptions: tuple[str, ...]
+    # relation -> (ids of the sources, ids of the targets)
+    relations: dict[str, tuple[tuple[str, ...], tuple[str, ...]]]
+    # id of the activity -> time
+    start_times: dict[str, datetime]
+    end_times: dict[str, datetime]
+
+
+@dataclass(frozen=True)
+class NodeSelection:
+    """selects the part of a graph that is exported: the seeds and the nodes
+    that are reached from them within depth relations (None: no limit) along
+    the relations (None: all relations), upstream (ancestors), downstream
+    (descendants) or "both". without seeds, all nodes of the graph are
+    candidates. if a predicate is given, only the nodes it accepts are selected.
+    the export contains the selected nodes and the relations between them."""
+
+    seeds: Optional[Iterable[Union[Node, str]]] = None
+    depth: Optional[int] = None
+    relations: Optional[Iterable[str]] = None
+    direction: str = "upstream"
+    predicate: Optional[Callable[[Node], bool]] = None
+
+
+@dataclass(frozen=True)
+class GraphStats:
+    """counters of a provenance graph, see ProvOntologyGraph.stats"""
+
+    # class ("entity", "activity", "agent") -> number of nodes
+    nodes: dict[str, int]
+    # relation (e.g., "was_generated_by") -> number of relations
+    relations: dict[str, int]
+    # degree -> number of nodes with this number of outgoing/incoming relations
+    out_degrees: dict[int, int]
+    in_degrees: dict[int, int]
+    # number of ids in the id vault
+    ids: int
+    # rough estimate of the memory of the nodes, their ids and relations in bytes
+    # (from the counters, the nodes are not measured)
+    approximate_bytes: int
+    # method (e.g., "serialize_as_rdf") -> duration of its last call in seconds
+    timings: dict[str, float]
+
+
+def _move_degree(degrees: dict[int, int], degree: int) -> None:
+    """moves one node from degree - 1 to degree in the distribution"""
+    if degrees.get(degree - 1):
+        degrees[degree - 1] -= 1
+    degrees[degree] = degrees.get(degree, 0) + 1
+
+
+def _timed(method: Callable) -> Callable:
+    """records the duration of the method in the timings of the graph, if profiling is enabled"""
+
+    @wraps(method)
+    def timed_method(self: "ProvOntologyGraph", *args: Any, **kwargs: Any) -> Any:
+        if not self.profile:
+            return method(self, *args, **kwargs)
+        start = perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._timings[method.__name__] = perf_counter() - start
+
+    return timed_method
+
+
+def _mermaid_text(text: str) -> str:
+    """returns the text for a quoted mermaid label, i.e., with its quotes escaped"""
+    return text.replace('"', "#quot;")
+
+
+def _mermaid_options(user_options: dict) -> dict:
+    """returns the options of the mermaid export, the default options updated
+    with the user options"""
+
+    # if possible the options use the mermaid terminology
+    default_options = {
+        "invert-relations": False,
+        "orientation": "TD",
+        "aggregation": None,
+        "aggregation-pattern": r"\d+",
+        "aggregation-min-count": 2,
+        "subgraphs": False,
+        "included-relations": [
+            "was_generated_by",
+            "was_attributed_to",
+            "used",
+            "was_associated_with",
+            "acted_on_behalf_of",
+        ],
+        "color": "#000000",
+        "stroke": "#a4a4a4",
+        "stroke-width": "1px",
+        "relation-style": "-",
+        "entity": {
+            "fill": "#fffedf",
+            "shape": "([:])",
+            "relation-style": None,
+            "color": None,
+            "stroke": None,
+            "stroke-width": None,
+        },
+        "activity": {
+            "fill": "#cfceff",
+            "shape": "[[:]]",
+            "relation-style": None,
+            "color": None,
+            "stroke": None,
+            "stroke-width": None,
+        },
+        "agent": {
+            "fill": "#ffebc3",
+            "shape": "[/:\\]",
+            "relation-style": ".",
+            "color": None,
+            "stroke": None,
+            "stroke-width": None,
+        },
+    }
+
+     # Update default options with user options
+    options = update_dict(default_options, user_options)
+
+    if options["aggregation"] not in (None, "label", "agent"):
+        raise MermaidOptionInvalid(
+            f'The aggregation "{options["aggregation"]}" is not valid, use "label", "agent" or None.')
+    return options
+
+
 @dataclass
 class ProvOntologyGraph:
     """model that manages contents of a provenance graph
@@ -65,14 +334,75 @@ class ProvOntologyGraph:
     default_namespace: str = "https://provo-example.org/"
     namespace_abbreviation: str = ""
     lang: str = "en"
+    # allows several threads to add nodes and relations concurrently
+    thread_safe: bool = False
+    # file every change of the graph is appended to, an existing journal is replayed
+    journal: Optional[str] = None
+    # number of journal records that are buffered before they are written and fsynced
+    journal_sync_every: int = 1000
+    # memory budget: number of nodes that are kept in memory, the least recently
+    # used nodes beyond are evicted to an on-disk store and loaded again on access
+    max_resident_nodes: Optional[int] = None
+    # sqlite file of the on-disk store, a temporary file by default
+    spill_file: Optional[str] = None
+    # records the durations of the exports, see stats
+    profile: bool = False
+    # number of nodes per class (and related nodes per relation) str() lists at most
+    summary_limit: ClassVar[Optional[int]] = 1000
+    # number of ancestors/descendants results that are cached at most
+    lineage_cache_size: ClassVar[int] = 256
     _entities: list[Entity] = field(init=False, default_factory=list)
     _activities: list[Activity] = field(init=False, default_factory=list)
     _agents: list[Agent] = field(init=False, default_factory=list)
     _id_vault: IdVault = field(init=False, default_factory=IdVault)
+    # nodes in memory, with a memory budget the least recently used first
+    _nodes: dict[str, Node] = field(init=False, default_factory=dict, repr=False)
+    # inverse edges, relation -> id of the target node -> source nodes
+    _inverse_relations: dict[str, dict[str, list[Node]]] = field(
+        init=False, default_factory=lambda: {relation: {} for relation in _RELATION_ATTRIBUTES},
+        repr=False)
+    _relation_count: int = field(init=False, default=0, repr=False)
+    # counters of stats, updated whenever a node or relation is added
+    _node_counts: dict[type, int] = field(
+        init=False, default_factory=lambda: {Entity: 0, Activity: 0, Agent: 0}, repr=False)
+    _relation_counts: dict[str, int] = field(
+        init=False, default_factory=lambda: dict.fromkeys(_RELATION_ATTRIBUTES, 0), repr=False)
+    _out_degrees: dict[int, int] = field(init=False, default_factory=dict, repr=False)
+    _in_degrees: dict[int, int] = field(init=False, default_factory=dict, repr=False)
+    _id_characters: int = field(init=False, default=0, repr=False)
+    _timings: dict[str, float] = field(init=False, default_factory=dict, repr=False)
+    # results of ancestors/descendants, least recently used first, a result is
+    # dropped when a relation is added that may change it
+    _lineage_cache: OrderedDict[tuple, list[Node]] = field(
+        init=False, default_factory=OrderedDict, repr=False)
+    # node id -> keys of the cached results that start at or contain the node
+    _lineage_index: dict[str, set[tuple]] = field(init=False, default_factory=dict, repr=False)
+    # rdflib graph of get_rdflib_graph, built on its first use and afterwards only
+    # updated with the nodes that were added or changed since the last call
+    _rdflib_graph: Optional[Graph] = field(init=False, default=None, repr=False)
+    _dirty_nodes: dict[str, Node] = field(init=False, default_factory=dict, repr=False)
+    _journal: Optional[Journal] = field(init=False, default=None, repr=False)
+    _spill: Optional[SpillStore] = field(init=False, default=None, repr=False)
+    # evicted nodes that are still referenced (by the user or by other nodes)
+    _evicted: WeakValueDictionary = field(
+        init=False, default_factory=WeakValueDictionary, repr=False)
 
     def __post_init__(self):
         """check validity of namespace and and namespace abbreviation"""
 
+        self._validate_namespace()
+        # guards the graph and its nodes
+        self._lock = RLock() if self.thread_safe else nullcontext()
+        # one hook shared by all nodes of the graph
+        self._relation_hook = RelationHook(self._relation_added, self._lock)
+        if self.max_resident_nodes is not None:
+            self._spill = SpillStore(self.spill_file)
+        if self.journal is not None:
+            self._open_journal()
+
+    def _validate_namespace(self) -> None:
+        """raises an exception if namespace or namespace abbreviation are invalid"""
+
         # validate namespace
         # TODO rethink validation, we technically want to validate an IRI
         if not url(self.default_namespace):  # type: ignore
@@ -151,32 +481,54 @@ class ProvOntologyGraph:
             )
 
     def __str__(self) -> str:
-        """prints the contents of the provenance graph in a nice format."""
-        contents = "Provenance Graph Contents:"
-        contents += "\n    ---"
-        contents += "\n    Entities:"
-        contents += "\n        ---\n"
-        for entity in self._entities:
-            lines = entity.__str__().splitlines()
-            for line in lines:
-                contents += f"        {line}\n"
-        contents += "    ---"
-        contents += "\n    Activities:"
-        contents += "\n        ---\n"
-        for activity in self._activities:
-            lines = activity.__str__().splitlines()
-            for line in lines:
-                contents += f"        {line}\n"
-        contents += "    ---"
-        contents += "\n    Agents:"
-        contents += "\n        ---\n"
-        for agent in self._agents:
-            lines = agent.__str__().splitlines()
-            for line in lines:
-                contents += f"        {line}\n"
-        contents += "    ---"
-
-        return contents
+        """prints the contents of the provenance graph in a nice format,
+        at most summary_limit nodes per class."""
+        summary = StringIO()
+        self.write_summary(summary, limit=self.summary_limit, max_items=self.summary_limit)
+        return summary.getvalue()
+
+    def iter_lines(self, limit: Optional[int] = None, max_items: Optional[int] = None) -> Iterator[str]:
+        """yields the lines of the contents of the provenance graph in a nice format.
+        limit restricts the number of nodes that are listed per class, max_items the
+        number of related nodes that are listed per relation of a node.
+        the lock of the graph is only held while a node is formatted."""
+
+        yield "Provenance Graph Contents:"
+        for node_class, heading, plural in (
+                (Entity, "Entities", "entities"),
+                (Activity, "Activities", "activities"),
+                (Agent, "Agents", "agents")):
+            yield "    ---"
+            yield f"    {heading}:"
+            yield "        ---"
+            nodes = self._iter_nodes(node_class, with_labels=True)
+            for node in nodes if limit is None else islice(nodes, limit):
+                with self._lock:
+                    lines = [f"        {line}" for line in node.iter_lines(max_items)]
+                yield from lines
+            if limit is not None:
+                with self._lock:
+                    remaining = len(self._node_list(node_class)) - limit
+                    if self._spill is not None:
+                        remaining += self._spill.count(_CLASS_CODES[node_class])
+                if remaining > 0:
+                    yield f"        ... ({remaining} more {plural})"
+        yield "    ---"
+
+    @_timed
+    def write_summary(self, file: TextIO, limit: Optional[int] = None, max_items: Optional[int] = None) -> None:
+        """writes the contents of the provenance graph in a nice format into the
+        (text) file handle, see iter_lines for limit and max_items"""
+
+        with self._lock:
+            lines = self.iter_lines(limit, max_items)
+            file.write(next(lines))
+            while True:
+                chunk = list(islice(lines, 1000))
+                if not chunk:
+                    return
+                file.write("\n")
+                file.write("\n".join(chunk))
 
     def _handle_id(self, id: str = "", use_default_namespace: bool = False) -> str:
         """checks whether the provided namespace-id combination is
@@ -184,7 +536,7 @@ class ProvOntologyGraph:
         if no namespace is provided: default namespace is used,
         if no id is provided: id get automatically generated."""
 
-        if use_default_namespace:
+        if use_default_namespace and id:
             id = self.default_namespace + id
         if id:
             node_id = self._id_vault.add_id(id)
@@ -192,6 +544,347 @@ class ProvOntologyGraph:
             node_id = self._id_vault.generate(self.default_namespace)
         return node_id
 
+    def _register_node(self, node: Node) -> None:
+        """lets the graph index the node and track its relations"""
+        self._nodes[node.node_id] = node
+        node._on_relation = self._relation_hook
+        self._node_counts[type(node)] += 1
+        self._id_characters += len(node.node_id)
+        self._out_degrees[0] = self._out_degrees.get(0, 0) + 1
+        self._in_degrees[0] = self._in_degrees.get(0, 0) + 1
+        if self._rdflib_graph is not None:
+            self._dirty_nodes[node.node_id] = node
+        if self._journal is not None:
+            self._journal.append(
+                [NODE, _CLASS_CODES[type(node)], node.node_id, node.label, node.description])
+        if self._spill is not None and len(self._nodes) > self.max_resident_nodes:  # type: ignore
+            self._evict()
+
+    def _relation_added(self, relation: str, node: Node, target: object) -> None:
+        """gets called by the nodes of the graph if a relation is added"""
+        # the node already holds the lock of the graph
+        if self._spill is not None:
+            if node.node_id not in self._nodes:
+                # the node was evicted, its stored relations are loaded first
+                spilled = self._fault_in(node.node_id, node)
+                if spilled is not None and (relation, getattr(target, "node_id", None)) in spilled[1]:
+                    return
+            else:
+                self._touch(node.node_id)
+        if self._rdflib_graph is not None:
+            self._dirty_nodes[node.node_id] = node
+        if relation in ("label", "description"):
+            if self._journal is not None:
+                self._journal.append([ATTRIBUTE, relation, node.node_id, target])
+            return
+        inverse_relation = self._inverse_relations.get(relation)
+        if inverse_relation is not None:
+            self._relation_count += 1
+            self._relation_counts[relation] += 1
+            inverse_relation.setdefault(target.node_id, []).append(node)  # type: ignore
+            self._count_degrees(node, target)  # type: ignore
+            if self._lineage_cache:
+                self._forget_changed_lineages(relation, node.node_id, target.node_id)  # type: ignore
+        if self._journal is not None:
+            if inverse_relation is not None:
+                self._journal.append([RELATION, relation, node.node_id, target.node_id])  # type: ignore
+            else:
+                self._journal.append([TIME, relation, node.node_id, target.isoformat()])  # type: ignore
+
+    def _count_degrees(self, node: Node, target: Node) -> None:
+        """moves the source and the target of a new relation to their next degree"""
+
+        out_degree = sum(len(getattr(node, attribute)) for attribute in _OUTGOING_ATTRIBUTES[type(node)])
+        _move_degree(self._out_degrees, out_degree)
+        if target.node_id in self._nodes:
+            in_degree = sum(len(self._inverse_relations[relation].get(target.node_id, ()))
+                            for relation in _INCOMING_RELATIONS[type(target)])
+            _move_degree(self._in_degrees, in_degree)
+
+    def stats(self) -> GraphStats:
+        """returns the counters of the graph. they are updated whenever a node or
+        relation is added, i.e., no node is visited. with a memory budget, the
+        in-degrees only count the relations of the nodes in memory. the timings
+        are only recorded if profile is set."""
+
+        with self._lock:
+            relation_count = self._relation_count
+            return GraphStats(
+                nodes={class_name: self._node_counts[node_class] for node_class, class_name
+                       in ((Entity, "entity"), (Activity, "activity"), (Agent, "agent"))},
+                relations=dict(self._relation_counts),
+                out_degrees={degree: count for degree, count in sorted(self._out_degrees.items()) if count},
+                in_degrees={degree: count for degree, count in sorted(self._in_degrees.items()) if count},
+                ids=len(self._id_vault.vault),
+                approximate_bytes=sum(count * _NODE_BYTES[node_class]
+                                      for node_class, count in self._node_counts.items())
+                + self._id_characters + relation_count * _RELATION_BYTES,
+                timings=dict(self._timings),
+            )
+
+    def _open_journal(self) -> None:
+        """replays the journal (if it exists) and appends all further changes to it"""
+
+        if os.path.exists(self.journal) and os.path.getsize(self.journal):  # type: ignore
+            self._replay_journal(self.journal)  # type: ignore
+        else:
+            self._write_journal(self.journal)  # type: ignore
+        self._journal = Journal(self.journal, self.journal_sync_every)  # type: ignore
+
+    def _replay_journal(self, file_name: str) -> None:
+        """adds the nodes, relations, times and changed labels and descriptions of
+        the journal to the graph, record by record. targets of relations that are
+        no nodes of the graph (nodes of other graphs) are replayed as nodes that
+        do not belong to the graph."""
+
+        add_methods = (self.add_entity, self.add_activity, self.add_agent)
+        foreign_nodes: dict[str, Node] = {}
+        for record in read_journal(file_name):
+            kind = record[0]
+            if kind == HEADER:
+                if record[1:] != [self.default_namespace, self.namespace_abbreviation, self.lang]:
+                    raise JournalMismatch(
+                        f'The journal "{file_name}" was written for the namespace "{record[1]}" '
+                        f'(abbreviation "{record[2]}", language "{record[3]}"), not for the namespace '
+                        f'"{self.default_namespace}" (abbreviation "{self.namespace_abbreviation}", '
+                        f'language "{self.lang}").')
+            elif kind == NODE:
+                add_methods[record[1]](
+                    id=record[2], label=record[3], description=record[4], use_default_namespace=False)
+            elif kind == RELATION:
+                relation, source_id, target_id = record[1:]
+                if target_id in self._nodes or (self._spill is not None and target_id in self._spill):
+                    target = self.get_node(target_id)
+                else:
+                    target = foreign_nodes.get(target_id)
+                    if target is None:
+                        target_class = next(object_class for relation_, _, object_class
+                                            in _PROV_RELATIONS.values() if relation_ == relation)
+                        target = foreign_nodes[target_id] = target_class(node_id=target_id)
+                getattr(self.get_node(source_id), relation)(target)
+            elif kind == TIME:
+                getattr(self.get_node(record[2]), record[1])(datetime.fromisoformat(record[3]))
+            elif kind == ATTRIBUTE:
+                setattr(self.get_node(record[2]), record[1], record[3])
+
+    def _write_journal(self, file_name: str) -> None:
+        """writes the current state of the graph as journal"""
+
+        journal = Journal(file_name, sync_every=2**62)
+        journal.append([HEADER, self.default_namespace, self.namespace_abbreviation, self.lang])
+        shard = self.to_shard()
+        for code, node_id, label, description in zip(
+                shard.node_classes, shard.node_ids, shard.labels, shard.descriptions):
+            journal.append([NODE, code, node_id, label, description])
+        for relation, (sources, targets) in shard.relations.items():
+            for source_id, target_id in zip(sources, targets):
+                journal.append([RELATION, relation, source_id, target_id])
+        for relation, times in (("started_at_time", shard.start_times), ("ended_at_time", shard.end_times)):
+            for node_id, time in times.items():
+                journal.append([TIME, relation, node_id, time.isoformat()])
+        journal.close()
+
+    def sync_journal(self) -> None:
+        """writes the buffered records of the journal and forces them to disk"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.sync()
+
+    def close_journal(self) -> None:
+        """syncs and closes the journal, further changes are not journaled"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def compact_journal(self, file_name: Optional[str] = None, export_format: str = "nt") -> None:
+        """rewrites the journal with one record per node, relation and time
+        (e.g., without times that were overwritten). if file_name is given,
+        the graph is serialized there as well (see serialize_as_rdf)."""
+
+        with self._lock:
+            if file_name is not None:
+                self.serialize_as_rdf(file_name, export_format)
+            if self._journal is None:
+                return
+            self._journal.close()
+            compacted = self.journal + ".compacted"  # type: ignore
+            self._write_journal(compacted)
+            os.replace(compacted, self.journal)  # type: ignore
+            self._journal = Journal(self.journal, self.journal_sync_every)  # type: ignore
+
+    def _node_list(self, node_class: type) -> list:
+        return {Entity: self._entities, Activity: self._activities, Agent: self._agents}[node_class]
+
+    def _evict(self) -> None:
+        """moves the least recently used nodes (a tenth of the budget at once,
+        as the node lists are rebuilt) and their relations to the store"""
+
+        count = len(self._nodes) - self.max_resident_nodes + self.max_resident_nodes // 10 + 1  # type: ignore
+        nodes = list(islice(self._nodes.values(), count))
+        rows, relations, inverse_keys = [], [], set()
+        for node in nodes:
+            del self._nodes[node.node_id]
+            rows.append((node.node_id, _CLASS_CODES[type(node)], node.label, node.description,
+                         *(time.isoformat() if time else None for time in (
+                             getattr(node, "_start_time", None), getattr(node, "_end_time", None)))))
+            for relation, attribute in _RELATION_ATTRIBUTES.items():
+                related = getattr(node, attribute, None)
+                if related:
+                    for target_id in related:
+                        relations.append((node.node_id, relation, target_id))
+                        inverse_keys.add((relation, target_id))
+                    setattr(node, attribute, _NO_RELATIONS)
+            self._evicted[node.node_id] = node
+        self._spill.put(rows, relations)  # type: ignore
+
+        for relation, target_id in inverse_keys:
+            inverse_relation = self._inverse_relations[relation]
+            # a new list, as the old one may be iterated (e.g., by _lineage)
+            inverse_relation[target_id] = [
+                source for source in inverse_relation[target_id] if source.node_id in self._nodes]
+        for node_list in (self._entities, self._activities, self._agents):
+            node_list[:] = [node for node in node_list if node.node_id in self._nodes]
+        self._clear_lineages()
+
+    def _touch(self, node_id: str) -> None:
+        """moves the node in memory to the end of the eviction order (most recently used)"""
+
+        self._nodes[node_id] = self._nodes.pop(node_id)
+
+    def _restore(self, row: tuple, attach: bool = True) -> Node:
+        """creates a node (without relations) from a row of the store"""
+
+        node_id, code, label, description, start_time, end_time = row
+        node = _SHARD_CLASSES[code](node_id=node_id, label=label, description=description)
+        if start_time:
+            node._start_time = datetime.fromisoformat(start_time)  # type: ignore
+        if end_time:
+            node._end_time = datetime.fromisoformat(end_time)  # type: ignore
+        if attach:
+            node._on_relation = self._relation_hook
+            self._evicted[node_id] = node
+        return node
+
+    def _related_node(self, node_id: str, relation: str, with_label: bool = True) -> Node:
+        """returns the node with the id without loading it from the store,
+        the target of a relation of a node that is loaded"""
+
+        node = self._nodes.get(node_id) or self._evicted.get(node_id)
+        if node is not None:
+            return node
+        row = self._spill.get(node_id) if with_label else None  # type: ignore
+        if row is not None:
+            return self._restore(row)
+        # a node that is not part of the graph
+        target_class = next(object_class for relation_, _, object_class
+                            in _PROV_RELATIONS.values() if relation_ == relation)
+        return target_class(node_id=node_id)
+
+    def _fault_in(self, node_id: str, node: Optional[Node] = None) -> Optional[tuple[Node, list]]:
+        """loads the node and its relations from the store back into the graph,
+        returns the node and the loaded relations or None, if the node is not stored"""
+
+        with self._lock:
+            taken = self._spill.take(node_id)  # type: ignore
+            if taken is None:
+                return None
+            row, relations = taken
+            if node is None:
+                node = self._evicted.get(node_id) or self._restore(row)
+            for relation, target_id in relations:
+                attribute = _RELATION_ATTRIBUTES[relation]
+                related = getattr(node, attribute)
+                if related is _NO_RELATIONS:
+                    related = {}
+                    setattr(node, attribute, related)
+                if target_id not in related:
+                    related[target_id] = self._related_node(target_id, relation)
+                self._inverse_relations[relation].setdefault(target_id, []).append(node)
+            self._nodes[node_id] = node
+            self._node_list(type(node)).append(node)
+            self._evicted.pop(node_id, None)
+            if self._lineage_cache:
+                self._clear_lineages()
+            if len(self._nodes) > self.max_resident_nodes:  # type: ignore
+                self._evict()
+            return node, relations
+
+    def _spilled_neighbours(self, node_id: str, upstream: bool, relations: Iterable[str]) -> list[Node]:
+        """returns the nodes the stored relations of the node lead to (upstream) or
+        the stored nodes that have one of the relations to the node, without
+        loading the nodes into the graph"""
+
+        if upstream:
+            return [self._related_node(target_id, relation)
+                    for relation, target_id in self._spill.relations(node_id)  # type: ignore
+                    if relation in relations]
+        return [self._related_node(source_id, relation)
+                for relation in relations
+                for source_id in self._spill.sources(relation, node_id)]  # type: ignore
+
+    def _iter_nodes(self, node_class: type, with_labels: bool = False) -> Iterator[Node]:
+        """yields the nodes of the class, first the ones in memory, then the stored ones.
+        stored nodes are created on the fly (with their relations) without loading them
+        into the graph, the targets of their relations only have an id unless
+        with_labels is set."""
+
+        yield from list(self._node_list(node_class))
+        if self._spill is None:
+            return
+        for row in self._spill.rows(_CLASS_CODES[node_class]):
+            yield self._stored_node(row, with_labels)
+
+    def _stored_node(self, row: tuple, with_labels: bool = False) -> Node:
+        """creates a node with its relations from a row of the store,
+        without loading it into the graph"""
+
+        node = self._restore(row, attach=False)
+        for relation, target_id in self._spill.relations(node.node_id):  # type: ignore
+            attribute = _RELATION_ATTRIBUTES[relation]
+            if getattr(node, attribute) is _NO_RELATIONS:
+                setattr(node, attribute, {})
+            getattr(node, attribute)[target_id] = self._related_node(
+                target_id, relation, with_label=with_labels)
+        return node
+
+    def _select(self, selection: NodeSelection) -> dict[str, Node]:
+        """returns the selected nodes by id (seeds first, then ordered by distance).
+        only the lineage of the seeds is traversed, i.e., the cost depends on
+        the size of the selection rather than on the size of the graph."""
+
+        with self._lock:
+            if selection.direction not in ("upstream", "downstream", "both"):
+                raise SelectionMalformed(
+                    f'The direction "{selection.direction}" is not valid, use "upstream", "downstream" or "both".')
+            if selection.seeds is None:
+                candidates: Iterable[Node] = chain.from_iterable(
+                    self._iter_nodes(node_class) for node_class in _SHARD_CLASSES)
+            else:
+                seeds = [self.get_node(seed) if isinstance(seed, str) else seed
+                         for seed in selection.seeds]
+                relations = None if selection.relations is None else tuple(selection.relations)
+                lineages = []
+                for seed in seeds:
+                    if selection.direction != "downstream":
+                        lineages.append(self._lineage(seed, True, selection.depth, relations))
+                    if selection.direction != "upstream":
+                        lineages.append(self._lineage(seed, False, selection.depth, relations))
+                candidates = chain(seeds, chain.from_iterable(lineages))
+
+            selected = {}
+            for node in candidates:
+                if node.node_id in selected:
+                    continue
+                if self._spill is not None and node.node_id not in self._nodes:
+                    # evicted nodes (or their shells) are taken from the store with their relations
+                    row = self._spill.get(node.node_id)
+                    if row is not None:
+                        node = self._stored_node(row, with_labels=True)
+                if selection.predicate is None or selection.predicate(node):
+                    selected[node.node_id] = node
+            return selected
+
     def add_entity(
         self,
         id: str = "",
@@ -201,9 +894,11 @@ class ProvOntologyGraph:
     ) -> Entity:
         """creates a new entity, adds it to the graph and returns it then"""
 
-        node_id = self._handle_id(id, use_default_namespace)
-        entity = Entity(node_id=node_id, label=label, description=description)
-        self._entities.append(entity)
+        with self._lock:
+            node_id = self._handle_id(id, use_default_namespace)
+            entity = Entity(node_id=node_id, label=label, description=description)
+            self._entities.append(entity)
+            self._register_node(entity)
         return entity
 
     def add_activity(
@@ -215,10 +910,12 @@ class ProvOntologyGraph:
     ) -> Activity:
         """creates a new activity, adds it to the graph and returns it then"""
 
-        node_id = self._handle_id(id, use_default_namespace)
-        activity = Activity(node_id=node_id, label=label,
-                            description=description)
-        self._activities.append(activity)
+        with self._lock:
+            node_id = self._handle_id(id, use_default_namespace)
+            activity = Activity(node_id=node_id, label=label,
+                                description=description)
+            self._activities.append(activity)
+            self._register_node(activity)
         return activity
 
     def add_agent(
@@ -230,340 +927,912 @@ class ProvOntologyGraph:
     ) -> Agent:
         """creates a new agent, adds it to the graph and returns it then"""
 
-        node_id = self._handle_id(id, use_default_namespace)
-        agent = Agent(node_id=node_id, label=label, description=description)
-        self._agents.append(agent)
+        with self._lock:
+            node_id = self._handle_id(id, use_default_namespace)
+            agent = Agent(node_id=node_id, label=label, description=description)
+            self._agents.append(agent)
+            self._register_node(agent)
         return agent
 
-    # TODO
-    # def read_graph(self, file_path: str) -> None:
-    #     """reads the contents of an existing PROV-O provenance graph."""
+    def _add_nodes(
+        self,
+        node_class: type,
+        node_list: list,
+        ids: Optional[Iterable[str]],
+        labels: Optional[Iterable[str]],
+        descriptions: Optional[Iterable[str]],
+        use_default_namespace: bool,
+    ) -> list:
+        """creates the nodes of a batch in one pass, the ids are registered
+        at once, empty ids get generated"""
+
+        columns = {}
+        if ids is not None:
+            columns["ids"] = list(ids)
+        if labels is not None:
+            columns["labels"] = list(labels)
+        if descriptions is not None:
+            columns["descriptions"] = list(descriptions)
+        size = max((len(column) for column in columns.values()), default=0)
+        if any(len(column) != size for column in columns.values()):
+            raise BatchMalformed(
+                f"The provided columns differ in length: {', '.join(f'{name} ({len(column)})' for name, column in columns.items())}.")
+        node_ids = columns.get("ids") or [""] * size
+        labels = columns.get("labels") or [""] * size
+        descriptions = columns.get("descriptions") or [""] * size
 
-    #     pass
+        if use_default_namespace:
+            node_ids = [self.default_namespace + id if id else id for id in node_ids]
+        user_ids = [id for id in node_ids if id]
+        with self._lock:
+            self._id_vault.add_ids(user_ids)
+            if len(user_ids) < size:
+                generated_ids = iter(self._id_vault.reserve(
+                    size - len(user_ids), self.default_namespace))
+                node_ids = [id or next(generated_ids) for id in node_ids]
+
+            nodes = [
+                node_class(node_id=node_id, label=label, description=description)
+                for node_id, label, description in zip(node_ids, labels, descriptions)
+            ]
+            node_list.extend(nodes)
+            for node in nodes:
+                self._register_node(node)
+        return nodes
+
+    def add_entities(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        descriptions: Optional[Iterable[str]] = None,
+        use_default_namespace: bool = True,
+    ) -> list[Entity]:
+        """creates several entities at once (one per id, label or description)
+        and adds them to the graph. if one of the ids is invalid or already used,
+        none of the entities is added."""
 
-    def get_rdflib_graph(self) -> Graph:
-        """returns the provenance graph as rdflib.Graph()."""
+        return self._add_nodes(
+            Entity, self._entities, ids, labels, descriptions, use_default_namespace)
 
-        provenance_graph = Graph()
-        provenance_graph.bind("dc", DC)
-        provenance_graph.bind("foaf", FOAF)
-        provenance_graph.bind("rdf", RDF)
-        provenance_graph.bind("rdfs", RDFS)
-        provenance_graph.bind("prov", PROV)
-        provenance_graph.bind(self.namespace_abbreviation,
-                              Namespace(self.default_namespace))
+    def add_activities(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        descriptions: Optional[Iterable[str]] = None,
+        use_default_namespace: bool = True,
+    ) -> list[Activity]:
+        """creates several activities at once, see add_entities"""
+
+        return self._add_nodes(
+            Activity, self._activities, ids, labels, descriptions, use_default_namespace)
+
+    def add_agents(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        descriptions: Optional[Iterable[str]] = None,
+        use_default_namespace: bool = True,
+    ) -> list[Agent]:
+        """creates several agents at once, see add_entities"""
 
-        for node in self._entities + self._activities + self._agents:
-            if node.label:
-                provenance_graph.add(
-                    (
-                        URIRef(node.node_id),
-                        RDFS.label,
-                        Literal(node.label, lang=self.lang),
+        return self._add_nodes(
+            Agent, self._agents, ids, labels, descriptions, use_default_namespace)
+
+    def add_relations(
+        self,
+        relation: str,
+        sources: Iterable[Union[Node, str]],
+        targets: Iterable[Union[Node, str]],
+    ) -> None:
+        """adds the relation (e.g., "was_generated_by") between each source and
+        the target at the same position. sources and targets are nodes or ids
+        of nodes of this graph. all rows are checked before the first relation
+        is added, i.e., the graph stays unchanged if one of them is invalid."""
+
+        if relation not in _RELATION_ATTRIBUTES:
+            raise BatchMalformed(
+                f'The relation "{relation}" does not exist, available relations are: {", ".join(_RELATION_ATTRIBUTES)}.')
+        sources, targets = list(sources), list(targets)
+        if len(sources) != len(targets):
+            raise BatchMalformed(
+                f"The provided columns differ in length: sources ({len(sources)}), targets ({len(targets)}).")
+        source_class, target_class = next((subject_class, object_class) for relation_, subject_class, object_class
+                                          in _PROV_RELATIONS.values() if relation_ == relation)
+        with self._lock:
+            nodes = self._nodes
+            rows = []
+            for source, target in zip(sources, targets):
+                if isinstance(source, str):
+                    source = nodes[source] if source in nodes else self.get_node(source)
+                if isinstance(target, str):
+                    target = nodes[target] if target in nodes else self.get_node(target)
+                if not isinstance(source, source_class):
+                    raise InvalidProvClassForThisRelation(
+                        f"""The PROV relation "{relation.replace('_', ' ')}" starts at an {source_class.__name__}.
+                        In contradiction to this, the provided source is of the type {type(source)}."""
                     )
-                )
-            if node.description:
-                provenance_graph.add(
-                    (
-                        URIRef(node.node_id),
-                        RDFS.comment,
-                        Literal(node.description, lang=self.lang),
+                if not isinstance(target, target_class):
+                    raise InvalidProvClassForThisRelation(
+                        f"""The PROV relation "{relation.replace('_', ' ')}" refers to an {target_class.__name__}.
+                        In contradiction to this, the provided target is of the type {type(target)}."""
                     )
-                )
-        for entity in self._entities:
-            provenance_graph.add(
-                (URIRef(entity.node_id), RDF.type, PROV.Entity))
-            for activity in entity._was_generated_by_activities:
-                provenance_graph.add(
-                    (
-                        URIRef(entity.node_id),
-                        PROV.wasGeneratedBy,
-                        URIRef(activity.node_id),
+                rows.append((source, target))
+            for source, target in rows:
+                getattr(source, relation)(target)
+
+    def to_shard(self) -> GraphShard:
+        """returns the contents of the graph as GraphShard. relations to nodes
+        that do not belong to the graph are kept (by id), they are resolved when
+        the shard is merged."""
+
+        with self._lock:
+            entities, activities, agents = (
+                list(self._iter_nodes(node_class)) for node_class in _SHARD_CLASSES)
+            nodes = entities + activities + agents
+            relations = {}
+            for relation, attribute in _RELATION_ATTRIBUTES.items():
+                sources, targets = [], []
+                for node in nodes:
+                    for target_id in getattr(node, attribute, ()):
+                        sources.append(node.node_id)
+                        targets.append(target_id)
+                if sources:
+                    relations[relation] = (tuple(sources), tuple(targets))
+            return GraphShard(
+                default_namespace=self.default_namespace,
+                namespace_abbreviation=self.namespace_abbreviation,
+                lang=self.lang,
+                node_classes=bytes(len(entities) * [0] + len(activities) * [1] + len(agents) * [2]),
+                node_ids=tuple(node.node_id for node in nodes),
+                labels=tuple(node.label for node in nodes),
+                descriptions=tuple(node.description for node in nodes),
+                relations=relations,
+                start_times={activity.node_id: activity._start_time for activity in activities
+                             if activity._start_time},  # type: ignore
+                end_times={activity.node_id: activity._end_time for activity in activities
+                           if activity._end_time},  # type: ignore
+            )
+
+    def merge(self, *others: Union["ProvOntologyGraph", GraphShard]) -> None:
+        """adds the nodes and relations of the other graphs (or shards) to the graph.
+        relations may refer to nodes of any of the merged graphs or of this graph.
+        if an id is used more than once, IdAlreadyUsed is raised, if a relation
+        refers to an unknown node, NodeNotFound is raised, if a relation or a time
+        refers to a node of the wrong class, InvalidProvClassForThisRelation is
+        raised. in all cases nothing is added."""
+
+        shards = [other.to_shard() if isinstance(other, ProvOntologyGraph) else other
+                  for other in others]
+        with self._lock:
+            node_classes = {}
+            for shard in shards:
+                node_classes.update(zip(shard.node_ids, (_SHARD_CLASSES[code]
+                                                         for code in shard.node_classes)))
+            def node_class_of(node_id: str) -> Optional[type]:
+                if node_id in node_classes:
+                    return node_classes[node_id]
+                if node_id in self._nodes:
+                    return type(self._nodes[node_id])
+                if self._spill is not None:
+                    row = self._spill.get(node_id)
+                    return _SHARD_CLASSES[row[1]] if row else None
+                return None
+
+            def check_node(node_id: str, expected_class: type, usage: str) -> None:
+                found_class = node_class_of(node_id)
+                if found_class is None:
+                    raise NodeNotFound(
+                        f'The {usage} refers to the node "{node_id}", which is not part of the merged graphs.')
+                if found_class is not expected_class:
+                    raise InvalidProvClassForThisRelation(
+                        f"""The {usage} refers to an {expected_class.__name__}.
+                        In contradiction to this, the node "{node_id}" is of the type {found_class}."""
                     )
+
+            # check the relations and times first, so that a failing merge leaves the graph untouched
+            for shard in shards:
+                for relation, (sources, targets) in shard.relations.items():
+                    source_class, target_class = next(
+                        (subject_class, object_class) for relation_, subject_class, object_class
+                        in _PROV_RELATIONS.values() if relation_ == relation)
+                    usage = f'PROV relation "{relation.replace("_", " ")}"'
+                    for source_id in sources:
+                        check_node(source_id, source_class, usage)
+                    for target_id in targets:
+                        check_node(target_id, target_class, usage)
+                for times, usage in ((shard.start_times, "start time"), (shard.end_times, "end time")):
+                    for node_id in times:
+                        check_node(node_id, Activity, usage)
+            self._id_vault.add_ids(chain.from_iterable(shard.node_ids for shard in shards))
+
+            node_lists = {Entity: self._entities, Activity: self._activities, Agent: self._agents}
+            for shard in shards:
+                for code, node_id, label, description in zip(
+                        shard.node_classes, shard.node_ids, shard.labels, shard.descriptions):
+                    node_class = _SHARD_CLASSES[code]
+                    node = node_class(node_id=node_id, label=label, description=description)
+                    node_lists[node_class].append(node)
+                    self._register_node(node)
+            for shard in shards:
+                for relation, (sources, targets) in shard.relations.items():
+                    self.add_relations(relation, sources, targets)
+                for node_id, time in shard.start_times.items():
+                    self.get_node(node_id).started_at_time(time)  # type: ignore
+                for node_id, time in shard.end_times.items():
+                    self.get_node(node_id).ended_at_time(time)  # type: ignore
+
+    @classmethod
+    def from_shards(
+        cls, shards: Iterable[Union["ProvOntologyGraph", GraphShard]], **kwargs
+    ) -> "ProvOntologyGraph":
+        """creates a graph that contains the nodes and relations of all shards (or
+        graphs), see merge. the keyword arguments are passed to ProvOntologyGraph,
+        namespace, namespace abbreviation and language default to the ones of the
+        first shard."""
+
+        shards = list(shards)
+        if shards:
+            kwargs.setdefault("default_namespace", shards[0].default_namespace)
+            kwargs.setdefault("namespace_abbreviation", shards[0].namespace_abbreviation)
+            kwargs.setdefault("lang", shards[0].lang)
+        graph = cls(**kwargs)
+        graph.merge(*shards)
+        return graph
+
+    def get_node(self, id: str, use_default_namespace: bool = False) -> Node:
+        """returns the entity, activity or agent with the id"""
+
+        if use_default_namespace:
+            id = self.default_namespace + id
+        if self._spill is not None:
+            with self._lock:
+                if id in self._nodes:
+                    self._touch(id)
+        try:
+            return self._nodes[id]
+        except KeyError:
+            if self._spill is not None:
+                spilled = self._fault_in(id)
+                if spilled is not None:
+                    return spilled[0]
+            raise NodeNotFound(
+                f'There is no node with the id "{id}" in this graph.') from None
+
+    def _get_typed_node(self, id: str, use_default_namespace: bool, node_class: type) -> Node:
+        node = self.get_node(id, use_default_namespace)
+        if not isinstance(node, node_class):
+            raise NodeNotFound(
+                f'The node with the id "{node.node_id}" is not an {node_class.__name__}, but an {type(node).__name__}.')
+        return node
+
+    def get_entity(self, id: str, use_default_namespace: bool = False) -> Entity:
+        """returns the entity with the id"""
+        return self._get_typed_node(id, use_default_namespace, Entity)  # type: ignore
+
+    def get_activity(self, id: str, use_default_namespace: bool = False) -> Activity:
+        """returns the activity with the id"""
+        return self._get_typed_node(id, use_default_namespace, Activity)  # type: ignore
+
+    def get_agent(self, id: str, use_default_namespace: bool = False) -> Agent:
+        """returns the agent with the id"""
+        return self._get_typed_node(id, use_default_namespace, Agent)  # type: ignore
+
+    def count_relations(self) -> int:
+        """returns the number of relations between the nodes of the graph
+        (start and end times are no relations)"""
+        return self._relation_count
+
+    def inverse_relations(self, node: Node, relation: str) -> list[Node]:
+        """returns the nodes that have the relation to the node, e.g.,
+        inverse_relations(activity, "was_generated_by") returns the entities
+        that were generated by the activity"""
+
+        sources = list(self._inverse_relations[relation].get(node.node_id, ()))
+        if self._spill is not None:
+            sources.extend(self._spilled_neighbours(node.node_id, False, (relation,)))
+        return sources
+
+    def generated(self, activity: Activity) -> list[Entity]:
+        """returns the entities that were generated by the activity"""
+        return self.inverse_relations(activity, "was_generated_by")  # type: ignore
+
+    def derived(self, entity: Entity) -> list[Entity]:
+        """returns the entities that were derived from the entity"""
+        return self.inverse_relations(entity, "was_derived_from")  # type: ignore
+
+    def attributed(self, agent: Agent) -> list[Entity]:
+        """returns the entities that are attributed to the agent"""
+        return self.inverse_relations(agent, "was_attributed_to")  # type: ignore
+
+    def used_by(self, entity: Entity) -> list[Activity]:
+        """returns the activities that used the entity"""
+        return self.inverse_relations(entity, "used")  # type: ignore
+
+    def informed(self, activity: Activity) -> list[Activity]:
+        """returns the activities that were informed by the activity"""
+        return self.inverse_relations(activity, "was_informed_by")  # type: ignore
+
+    def associated(self, agent: Agent) -> list[Activity]:
+        """returns the activities the agent is associated with"""
+        return self.inverse_relations(agent, "was_associated_with")  # type: ignore
+
+    def instructed(self, agent: Agent) -> list[Agent]:
+        """returns the agents that acted on behalf of the agent"""
+        return self.inverse_relations(agent, "acted_on_behalf_of")  # type: ignore
+
+    def _lineage(
+        self,
+        node: Node,
+        upstream: bool,
+        max_depth: Optional[int],
+        relations: Optional[Iterable[str]],
+    ) -> list[Node]:
+        """breadth first traversal along (or against) the relations,
+        every node is visited once, which also handles cycles"""
+
+        with self._lock:
+            relations = tuple(_RELATION_ATTRIBUTES) if relations is None else tuple(relations)
+            key = (upstream, node.node_id, max_depth, frozenset(relations))
+            if key in self._lineage_cache:
+                self._lineage_cache.move_to_end(key)
+                return list(self._lineage_cache[key])
+
+            if upstream:
+                attributes = [_RELATION_ATTRIBUTES[relation] for relation in relations]
+            else:
+                inverse_relations = [self._inverse_relations[relation] for relation in relations]
+            visited = {node.node_id}
+            lineage = []
+            frontier = [node]
+            depth = 0
+            while frontier and (max_depth is None or depth < max_depth):
+                next_frontier = []
+                for current in frontier:
+                    if upstream:
+                        neighbours = chain.from_iterable(
+                            getattr(current, attribute, {}).values() for attribute in attributes)
+                    else:
+                        neighbours = chain.from_iterable(
+                            inverse_relation.get(current.node_id, ()) for inverse_relation in inverse_relations)
+                    if self._spill is not None and (not upstream or current.node_id not in self._nodes):
+                        neighbours = chain(neighbours, self._spilled_neighbours(
+                            current.node_id, upstream, relations))
+                    for neighbour in neighbours:
+                        if neighbour.node_id not in visited:
+                            visited.add(neighbour.node_id)
+                            lineage.append(neighbour)
+                            next_frontier.append(neighbour)
+                frontier = next_frontier
+                depth += 1
+
+            self._cache_lineage(key, lineage)
+            return list(lineage)
+
+    def _cache_lineage(self, key: tuple, lineage: list[Node]) -> None:
+        """caches the result and drops the least recently used one beyond lineage_cache_size"""
+
+        self._lineage_cache[key] = lineage
+        for node_id in chain((key[1],), (node.node_id for node in lineage)):
+            self._lineage_index.setdefault(node_id, set()).add(key)
+        if len(self._lineage_cache) > self.lineage_cache_size:
+            self._forget_lineage(next(iter(self._lineage_cache)))
+
+    def _forget_lineage(self, key: tuple) -> None:
+        lineage = self._lineage_cache.pop(key)
+        for node_id in chain((key[1],), (node.node_id for node in lineage)):
+            keys = self._lineage_index.get(node_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._lineage_index[node_id]
+
+    def _forget_changed_lineages(self, relation: str, source_id: str, target_id: str) -> None:
+        """drops the cached results a new relation may change: the ancestors of the
+        source (or of nodes with the source as ancestor) and the descendants of the
+        target (or of nodes with the target as descendant)"""
+
+        changed = [key for key in self._lineage_index.get(source_id, ()) if key[0] and relation in key[3]]
+        changed.extend(key for key in self._lineage_index.get(target_id, ()) if not key[0] and relation in key[3])
+        for key in changed:
+            self._forget_lineage(key)
+
+    def _clear_lineages(self) -> None:
+        self._lineage_cache = OrderedDict()
+        self._lineage_index = {}
+
+    def ancestors(
+        self,
+        node: Node,
+        max_depth: Optional[int] = None,
+        relations: Optional[Iterable[str]] = None,
+    ) -> list[Node]:
+        """returns the upstream lineage of the node, i.e., all nodes that can be
+        reached by following its relations (e.g., the activity an entity was
+        generated by, the entities the activity used, ...), ordered by distance.
+        max_depth limits the number of relations followed, relations restricts
+        the traversal to the given relations (e.g., ["was_derived_from"])."""
+
+        return self._lineage(node, True, max_depth, relations)
+
+    def descendants(
+        self,
+        node: Node,
+        max_depth: Optional[int] = None,
+        relations: Optional[Iterable[str]] = None,
+    ) -> list[Node]:
+        """returns the downstream lineage of the node, i.e., all nodes that can reach
+        the node via their relations (e.g., the activities that used an entity, the
+        entities that were generated by these activities, ...), ordered by distance.
+        max_depth and relations work as for ancestors."""
+
+        return self._lineage(node, False, max_depth, relations)
+
+    def read_graph(self, file_name: str, import_format: str = "turtle") -> None:
+        """reads the contents of an existing PROV-O provenance graph, i.e., adds its
+        entities, activities and agents and their relations to this graph.
+        the ids of all nodes are registered at once, if one of them is already used
+        in this graph, nothing is added. "nt" and "nquads" files are parsed line by
+        line, all other formats supported by rdflib are parsed with rdflib."""
+
+        if import_format in ("nt", "nt11", "ntriples", "nquads"):
+            with open(file_name, encoding="utf-8") as f:
+                self._add_triples(self._read_ntriples(f))
+        else:
+            graph = Graph().parse(file_name, format=import_format)
+            self._add_triples(
+                (str(s), str(p), o if isinstance(o, Literal) else str(o))
+                for s, p, o in graph
+                if not isinstance(s, BNode) and not isinstance(o, BNode)
+            )
+
+    def _read_ntriples(self, lines: Iterable[str]) -> Iterator[tuple]:
+        """yields the triples of n-triples lines, skips comments and blank nodes"""
+
+        for line_number, line in enumerate(lines, start=1):
+            triple = parse_ntriples_line(line)
+            if triple:
+                yield triple
+            elif line.strip() and not line.lstrip().startswith("#") and "_:" not in line:
+                raise NTriplesLineMalformed(
+                    f"Line {line_number} is not a valid N-Triples line: {line.strip()}")
+
+    def _add_triples(self, triples: Iterable[tuple]) -> None:
+        """creates the nodes and relations described by the triples. iris are
+        expected as str, literals as rdflib.Literal."""
+
+        with self._lock:
+            node_classes = {}
+            inferred_node_classes = {}
+            labels = {}
+            descriptions = {}
+            relations = []
+            times = []
+            rdf_type, rdfs_label, rdfs_comment = str(RDF.type), str(RDFS.label), str(RDFS.comment)
+            started_at_time, ended_at_time = str(PROV.startedAtTime), str(PROV.endedAtTime)
+
+            for subject, predicate, obj in triples:
+                if isinstance(obj, Literal):
+                    if predicate == rdfs_label:
+                        if subject not in labels or obj.language == self.lang:
+                            labels[subject] = str(obj)
+                    elif predicate == rdfs_comment:
+                        if subject not in descriptions or obj.language == self.lang:
+                            descriptions[subject] = str(obj)
+                    elif predicate in (started_at_time, ended_at_time):
+                        times.append((subject, predicate, obj))
+                        inferred_node_classes.setdefault(subject, Activity)
+                elif predicate == rdf_type:
+                    if obj in _PROV_CLASSES:
+                        node_classes.setdefault(subject, _PROV_CLASSES[obj])
+                elif predicate in _PROV_RELATIONS:
+                    relations.append((subject, predicate, obj))
+                    # node classes follow from domain and range of the properties
+                    _, subject_class, object_class = _PROV_RELATIONS[predicate]
+                    inferred_node_classes.setdefault(subject, subject_class)
+                    inferred_node_classes.setdefault(obj, object_class)
+
+            for node_id, node_class in inferred_node_classes.items():
+                node_classes.setdefault(node_id, node_class)
+            self._id_vault.add_ids(node_classes)
+
+            nodes = {}
+            node_lists = {Entity: self._entities,
+                          Activity: self._activities, Agent: self._agents}
+            for node_id, node_class in node_classes.items():
+                node = node_class(
+                    node_id=node_id,
+                    label=labels.get(node_id, ""),
+                    description=descriptions.get(node_id, ""),
                 )
-            for origin_entity in entity._was_derived_from_entities:
-                provenance_graph.add(
-                    (
-                        URIRef(entity.node_id),
-                        PROV.wasDerivedFrom,
-                        URIRef(origin_entity.node_id),
-                    )
+                node_lists[node_class].append(node)
+                self._register_node(node)
+                nodes[node_id] = node
+
+            for subject, predicate, obj in relations:
+                relation, subject_class, object_class = _PROV_RELATIONS[predicate]
+                node, target = nodes[subject], nodes[obj]
+                # skip relations that contradict explicitly stated node classes
+                if isinstance(node, subject_class) and isinstance(target, object_class):
+                    getattr(node, relation)(target)
+            for subject, predicate, obj in times:
+                activity, time = nodes[subject], obj.toPython()
+                if isinstance(activity, Activity) and isinstance(time, datetime):
+                    if predicate == started_at_time:
+                        activity.started_at_time(time)
+                    else:
+                        activity.ended_at_time(time)
+
+    def _node_triples(self, node: Node) -> Iterator[tuple]:
+        """yields the rdf triples that describe the node"""
+
+        if node.label:
+            yield (
+                URIRef(node.node_id),
+                RDFS.label,
+                Literal(node.label, lang=self.lang),
+            )
+        if node.description:
+            yield (
+                URIRef(node.node_id),
+                RDFS.comment,
+                Literal(node.description, lang=self.lang),
+            )
+        if isinstance(node, Entity):
+            yield (URIRef(node.node_id), RDF.type, PROV.Entity)
+            for activity in node._was_generated_by_activities.values():
+                yield (
+                    URIRef(node.node_id),
+                    PROV.wasGeneratedBy,
+                    URIRef(activity.node_id),
                 )
-            for agent in entity._was_attributed_to_agents:
-                provenance_graph.add(
-                    (
-                        URIRef(entity.node_id),
-                        PROV.wasAttributedTo,
-                        URIRef(agent.node_id),
-                    )
+            for origin_entity in node._was_derived_from_entities.values():
+                yield (
+                    URIRef(node.node_id),
+                    PROV.wasDerivedFrom,
+                    URIRef(origin_entity.node_id),
                 )
-        for activity in self._activities:
-            provenance_graph.add(
-                (URIRef(activity.node_id), RDF.type, PROV.Activity))
-            if activity._start_time:
-                provenance_graph.add(
-                    (
-                        URIRef(activity.node_id),
-                        PROV.startedAtTime,
-                        Literal(activity._start_time, datatype=XSD.dateTime),
-                    )
+            for agent in node._was_attributed_to_agents.values():
+                yield (
+                    URIRef(node.node_id),
+                    PROV.wasAttributedTo,
+                    URIRef(agent.node_id),
                 )
-            if activity._end_time:
-                provenance_graph.add(
-                    (
-                        URIRef(activity.node_id),
-                        PROV.endedAtTime,
-                        Literal(activity._end_time, datatype=XSD.dateTime),
-                    )
+        elif isinstance(node, Activity):
+            yield (URIRef(node.node_id), RDF.type, PROV.Activity)
+            if node._start_time:
+                yield (
+                    URIRef(node.node_id),
+                    PROV.startedAtTime,
+                    Literal(node._start_time, datatype=XSD.dateTime),
                 )
-            for entity in activity._used_entities:
-                provenance_graph.add(
-                    (URIRef(activity.node_id), PROV.used, URIRef(entity.node_id))
+            if node._end_time:
+                yield (
+                    URIRef(node.node_id),
+                    PROV.endedAtTime,
+                    Literal(node._end_time, datatype=XSD.dateTime),
                 )
-            for previous_activity in activity._was_informed_by_activities:
-                provenance_graph.add(
-                    (
-                        URIRef(activity.node_id),
-                        PROV.wasInformedBy,
-                        URIRef(previous_activity.node_id),
-                    )
+            for entity in node._used_entities.values():
+                yield (URIRef(node.node_id), PROV.used, URIRef(entity.node_id))
+            for previous_activity in node._was_informed_by_activities.values():
+                yield (
+                    URIRef(node.node_id),
+                    PROV.wasInformedBy,
+                    URIRef(previous_activity.node_id),
                 )
-            for agent in activity._was_associated_with_agents:
-                provenance_graph.add(
-                    (
-                        URIRef(agent.node_id),
-                        PROV.wasAssociatedWith,
-                        URIRef(agent.node_id),
-                    )
+            for agent in node._was_associated_with_agents.values():
+                yield (
+                    URIRef(node.node_id),
+                    PROV.wasAssociatedWith,
+                    URIRef(agent.node_id),
                 )
-        for agent in self._agents:
-            provenance_graph.add((URIRef(agent.node_id), RDF.type, PROV.Agent))
-            for instructor in agent._acted_on_behalf_of_agents:
-                provenance_graph.add(
-                    (
-                        URIRef(agent.node_id),
-                        PROV.actedOnBehalfOf,
-                        URIRef(instructor.node_id),
-                    )
+        elif isinstance(node, Agent):
+            yield (URIRef(node.node_id), RDF.type, PROV.Agent)
+            for instructor in node._acted_on_behalf_of_agents.values():
+                yield (
+                    URIRef(node.node_id),
+                    PROV.actedOnBehalfOf,
+                    URIRef(instructor.node_id),
                 )
 
+    def _selected_triples(self, selected: dict[str, Node]) -> Iterator[tuple]:
+        """yields the triples of the selected nodes and of the relations between them"""
+
+        for node in selected.values():
+            for triple in self._node_triples(node):
+                if triple[1] not in _RELATION_PREDICATES or str(triple[2]) in selected:
+                    yield triple
+
+    def _new_rdflib_graph(self) -> Graph:
+        provenance_graph = Graph()
+        provenance_graph.bind("dc", DC)
+        provenance_graph.bind("foaf", FOAF)
+        provenance_graph.bind("rdf", RDF)
+        provenance_graph.bind("rdfs", RDFS)
+        provenance_graph.bind("prov", PROV)
+        provenance_graph.bind(self.namespace_abbreviation,
+                              Namespace(self.default_namespace))
+        return provenance_graph
+
+    @_timed
+    def get_rdflib_graph(self, selection: Optional[NodeSelection] = None) -> Graph:
+        """returns the provenance graph as rdflib.Graph().
+        the rdflib graph is built on the first call, subsequent calls only update
+        the nodes that were added or changed since then and return the same
+        rdflib graph. triples added to it by the user are kept in it, but they
+        are not serialized by serialize_as_rdf.
+        with a selection, a new rdflib graph of the selected part is returned."""
+
+        with self._lock:
+            if selection is not None:
+                provenance_graph = self._new_rdflib_graph()
+                for triple in self._selected_triples(self._select(selection)):
+                    provenance_graph.add(triple)
+                return provenance_graph
+            if self._rdflib_graph is None:
+                self._rdflib_graph = self._full_rdflib_graph()
+            else:
+                self._update_rdflib_graph(self._rdflib_graph)
+            return self._rdflib_graph
+
+    def _full_rdflib_graph(self) -> Graph:
+        """returns a new rdflib graph of all nodes of the graph"""
+
+        provenance_graph = self._new_rdflib_graph()
+        for node_class in _SHARD_CLASSES:
+            for node in self._iter_nodes(node_class):
+                for triple in self._node_triples(node):
+                    provenance_graph.add(triple)
         return provenance_graph
 
-    def serialize_as_rdf(self, file_name: str, export_format: str = "turtle") -> None:
+    def _update_rdflib_graph(self, provenance_graph: Graph) -> None:
+        """updates the nodes of the rdflib graph that were added or changed since the last call"""
+
+        nodes, self._dirty_nodes = list(self._dirty_nodes.values()), {}
+        for node in nodes:
+            if self._spill is not None and node.node_id not in self._nodes:
+                # the relations of evicted nodes are in the store
+                node = (self._fault_in(node.node_id) or (node,))[0]
+            # label, description, start and end time may have been overwritten
+            for overwritable in (RDFS.label, RDFS.comment, PROV.startedAtTime, PROV.endedAtTime):
+                provenance_graph.remove((URIRef(node.node_id), overwritable, None))
+            for triple in self._node_triples(node):
+                provenance_graph.add(triple)
+
+    @_timed
+    def serialize_as_rdf(
+        self, file_name: str, export_format: str = "turtle", selection: Optional[NodeSelection] = None
+    ) -> None:
         """serializes the graph as rdf, available formats are:
         "xml", "n3", "turtle", "nt", "pretty-xml", "trix", "trig", "nquads", "json-ld", "hext"
-        """
-        self.get_rdflib_graph().serialize(destination=file_name, format=export_format)
 
+        "nt" and "nquads" are streamed directly into the file, without building an
+        rdflib graph. the other formats are serialized from a new rdflib graph
+        that is dropped afterwards (i.e., not the one of get_rdflib_graph).
+        with a selection, only the selected part of the graph is serialized.
+        """
+        with self._lock:
+            if selection is not None:
+                if export_format in ("nt", "nt11", "ntriples", "nquads"):
+                    with open(file_name, "w", encoding="utf-8", newline="\n", buffering=2**20) as f:
+                        for triple in self._selected_triples(self._select(selection)):
+                            f.write(ntriples_line(triple))
+                else:
+                    self.get_rdflib_graph(selection).serialize(destination=file_name, format=export_format)
+            elif export_format in ("nt", "nt11", "ntriples", "nquads"):
+                # triples of the default graph are valid n-quads as well
+                with open(file_name, "w", encoding="utf-8", newline="\n", buffering=2**20) as f:
+                    self.write_ntriples(f)
+            else:
+                self._full_rdflib_graph().serialize(destination=file_name, format=export_format)
+
+    @_timed
+    def write_ntriples(self, file: TextIO) -> None:
+        """writes the graph node by node as N-Triples into the (text) file handle.
+        the lines are valid N-Quads as well (triples of the default graph)."""
+
+        with self._lock:
+            for node in chain.from_iterable(
+                    self._iter_nodes(node_class) for node_class in _SHARD_CLASSES):
+                file.write("".join(ntriples_line(triple)
+                           for triple in self._node_triples(node)))
+
+    @_timed
     def export_as_mermaid_flowchart(
-        self, file_name: str, user_options: dict = {}
+        self, file_name: str, user_options: dict = {}, selection: Optional[NodeSelection] = None
     ) -> None:
-        """exports the contents of the graph as mermaid-md flowchart"""
-
-        # if possible the options use the mermaid terminology
-        default_options = {
-            "invert-relations": False,
-            "orientation": "TD",
-            "included-relations": [
-                "was_generated_by",
-                "was_attributed_to",
-                "used",
-                "was_associated_with",
-                "acted_on_behalf_of",
-            ],
-            "color": "#000000",
-            "stroke": "#a4a4a4",
-            "stroke-width": "1px",
-            "relation-style": "-",
-            "entity": {
-                "fill": "#fffedf",
-                "shape": "([:])",
-                "relation-style": None,
-                "color": None,
-                "stroke": None,
-                "stroke-width": None,
-            },
-            "activity": {
-                "fill": "#cfceff",
-                "shape": "[[:]]",
-                "relation-style": None,
-                "color": None,
-                "stroke": None,
-                "stroke-width": None,
-            },
-            "agent": {
-                "fill": "#ffebc3",
-                "shape": "[/:\\]",
-                "relation-style": ".",
-                "color": None,
-                "stroke": None,
-                "stroke-width": None,
-            },
-        }
-
-         # Update default options with user options
-        options = update_dict(default_options, user_options)
-
-        # Unpack commonly used option values
-        text_color = options["color"]
-        stroke_color = options["stroke"]
-        stroke_width = options["stroke-width"]
-        stroke_style = options["relation-style"]
-
-        # Unpack entity options
-        entity_opts = options["entity"]
-        entity_fill_color = entity_opts["fill"]
-        entity_text_color = entity_opts["color"] or text_color
-        entity_stroke_color = entity_opts["stroke"] or stroke_color
-        entity_stroke_width = entity_opts["stroke-width"] or stroke_width
-        entity_stroke_style = entity_opts["relation-style"] or stroke_style
-
-        # Unpack activity options
-        activity_opts = options["activity"]
-        activity_fill_color = activity_opts["fill"]
-        activity_text_color = activity_opts["color"] or text_color
-        activity_stroke_color = activity_opts["stroke"] or stroke_color
-        activity_stroke_width = activity_opts["stroke-width"] or stroke_width
-        activity_stroke_style = activity_opts["relation-style"] or stroke_style
-
-        # Unpack agent options
-        agent_opts = options["agent"]
-        agent_fill_color = agent_opts["fill"]
-        agent_text_color = agent_opts["color"] or text_color
-        agent_stroke_color = agent_opts["stroke"] or stroke_color
-        agent_stroke_width = agent_opts["stroke-width"] or stroke_width
-        agent_stroke_style = agent_opts["relation-style"] or stroke_style
-
-
-
-        lines = []
-        lines.append("```mermaid")
-        lines.append(f"flowchart {options['orientation']}")
-
-        # Class definitions for entities
-        lines.append(f"classDef entity fill:{entity_fill_color}")
-        if entity_text_color:
-            lines.append(f"classDef entity color:{entity_text_color}")
-        if entity_stroke_color:
-            lines.append(f"classDef entity stroke:{entity_stroke_color}")
-        if entity_stroke_width:
-            lines.append(f"classDef entity stroke-width:{entity_stroke_width}")
-
-        # Class definitions for activities
-        lines.append(f"classDef activity fill:{activity_fill_color}")
-        if activity_text_color:
-            lines.append(f"classDef activity color:{activity_text_color}")
-        if activity_stroke_color:
-            lines.append(f"classDef activity stroke:{activity_stroke_color}")
-        if activity_stroke_width:
-            lines.append(f"classDef activity stroke-width:{activity_stroke_width}")
-
-        # Class definitions for agents
-        lines.append(f"classDef agent fill:{agent_fill_color}")
-        if agent_text_color:
-            lines.append(f"classDef agent color:{agent_text_color}")
-        if agent_stroke_color:
-            lines.append(f"classDef agent stroke:{agent_stroke_color}")
-        if agent_stroke_width:
-            lines.append(f"classDef agent stroke-width:{agent_stroke_width}")
-
-        for entity in self._entities:
-            lines.append(
-                f'{entity.node_id}{options["entity"]["shape"].split(":")[0]}<a style=color:inherit href={entity.node_id}>{entity.label or entity.node_id}</a>{options["entity"]["shape"].split(":")[1]}:::entity'
-            )
-            if "was_derived_from" in options["included-relations"]:
-                attrs = "style=color:inherit href=https://www.w3.org/TR/prov-o/#wasDerivedFrom"
-                for item in entity._was_derived_from_entities:                    
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{entity.node_id}-{entity_stroke_style} <a {attrs}>was derived from</a> {entity_stroke_style}->{item.node_id}"
-                        )
-                    else:
-                        lines.append(
-                            f"{item.node_id}-{entity_stroke_style} <a {attrs}>originated from</a> {entity_stroke_style}->{entity.node_id}"
-                        )
-            if "was_generated_by" in options["included-relations"]:
-                attrs ="style=color:inherit href=https://www.w3.org/TR/prov-o/#wasGeneratedBy"
-                for item in entity._was_generated_by_activities:
-                    
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{entity.node_id}-{activity_stroke_style} <a {attrs}>was generated by</a> {activity_stroke_style}->{item.node_id}"
-                        )
-                    else:
-                        lines.append(
-                            f"{item.node_id}-{activity_stroke_style} <a {attrs}>generated</a> {activity_stroke_style}->{entity.node_id}"
-                        )
-            if "was_attributed_to" in options["included-relations"]:
-                attrs = "style=color:inherit href=https://www.w3.org/TR/prov-o/#wasAttributedTo"
-                for item in entity._was_attributed_to_agents:
-                    
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{entity.node_id}-{agent_stroke_style} <a {attrs}>was attributed to</a> {agent_stroke_style}->{item.node_id}"
-                        )
-                    else:
-                        lines.append(
-                            f"{item.node_id}-{agent_stroke_style} <a {attrs}>produced</a> {agent_stroke_style}->{entity.node_id}"
-                        )
-
-        for activity in self._activities:
-            lines.append(
-                f"{activity.node_id}{options['activity']['shape'].split(':')[0]}<a style=color:inherit href={activity.node_id}>{activity.label or activity.node_id}</a>{options['activity']['shape'].split(':')[1]}:::activity"
-            )
-            if "was_informed_by" in options["included-relations"]:
-                attrs = "style=color:inherit href=https://www.w3.org/TR/prov-o/#wasInformedBy"
-                for item in activity._was_informed_by_activities:
-                    
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{activity.node_id}-{entity_stroke_style} <a {attrs}>was informed by</a> {entity_stroke_style}->{item.node_id}"
-                        )
-                    else:
-                        lines.append(
-                            f"{item.node_id}-{entity_stroke_style} <a {attrs}>informed</a> {entity_stroke_style}->{activity.node_id}"
-                        )
-            if "used" in options["included-relations"]:
-                attrs="style=color:inherit href=https://www.w3.org/TR/prov-o/#used"
-                for item in activity._used_entities:                    
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{activity.node_id}-{activity_stroke_style} <a {attrs}>used</a> {activity_stroke_style}->{item.node_id}"
-                        )
-                    else:
-                        lines.append(
-                            f"{item.node_id}-{activity_stroke_style} <a {attrs}>was used by</a> {activity_stroke_style}->{activity.node_id}"
-                        )
-            if "was_associated_with" in options["included-relations"]:
-                attrs = "style=color:inherit href=https://www.w3.org/TR/prov-o/#wasAssociatedWith"
-                for item in activity._was_associated_with_agents:
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{activity.node_id}-{agent_stroke_style} <a {attrs}>was associated with</a> {agent_stroke_style}->{item.node_id}"
-                        )
-                    else:
-                        lines.append(
-                            f"{item.node_id}-{agent_stroke_style} <a {attrs}>initiated</a> {agent_stroke_style}->{activity.node_id}"
-                        )
-
-        for agent in self._agents:
-            lines.append(
-                f"{agent.node_id}{options['agent']['shape'].split(':')[0]}<a style=color:inherit href={agent.node_id}>{agent.label or agent.node_id}</a>{options['agent']['shape'].split(':')[1]}:::agent"
-            )
-            if "acted_on_behalf_of" in options["included-relations"]:
-                attrs = "style=color:inherit href=https://www.w3.org/TR/prov-o/#actedOnBehalfOf"
-                for item in agent._acted_on_behalf_of_agents:
-                    if not options["invert-relations"]:
-                        lines.append(
-                            f"{agent.node_id}-{agent_stroke_style} <a {attrs}>acted on behalf of</a> {agent_stroke_style}->{item.node_id}"
-                        )
+        """exports the contents of the graph as mermaid-md flowchart,
+        with a selection only the selected part of the graph"""
+
+        options = _mermaid_options(user_options)
+        with self._lock:
+            if selection is None:
+                selected = None
+                nodes = self._iter_nodes
+            else:
+                selected = self._select(selection)
+                nodes = lambda node_class: (  # noqa: E731
+                    node for node in selected.values() if isinstance(node, node_class))  # type: ignore
+
+            with open(file_name, "w", encoding="utf-8", buffering=2**20) as f:
+                if options["aggregation"] is None and not options["subgraphs"]:
+                    self._write_mermaid_flowchart(f, options, nodes, selected)
+                else:
+                    self._write_aggregated_mermaid_flowchart(f, options, nodes, selected)
+
+    def _mermaid_templates(self, write: Callable[[str], object], options: dict) -> list[tuple]:
+        """writes the header and the class definitions of the flowchart and returns
+        per class (class, class name, opening and closing symbols of the shape,
+        edges as (attribute of the node, text between source and target))"""
+
+        write("```mermaid\n")
+        write(f"flowchart {options['orientation']}\n")
+
+        class_names = {Entity: "entity", Activity: "activity", Agent: "agent"}
+        relation_styles = {}
+        for class_name in class_names.values():
+            class_options = options[class_name]
+            text_color = class_options["color"] or options["color"]
+            stroke_color = class_options["stroke"] or options["stroke"]
+            stroke_width = class_options["stroke-width"] or options["stroke-width"]
+            relation_styles[class_name] = class_options["relation-style"] or options["relation-style"]
+
+            write(f"classDef {class_name} fill:{class_options['fill']}\n")
+            if text_color:
+                write(f"classDef {class_name} color:{text_color}\n")
+            if stroke_color:
+                write(f"classDef {class_name} stroke:{stroke_color}\n")
+            if stroke_width:
+                write(f"classDef {class_name} stroke-width:{stroke_width}\n")
+
+        included_relations = set(options["included-relations"])
+        inverted = options["invert-relations"]
+        templates = []
+        for node_class, class_name in class_names.items():
+            shape = options[class_name]["shape"].split(":")
+            edges = []
+            for relation, term, label, inverted_label, style_class in _MERMAID_RELATIONS[node_class]:
+                if relation not in included_relations:
+                    continue
+                style = relation_styles[style_class]
+                attrs = f"style=color:inherit href=https://www.w3.org/TR/prov-o/#{term}"
+                edges.append((_RELATION_ATTRIBUTES[relation],
+                              f"-{style} <a {attrs}>{inverted_label if inverted else label}</a> {style}->"))
+            templates.append((node_class, class_name, shape[0], shape[1], edges))
+        return templates
+
+    def _write_mermaid_flowchart(
+        self,
+        file: TextIO,
+        options: dict,
+        nodes: Callable[[type], Iterable[Node]],
+        selected: Optional[dict[str, Node]] = None,
+    ) -> None:
+        """writes the flowchart line by line into the (text) file handle.
+        the node and edge templates are built once per class and relation,
+        nodes(node_class) returns the nodes of the class to write, with
+        selected only the edges between the selected nodes are written."""
+
+        write = file.write
+        inverted = options["invert-relations"]
+        for node_class, class_name, shape_start, shape_end, edges in self._mermaid_templates(write, options):
+            node_start = f"{shape_start}<a style=color:inherit href="
+            node_end = f"</a>{shape_end}:::{class_name}\n"
+            for node in nodes(node_class):
+                node_id = node.node_id
+                write(f"{node_id}{node_start}{node_id}>{node.label or node_id}{node_end}")
+                for attribute, edge in edges:
+                    for item in getattr(node, attribute).values():
+                        if selected is not None and item.node_id not in selected:
+                            continue
+                        if inverted:
+                            write(f"{item.node_id}{edge}{node_id}\n")
+                        else:
+                            write(f"{node_id}{edge}{item.node_id}\n")
+
+        write("```")
+
+    def _write_aggregated_mermaid_flowchart(
+        self,
+        file: TextIO,
+        options: dict,
+        nodes: Callable[[type], Iterable[Node]],
+        selected: Optional[dict[str, Node]] = None,
+    ) -> None:
+        """writes the flowchart with aggregated nodes and/or subgraphs per agent.
+        nodes of a class that share a key (their label or id with the matches of
+        aggregation-pattern replaced by "#", or their agent) are collapsed into
+        one summary node, if there are at least aggregation-min-count of them.
+        edges between the same (summary) nodes are written once."""
+
+        aggregation = options["aggregation"]
+        pattern = re.compile(options["aggregation-pattern"])
+        min_count = options["aggregation-min-count"]
+        with_groups = options["subgraphs"] or aggregation == "agent"
+
+        # the agent a node belongs to: agents to themselves, activities to the
+        # agent they are associated with, entities to the agent they are attributed
+        # to or else to the agent of the activity that generated them
+        agent_of: dict[str, str] = {}
+        agent_labels: dict[str, str] = {}
+        if with_groups:
+            for agent in nodes(Agent):
+                agent_of[agent.node_id] = agent.node_id
+                agent_labels[agent.node_id] = agent.label or agent.node_id
+            for activity in nodes(Activity):
+                for agent in activity._was_associated_with_agents.values():  # type: ignore
+                    if agent.node_id in agent_labels:
+                        agent_of[activity.node_id] = agent.node_id
+                        break
+            for entity in nodes(Entity):
+                for related in chain(entity._was_attributed_to_agents.values(),  # type: ignore
+                                     entity._was_generated_by_activities.values()):  # type: ignore
+                    if related.node_id in agent_of:
+                        agent_of[entity.node_id] = agent_of[related.node_id]
+                        break
+
+        write = file.write
+        templates = self._mermaid_templates(write, options)
+        plurals = {"entity": "entities", "activity": "activities", "agent": "agents"}
+
+        # first pass: the summary nodes, (class name, key) -> [count, agent of all members]
+        keys: dict[str, tuple] = {}
+        groups: dict[tuple, list] = {}
+        if aggregation is not None:
+            for node_class, class_name, _, _, _ in templates:
+                for node in nodes(node_class):
+                    if aggregation == "label":
+                        key = (class_name, pattern.sub("#", node.label or node.node_id))
+                    elif node_class is not Agent and node.node_id in agent_of:
+                        key = (class_name, agent_of[node.node_id])
                     else:
-                        lines.append(
-                            f"{item.node_id}-{agent_stroke_style} <a {attrs}>instructed</a> {agent_stroke_style}->{agent.node_id}"
-                        )
-
-        lines.append("```")
-        lines = "\n".join(lines)
-
-        with open(file_name, "w", encoding="utf-8") as f:
-            f.write(lines)
+                        continue
+                    keys[node.node_id] = key
+                    group = groups.setdefault(key, [0, agent_of.get(node.node_id)])
+                    group[0] += 1
+                    if group[1] != agent_of.get(node.node_id):
+                        group[1] = None
+        summaries = {}
+        for index, (key, (count, agent_id)) in enumerate(groups.items()):
+            if count >= min_count:
+                summaries[key] = f"{key[0]}_aggregate_{index}"
+        representative = {node_id: summaries[key] for node_id, key in keys.items() if key in summaries}
+
+        # second pass: the nodes per agent and the edges
+        node_lines: dict[Optional[str], list[str]] = {}
+        edge_lines: dict[str, None] = {}
+        inverted = options["invert-relations"]
+        for node_class, class_name, shape_start, shape_end, edges in templates:
+            for node in nodes(node_class):
+                node_id = node.node_id
+                source = representative.get(node_id, node_id)
+                if source == node_id:
+                    node_lines.setdefault(agent_of.get(node_id), []).append(
+                        f"{node_id}{shape_start}<a style=color:inherit href={node_id}>"
+                        f"{node.label or node_id}</a>{shape_end}:::{class_name}\n")
+                for attribute, edge in edges:
+                    for item in getattr(node, attribute).values():
+                        if selected is not None and item.node_id not in selected:
+                            continue
+                        target = representative.get(item.node_id, item.node_id)
+                        if target == source:
+                            continue
+                        edge_lines[f"{target}{edge}{source}\n" if inverted else f"{source}{edge}{target}\n"] = None
+        for key, summary_id in summaries.items():
+            count, agent_id = groups[key]
+            class_name, value = key
+            _, _, shape_start, shape_end, _ = next(
+                template for template in templates if template[1] == class_name)
+            label = f"{count} {plurals[class_name]} of {agent_labels[value]}" \
+                if aggregation == "agent" else f"{value} ({count})"
+            node_lines.setdefault(agent_id, []).append(
+                f'{summary_id}{shape_start}"{_mermaid_text(label)}"{shape_end}:::{class_name}\n')
+
+        for agent_id, lines in node_lines.items():
+            if agent_id is not None and options["subgraphs"]:
+                write(f'subgraph {agent_id}-group ["{_mermaid_text(agent_labels[agent_id])}"]\n')
+                write("".join(lines))
+                write("end\n")
+            else:
+                write("".join(lines))
+        write("".join(edge_lines))
+        write("```")
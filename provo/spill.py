@@ -0,0 +1,137 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary On-disk store (sqlite) for the nodes a provenance graph evicts
+    from memory once it exceeds its memory budget
+"""
+
+
+import os
+import sqlite3
+import tempfile
+import weakref
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id TEXT PRIMARY KEY,
+    class INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    description TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT
+);
+CREATE TABLE IF NOT EXISTS relations (
+    seq INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    target TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS relations_by_source ON relations (source);
+CREATE INDEX IF NOT EXISTS relations_by_target ON relations (relation, target);
+"""
+
+
+@dataclass
+class SpillStore:
+    """holds evicted nodes as rows (class, id, label, description, times as
+    ISO 8601) and their relations as (source, relation, target) rows.
+    without file name a temporary file is used, which is deleted on close."""
+
+    file_name: Optional[str] = None
+    _connection: sqlite3.Connection = field(init=False, repr=False)
+    _temporary: bool = field(init=False, default=False, repr=False)
+    _finalizer: weakref.finalize = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.file_name is None:
+            handle, self.file_name = tempfile.mkstemp(prefix="provo-spill-", suffix=".sqlite")
+            os.close(handle)
+            self._temporary = True
+        # the store is only used while the lock of the graph is held
+        self._connection = sqlite3.connect(self.file_name, check_same_thread=False)
+        # the store is a cache of the graph, it does not need to survive a crash
+        self._connection.execute("PRAGMA journal_mode = OFF")
+        self._connection.execute("PRAGMA synchronous = OFF")
+        self._connection.executescript(_SCHEMA)
+        # rows of an earlier graph are not valid anymore
+        with self._connection:
+            self._connection.execute("DELETE FROM nodes")
+            self._connection.execute("DELETE FROM relations")
+        # closes the store (and removes a temporary file) once the graph is gone
+        self._finalizer = weakref.finalize(
+            self, _close, self._connection, self.file_name if self._temporary else None)
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def count(self, node_class: int) -> int:
+        """returns the number of stored nodes of the class"""
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM nodes WHERE class = ?", (node_class,)).fetchone()[0]
+
+    def __contains__(self, node_id: str) -> bool:
+        return self._connection.execute(
+            "SELECT 1 FROM nodes WHERE id = ?", (node_id,)).fetchone() is not None
+
+    def put(self, nodes: Iterable[tuple], relations: Iterable[tuple]) -> None:
+        """stores nodes (id, class, label, description, start time, end time)
+        and relations (source, relation, target) in one transaction"""
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)", nodes)
+            self._connection.executemany(
+                "INSERT INTO relations (source, relation, target) VALUES (?, ?, ?)", relations)
+
+    def get(self, node_id: str) -> Optional[tuple]:
+        """returns the row of the node or None"""
+        return self._connection.execute(
+            "SELECT * FROM nodes WHERE id = ?", (node_id,)).fetchone()
+
+    def relations(self, node_id: str) -> list[tuple]:
+        """returns the relations (relation, target) of the node in insertion order"""
+        return self._connection.execute(
+            "SELECT relation, target FROM relations WHERE source = ? ORDER BY seq",
+            (node_id,)).fetchall()
+
+    def sources(self, relation: str, target_id: str) -> list[str]:
+        """returns the ids of the stored nodes that have the relation to the target"""
+        return [source for source, in self._connection.execute(
+            "SELECT source FROM relations WHERE relation = ? AND target = ? ORDER BY seq",
+            (relation, target_id))]
+
+    def take(self, node_id: str) -> Optional[tuple[tuple, list[tuple]]]:
+        """removes the node from the store, returns its row and relations"""
+
+        row = self.get(node_id)
+        if row is None:
+            return None
+        relations = self.relations(node_id)
+        with self._connection:
+            self._connection.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+            self._connection.execute("DELETE FROM relations WHERE source = ?", (node_id,))
+        return row, relations
+
+    def rows(self, node_class: int) -> Iterator[tuple]:
+        """yields the rows of the stored nodes of the class in insertion order,
+        the rows are fetched in chunks"""
+
+        cursor = self._connection.execute(
+            "SELECT * FROM nodes WHERE class = ? ORDER BY rowid", (node_class,))
+        while True:
+            chunk = cursor.fetchmany(1000)
+            if not chunk:
+                return
+            yield from chunk
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+def _close(connection: sqlite3.Connection, temporary_file: Optional[str]) -> None:
+    connection.close()
+    if temporary_file is not None and os.path.exists(temporary_file):
+        os.remove(temporary_file)
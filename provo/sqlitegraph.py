@@ -0,0 +1,618 @@
+"""
+@author Arne Rümmler
+@contact arne.ruemmler@gmail.com
+
+@summary Implementation of a provenance graph that is persisted
+    in indexed tables of a SQLite database
+"""
+
+
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import StringIO
+from itertools import islice
+from typing import ClassVar, Iterable, Iterator, Optional, TextIO, Union
+from uuid import uuid4
+
+from rdflib import DC, FOAF, PROV, RDF, RDFS, XSD, Graph, Literal, Namespace, URIRef
+
+from provo.columnargraph import (_CLASS_TYPES, _HANDLE_CLASSES, _RELATION_PROPERTIES,
+                                 ActivityHandle, AgentHandle, EntityHandle, NodeHandle)
+from provo.idvault import IdAlreadyUsed, IdVault
+from provo.provontologygraph import (_PROV_RELATIONS, _RELATION_ATTRIBUTES, BatchMalformed,
+                                     NodeNotFound, ProvOntologyGraph, _mermaid_options)
+from provo.startingpointclasses import (Activity, Agent, Entity,
+                                        InvalidProvClassForThisRelation, Node)
+from provo.staticfunctions import ntriples_line
+
+# relations are stored by their position
+_RELATIONS = tuple(_RELATION_ATTRIBUTES)
+_RELATION_CODES = {relation: code for code, relation in enumerate(_RELATIONS)}
+# relation -> (code of the source class, code of the target class)
+_RELATION_CLASSES = {
+    relation: ((Entity, Activity, Agent).index(subject_class), (Entity, Activity, Agent).index(object_class))
+    for relation, subject_class, object_class in _PROV_RELATIONS.values()
+}
+_TIME_COLUMNS = {"started_at_time": "start_time", "ended_at_time": "end_time"}
+_NODE_CLASSES = (Entity, Activity, Agent)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    row INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    class INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    description TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT
+);
+CREATE TABLE IF NOT EXISTS relations (
+    relation INTEGER NOT NULL,
+    source INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    PRIMARY KEY (relation, source, target)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS relations_by_target ON relations (relation, target, source);
+"""
+
+
+@dataclass
+class SQLiteProvOntologyGraph:
+    """provenance graph that is stored in a SQLite database (file_name), e.g., to
+    append to it across runs. a graph is reopened without loading it, nodes and
+    relations are queried from indexed tables. a reopened graph keeps the
+    namespace, namespace abbreviation and language it was created with.
+    like in a ColumnarProvOntologyGraph, add_entity, add_activity and add_agent
+    return handles that provide the PROV-O relation methods. changes are committed
+    every commit_every changes and by commit() or close()."""
+
+    file_name: str
+    default_namespace: str = "https://provo-example.org/"
+    namespace_abbreviation: str = ""
+    lang: str = "en"
+    commit_every: int = 10000
+    # str() lists at most this many nodes per class, see ProvOntologyGraph.summary_limit
+    summary_limit: ClassVar[Optional[int]] = ProvOntologyGraph.summary_limit
+    _connection: sqlite3.Connection = field(init=False, repr=False)
+    _changes: int = field(init=False, default=0, repr=False)
+    # only validates the ids, uniqueness is ensured by the nodes table
+    _id_validator: IdVault = field(init=False, default_factory=IdVault, repr=False)
+
+    def __post_init__(self):
+        self._connection = sqlite3.connect(self.file_name)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+        settings = dict(self._connection.execute("SELECT key, value FROM settings"))
+        if settings:
+            self.default_namespace = settings["default_namespace"]
+            self.namespace_abbreviation = settings["namespace_abbreviation"]
+            self.lang = settings["lang"]
+        else:
+            # the same rules as for the object based graph apply
+            ProvOntologyGraph._validate_namespace(self)  # type: ignore
+            with self._connection:
+                self._connection.executemany("INSERT INTO settings VALUES (?, ?)", (
+                    ("default_namespace", self.default_namespace),
+                    ("namespace_abbreviation", self.namespace_abbreviation),
+                    ("lang", self.lang),
+                ))
+
+    def __enter__(self) -> "SQLiteProvOntologyGraph":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def __str__(self) -> str:
+        """prints the contents of the provenance graph in a nice format,
+        at most summary_limit nodes per class."""
+        summary = StringIO()
+        self.write_summary(summary, limit=self.summary_limit, max_items=self.summary_limit)
+        return summary.getvalue()
+
+    def _iter_nodes(self, node_class: type) -> Iterator[Node]:
+        """yields the nodes of the class as node objects that do not belong to a
+        graph, with their times and relations (the targets only with id and label).
+        nodes and relations are read with cursors, one node is built at a time."""
+
+        code = _NODE_CLASSES.index(node_class)
+        relations = self._connection.execute(
+            "SELECT r.source, r.relation, t.class, t.id, t.label FROM relations r "
+            "JOIN nodes s ON s.row = r.source JOIN nodes t ON t.row = r.target "
+            "WHERE s.class = ? ORDER BY r.source, r.relation, r.target", (code,))
+        relation = next(relations, None)
+        for row, node_id, label, description, start_time, end_time in self._connection.execute(
+                "SELECT row, id, label, description, start_time, end_time FROM nodes "
+                "WHERE class = ? ORDER BY row", (code,)):
+            node = node_class(label=label, description=description, node_id=node_id)
+            if start_time:
+                node.started_at_time(datetime.fromisoformat(start_time))
+            if end_time:
+                node.ended_at_time(datetime.fromisoformat(end_time))
+            while relation is not None and relation[0] == row:
+                _, relation_code, target_class, target_id, target_label = relation
+                getattr(node, _RELATIONS[relation_code])(
+                    _NODE_CLASSES[target_class](label=target_label, node_id=target_id))
+                relation = next(relations, None)
+            yield node
+
+    def iter_lines(self, limit: Optional[int] = None, max_items: Optional[int] = None) -> Iterator[str]:
+        """yields the lines of the contents of the provenance graph in a nice format,
+        see ProvOntologyGraph.iter_lines"""
+
+        yield "Provenance Graph Contents:"
+        for node_class, heading, plural in (
+                (Entity, "Entities", "entities"),
+                (Activity, "Activities", "activities"),
+                (Agent, "Agents", "agents")):
+            yield "    ---"
+            yield f"    {heading}:"
+            yield "        ---"
+            nodes = self._iter_nodes(node_class)
+            for node in nodes if limit is None else islice(nodes, limit):
+                yield from (f"        {line}" for line in node.iter_lines(max_items))
+            if limit is not None:
+                remaining = self._connection.execute(
+                    "SELECT COUNT(*) FROM nodes WHERE class = ?",
+                    (_NODE_CLASSES.index(node_class),)).fetchone()[0] - limit
+                if remaining > 0:
+                    yield f"        ... ({remaining} more {plural})"
+        yield "    ---"
+
+    def write_summary(self, file: TextIO, limit: Optional[int] = None, max_items: Optional[int] = None) -> None:
+        """writes the contents of the provenance graph in a nice format into the
+        (text) file handle, see iter_lines for limit and max_items"""
+        file.write("\n".join(self.iter_lines(limit, max_items)))
+
+    def commit(self) -> None:
+        """writes the changes into the database"""
+        self._connection.commit()
+        self._changes = 0
+
+    def close(self) -> None:
+        """commits the changes and closes the database"""
+        self.commit()
+        self._connection.close()
+
+    def _changed(self, count: int = 1) -> None:
+        self._changes += count
+        if self._changes >= self.commit_every:
+            self.commit()
+
+    def _node_id(self, index: int) -> str:
+        return self._connection.execute("SELECT id FROM nodes WHERE row = ?", (index,)).fetchone()[0]
+
+    def _label(self, index: int) -> str:
+        return self._connection.execute("SELECT label FROM nodes WHERE row = ?", (index,)).fetchone()[0]
+
+    def _description(self, index: int) -> str:
+        return self._connection.execute(
+            "SELECT description FROM nodes WHERE row = ?", (index,)).fetchone()[0]
+
+    def _add_relation(self, relation: str, source: int, target: int) -> None:
+        self._connection.execute("INSERT OR IGNORE INTO relations VALUES (?, ?, ?)",
+                                 (_RELATION_CODES[relation], source, target))
+        self._changed()
+
+    def _time(self, relation: str, index: int) -> Optional[datetime]:
+        """returns the start ("started_at_time") or end time of the activity"""
+        time = self._connection.execute(
+            f"SELECT {_TIME_COLUMNS[relation]} FROM nodes WHERE row = ?", (index,)).fetchone()[0]
+        return datetime.fromisoformat(time) if time else None
+
+    def _set_time(self, relation: str, index: int, time: datetime) -> None:
+        self._connection.execute(
+            f"UPDATE nodes SET {_TIME_COLUMNS[relation]} = ? WHERE row = ?", (time.isoformat(), index))
+        self._changed()
+
+    def _new_id(self, id: str, use_default_namespace: bool) -> str:
+        """returns the validated id of a new node, empty ids get generated"""
+
+        if not id:
+            return self.default_namespace + str(uuid4())
+        if use_default_namespace:
+            id = self.default_namespace + id
+        self._id_validator._raise_exception_if_uri_invalid(id)
+        return id
+
+    def _add_node(
+        self, node_class: int, id: str, label: str, description: str, use_default_namespace: bool
+    ) -> NodeHandle:
+        """inserts the node into the nodes table"""
+
+        node_id = self._new_id(id, use_default_namespace)
+        try:
+            cursor = self._connection.execute(
+                "INSERT INTO nodes (id, class, label, description) VALUES (?, ?, ?, ?)",
+                (node_id, node_class, label, description))
+        except sqlite3.IntegrityError:
+            raise IdAlreadyUsed(
+                f'The Id "{node_id}" was already used in this graph.') from None
+        self._changed()
+        return _HANDLE_CLASSES[node_class](self, cursor.lastrowid)  # type: ignore
+
+    def add_entity(
+        self,
+        id: str = "",
+        label: str = "",
+        description: str = "",
+        use_default_namespace: bool = True,
+    ) -> EntityHandle:
+        """creates a new entity, adds it to the graph and returns its handle"""
+        return self._add_node(0, id, label, description, use_default_namespace)  # type: ignore
+
+    def add_activity(
+        self,
+        id: str = "",
+        label: str = "",
+        description: str = "",
+        use_default_namespace: bool = True,
+    ) -> ActivityHandle:
+        """creates a new activity, adds it to the graph and returns its handle"""
+        return self._add_node(1, id, label, description, use_default_namespace)  # type: ignore
+
+    def add_agent(
+        self,
+        id: str = "",
+        label: str = "",
+        description: str = "",
+        use_default_namespace: bool = True,
+    ) -> AgentHandle:
+        """creates a new agent, adds it to the graph and returns its handle"""
+        return self._add_node(2, id, label, description, use_default_namespace)  # type: ignore
+
+    def _add_nodes(
+        self,
+        node_class: int,
+        ids: Optional[Iterable[str]],
+        labels: Optional[Iterable[str]],
+        descriptions: Optional[Iterable[str]],
+        use_default_namespace: bool,
+    ) -> list:
+        """inserts the nodes of a batch at once, if one of the ids is invalid or
+        already used, none of the nodes is added"""
+
+        columns = {}
+        if ids is not None:
+            columns["ids"] = list(ids)
+        if labels is not None:
+            columns["labels"] = list(labels)
+        if descriptions is not None:
+            columns["descriptions"] = list(descriptions)
+        size = max((len(column) for column in columns.values()), default=0)
+        if any(len(column) != size for column in columns.values()):
+            raise BatchMalformed(
+                f"The provided columns differ in length: {', '.join(f'{name} ({len(column)})' for name, column in columns.items())}.")
+        node_ids = [self._new_id(id, use_default_namespace)
+                    for id in columns.get("ids") or [""] * size]
+        labels = columns.get("labels") or [""] * size
+        descriptions = columns.get("descriptions") or [""] * size
+
+        # rows are numbered consecutively, as nodes are never deleted
+        first = self._connection.execute("SELECT COALESCE(MAX(row), 0) + 1 FROM nodes").fetchone()[0]
+        self._connection.execute("SAVEPOINT batch")
+        try:
+            self._connection.executemany(
+                "INSERT INTO nodes (id, class, label, description) VALUES (?, ?, ?, ?)",
+                ((node_id, node_class, label, description)
+                 for node_id, label, description in zip(node_ids, labels, descriptions)))
+        except sqlite3.IntegrityError:
+            self._connection.execute("ROLLBACK TO batch")
+            self._connection.execute("RELEASE batch")
+            raise IdAlreadyUsed(
+                "At least one of the Ids was already used in this graph (or occurs twice in the batch).") from None
+        self._connection.execute("RELEASE batch")
+        self._changed(size)
+        return [_HANDLE_CLASSES[node_class](self, first + i) for i in range(size)]
+
+    def add_entities(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        descriptions: Optional[Iterable[str]] = None,
+        use_default_namespace: bool = True,
+    ) -> list[EntityHandle]:
+        """creates several entities at once (one per id, label or description)"""
+        return self._add_nodes(0, ids, labels, descriptions, use_default_namespace)
+
+    def add_activities(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        descriptions: Optional[Iterable[str]] = None,
+        use_default_namespace: bool = True,
+    ) -> list[ActivityHandle]:
+        """creates several activities at once, see add_entities"""
+        return self._add_nodes(1, ids, labels, descriptions, use_default_namespace)
+
+    def add_agents(
+        self,
+        ids: Optional[Iterable[str]] = None,
+        labels: Optional[Iterable[str]] = None,
+        descriptions: Optional[Iterable[str]] = None,
+        use_default_namespace: bool = True,
+    ) -> list[AgentHandle]:
+        """creates several agents at once, see add_entities"""
+        return self._add_nodes(2, ids, labels, descriptions, use_default_namespace)
+
+    def add_relations(
+        self,
+        relation: str,
+        sources: Iterable[Union[NodeHandle, str]],
+        targets: Iterable[Union[NodeHandle, str]],
+    ) -> None:
+        """adds the relation (e.g., "was_generated_by") between each source and
+        the target at the same position. sources and targets are handles or ids
+        of nodes of this graph."""
+
+        if relation not in _RELATION_CODES:
+            raise BatchMalformed(
+                f'The relation "{relation}" does not exist, available relations are: {", ".join(_RELATIONS)}.')
+        sources, targets = list(sources), list(targets)
+        if len(sources) != len(targets):
+            raise BatchMalformed(
+                f"The provided columns differ in length: sources ({len(sources)}), targets ({len(targets)}).")
+        sources = [self._handle(source) for source in sources]
+        targets = [self._handle(target) for target in targets]
+        source_class, target_class = _RELATION_CLASSES[relation]
+        for role, handles, node_class in (("source", sources, source_class), ("target", targets, target_class)):
+            for handle in handles:
+                if handle._node_class != node_class:
+                    raise InvalidProvClassForThisRelation(
+                        f"""The PROV relation "{relation.replace('_', ' ')}" requires an {_HANDLE_CLASSES[node_class]._class_name} as {role}.
+                        In contradiction to this, the node "{handle.node_id}" is of the type {type(handle)}."""
+                    )
+        code = _RELATION_CODES[relation]
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO relations VALUES (?, ?, ?)",
+            ((code, source._index, target._index) for source, target in zip(sources, targets)))
+        self._changed(len(sources))
+
+    def _handle(self, node: Union[NodeHandle, str]) -> NodeHandle:
+        if isinstance(node, str):
+            return self.get_node(node)
+        if node._graph is not self:
+            raise NodeNotFound(
+                f'The node "{node.node_id}" does not belong to this graph.')
+        return node
+
+    def get_node(self, id: str, use_default_namespace: bool = False) -> NodeHandle:
+        """returns the handle of the entity, activity or agent with the id"""
+
+        if use_default_namespace:
+            id = self.default_namespace + id
+        row = self._connection.execute("SELECT row, class FROM nodes WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            raise NodeNotFound(
+                f'There is no node with the id "{id}" in this graph.')
+        return _HANDLE_CLASSES[row[1]](self, row[0])
+
+    def _get_typed_node(self, id: str, use_default_namespace: bool, node_class: type) -> NodeHandle:
+        node = self.get_node(id, use_default_namespace)
+        if not isinstance(node, node_class):
+            raise NodeNotFound(
+                f'The node with the id "{node.node_id}" is not an {node_class._class_name}, but an {type(node)._class_name}.')
+        return node
+
+    def get_entity(self, id: str, use_default_namespace: bool = False) -> EntityHandle:
+        """returns the handle of the entity with the id"""
+        return self._get_typed_node(id, use_default_namespace, EntityHandle)  # type: ignore
+
+    def get_activity(self, id: str, use_default_namespace: bool = False) -> ActivityHandle:
+        """returns the handle of the activity with the id"""
+        return self._get_typed_node(id, use_default_namespace, ActivityHandle)  # type: ignore
+
+    def get_agent(self, id: str, use_default_namespace: bool = False) -> AgentHandle:
+        """returns the handle of the agent with the id"""
+        return self._get_typed_node(id, use_default_namespace, AgentHandle)  # type: ignore
+
+    def count_relations(self) -> int:
+        """returns the number of relations between the nodes of the graph
+        (start and end times are no relations)"""
+        return self._connection.execute("SELECT COUNT(*) FROM relations").fetchone()[0]
+
+    def relation_targets(self, node: NodeHandle, relation: str) -> list[NodeHandle]:
+        """returns the nodes the node has the relation to, e.g.,
+        relation_targets(entity, "was_generated_by") returns the activities
+        that generated the entity"""
+
+        return [_HANDLE_CLASSES[node_class](self, row) for row, node_class in self._connection.execute(
+            "SELECT n.row, n.class FROM relations r JOIN nodes n ON n.row = r.target "
+            "WHERE r.relation = ? AND r.source = ? ORDER BY n.row",
+            (_RELATION_CODES[relation], node._index))]
+
+    def inverse_relations(self, node: NodeHandle, relation: str) -> list[NodeHandle]:
+        """returns the nodes that have the relation to the node, e.g.,
+        inverse_relations(activity, "was_generated_by") returns the entities
+        that were generated by the activity"""
+
+        return [_HANDLE_CLASSES[node_class](self, row) for row, node_class in self._connection.execute(
+            "SELECT n.row, n.class FROM relations r JOIN nodes n ON n.row = r.source "
+            "WHERE r.relation = ? AND r.target = ? ORDER BY n.row",
+            (_RELATION_CODES[relation], node._index))]
+
+    def generated(self, activity: ActivityHandle) -> list[EntityHandle]:
+        """returns the entities that were generated by the activity"""
+        return self.inverse_relations(activity, "was_generated_by")  # type: ignore
+
+    def derived(self, entity: EntityHandle) -> list[EntityHandle]:
+        """returns the entities that were derived from the entity"""
+        return self.inverse_relations(entity, "was_derived_from")  # type: ignore
+
+    def attributed(self, agent: AgentHandle) -> list[EntityHandle]:
+        """returns the entities that are attributed to the agent"""
+        return self.inverse_relations(agent, "was_attributed_to")  # type: ignore
+
+    def used_by(self, entity: EntityHandle) -> list[ActivityHandle]:
+        """returns the activities that used the entity"""
+        return self.inverse_relations(entity, "used")  # type: ignore
+
+    def informed(self, activity: ActivityHandle) -> list[ActivityHandle]:
+        """returns the activities that were informed by the activity"""
+        return self.inverse_relations(activity, "was_informed_by")  # type: ignore
+
+    def associated(self, agent: AgentHandle) -> list[ActivityHandle]:
+        """returns the activities the agent is associated with"""
+        return self.inverse_relations(agent, "was_associated_with")  # type: ignore
+
+    def instructed(self, agent: AgentHandle) -> list[AgentHandle]:
+        """returns the agents that acted on behalf of the agent"""
+        return self.inverse_relations(agent, "acted_on_behalf_of")  # type: ignore
+
+    def _lineage(
+        self,
+        node: NodeHandle,
+        upstream: bool,
+        max_depth: Optional[int],
+        relations: Optional[Iterable[str]],
+    ) -> list[NodeHandle]:
+        """breadth first traversal along (or against) the relations, one query
+        per level, every node is visited once"""
+
+        codes = [_RELATION_CODES[relation] for relation in (_RELATIONS if relations is None else relations)]
+        start, end = ("source", "target") if upstream else ("target", "source")
+        visited = {node._index}
+        lineage = []
+        frontier = [node._index]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            next_frontier = []
+            # sqlite limits the number of parameters of a query
+            for offset in range(0, len(frontier), 500):
+                chunk = frontier[offset:offset + 500]
+                query = (
+                    f"SELECT DISTINCT n.row, n.class FROM relations r JOIN nodes n ON n.row = r.{end} "
+                    f"WHERE r.relation IN ({', '.join('?' * len(codes))}) "
+                    f"AND r.{start} IN ({', '.join('?' * len(chunk))}) ORDER BY n.row")
+                for row, node_class in self._connection.execute(query, (*codes, *chunk)):
+                    if row not in visited:
+                        visited.add(row)
+                        lineage.append(_HANDLE_CLASSES[node_class](self, row))
+                        next_frontier.append(row)
+            frontier = next_frontier
+            depth += 1
+        return lineage
+
+    def ancestors(
+        self,
+        node: NodeHandle,
+        max_depth: Optional[int] = None,
+        relations: Optional[Iterable[str]] = None,
+    ) -> list[NodeHandle]:
+        """returns the upstream lineage of the node, see ProvOntologyGraph.ancestors"""
+        return self._lineage(node, True, max_depth, relations)
+
+    def descendants(
+        self,
+        node: NodeHandle,
+        max_depth: Optional[int] = None,
+        relations: Optional[Iterable[str]] = None,
+    ) -> list[NodeHandle]:
+        """returns the downstream lineage of the node, see ProvOntologyGraph.descendants"""
+        return self._lineage(node, False, max_depth, relations)
+
+    def _triples(self) -> Iterator[tuple]:
+        """yields the rdf triples of the graph, the tables are read with cursors"""
+
+        for node_id, node_class, label, description, start_time, end_time in self._connection.execute(
+                "SELECT id, class, label, description, start_time, end_time FROM nodes ORDER BY row"):
+            subject = URIRef(node_id)
+            yield (subject, RDF.type, _CLASS_TYPES[node_class])
+            if label:
+                yield (subject, RDFS.label, Literal(label, lang=self.lang))
+            if description:
+                yield (subject, RDFS.comment, Literal(description, lang=self.lang))
+            if start_time:
+                yield (subject, PROV.startedAtTime,
+                       Literal(datetime.fromisoformat(start_time), datatype=XSD.dateTime))
+            if end_time:
+                yield (subject, PROV.endedAtTime,
+                       Literal(datetime.fromisoformat(end_time), datatype=XSD.dateTime))
+        predicates = [_RELATION_PROPERTIES[relation] for relation in _RELATIONS]
+        for relation, source_id, target_id in self._connection.execute(
+                "SELECT r.relation, s.id, t.id FROM relations r "
+                "JOIN nodes s ON s.row = r.source JOIN nodes t ON t.row = r.target"):
+            yield (URIRef(source_id), predicates[relation], URIRef(target_id))
+
+    def get_rdflib_graph(self) -> Graph:
+        """returns the provenance graph as rdflib.Graph()."""
+
+        provenance_graph = Graph()
+        provenance_graph.bind("dc", DC)
+        provenance_graph.bind("foaf", FOAF)
+        provenance_graph.bind("rdf", RDF)
+        provenance_graph.bind("rdfs", RDFS)
+        provenance_graph.bind("prov", PROV)
+        provenance_graph.bind(self.namespace_abbreviation,
+                              Namespace(self.default_namespace))
+        for triple in self._triples():
+            provenance_graph.add(triple)
+        return provenance_graph
+
+    def serialize_as_rdf(self, file_name: str, export_format: str = "turtle") -> None:
+        """serializes the graph as rdf, available formats are:
+        "xml", "n3", "turtle", "nt", "pretty-xml", "trix", "trig", "nquads", "json-ld", "hext"
+
+        "nt" and "nquads" are streamed directly from the database into the file.
+        """
+        if export_format in ("nt", "nt11", "ntriples", "nquads"):
+            with open(file_name, "w", encoding="utf-8", newline="\n", buffering=2**20) as f:
+                self.write_ntriples(f)
+        else:
+            self.get_rdflib_graph().serialize(destination=file_name, format=export_format)
+
+    def write_ntriples(self, file: TextIO) -> None:
+        """writes the graph as N-Triples into the (text) file handle."""
+        file.writelines(ntriples_line(triple) for triple in self._triples())
+
+    # the flowchart is written by the writers of the object based graph, from the
+    # nodes that _iter_nodes streams from the database
+    _mermaid_templates = ProvOntologyGraph._mermaid_templates
+    _write_mermaid_flowchart = ProvOntologyGraph._write_mermaid_flowchart
+    _write_aggregated_mermaid_flowchart = ProvOntologyGraph._write_aggregated_mermaid_flowchart
+
+    def export_as_mermaid_flowchart(self, file_name: str, user_options: dict = {}) -> None:
+        """exports the contents of the graph as mermaid-md flowchart,
+        see ProvOntologyGraph.export_as_mermaid_flowchart"""
+
+        options = _mermaid_options(user_options)
+        with open(file_name, "w", encoding="utf-8", buffering=2**20) as f:
+            if options["aggregation"] is None and not options["subgraphs"]:
+                self._write_mermaid_flowchart(f, options, self._iter_nodes)
+            else:
+                self._write_aggregated_mermaid_flowchart(f, options, self._iter_nodes)
+
+    def to_prov_ontology_graph(self) -> ProvOntologyGraph:
+        """returns the contents of the graph as (object based) ProvOntologyGraph"""
+
+        graph = ProvOntologyGraph(
+            default_namespace=self.default_namespace,
+            namespace_abbreviation=self.namespace_abbreviation,
+            lang=self.lang,
+        )
+        node_lists = (graph._entities, graph._activities, graph._agents)
+        node_classes = (Entity, Activity, Agent)
+        nodes = {}
+        rows = self._connection.execute(
+            "SELECT row, id, class, label, description, start_time, end_time FROM nodes ORDER BY row").fetchall()
+        graph._id_vault.add_ids(row[1] for row in rows)
+        for row, node_id, node_class, label, description, start_time, end_time in rows:
+            node = node_classes[node_class](label=label, description=description, node_id=node_id)
+            node_lists[node_class].append(node)
+            graph._register_node(node)
+            nodes[row] = node
+            if start_time:
+                node.started_at_time(datetime.fromisoformat(start_time))  # type: ignore
+            if end_time:
+                node.ended_at_time(datetime.fromisoformat(end_time))  # type: ignore
+        for relation, source, target in self._connection.execute("SELECT * FROM relations"):
+            getattr(nodes[source], _RELATIONS[relation])(nodes[target])
+        return graph
@@ -8,8 +8,41 @@
 
 
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
 from datetime import datetime
+from types import MappingProxyType
+from itertools import islice
+from typing import Callable, Iterator, Mapping, Optional
+
+# shared by all nodes as long as they have no relation of a kind, the actual
+# dict is only allocated when the first relation is added
+_NO_RELATIONS: Mapping = MappingProxyType({})
+
+
+class RelationHook:
+    """ Connects the nodes to the graph they belong to. The callback is called
+    with (relation, node, target) whenever a relation or a time is set, the lock
+    is held while a relation is added. Changes of the label or the description are
+    passed like relations, with the new text as target. A graph shares one hook with all of its nodes. """
+
+    __slots__ = ("callback", "lock")
+
+    def __init__(
+        self,
+        callback: Optional[Callable[[str, 'Node', object], None]] = None,
+        lock: AbstractContextManager = nullcontext(),
+    ) -> None:
+        self.callback = callback
+        self.lock = lock
+
+    def __call__(self, relation: str, node: 'Node', target: object) -> None:
+        if self.callback is not None:
+            self.callback(relation, node, target)
+
+
+# hook of the nodes that do not belong to a graph
+_NO_GRAPH = RelationHook()
 
 
 @dataclass(frozen=True)
@@ -43,48 +76,119 @@ class NoDateTime(Exception):
     message: str
 
 
-@dataclass
+def _related_line(name: str, related: Mapping[str, "Node"], max_items: Optional[int]) -> str:
+    """formats the related nodes (their labels or ids) like a list"""
+    names = [repr(item.label or item.node_id) for item in islice(related.values(), max_items)]
+    if max_items is not None and len(related) > max_items:
+        names.append(f"... ({len(related) - max_items} more)")
+    return f"{name}: [{', '.join(names)}]"
+
+
 class Node(ABC):
     """ Abstract parent class of Activity, Agent, and Entity. """
 
-    label: str = ""
-    description: str = ""
-    node_id: str = ""
+    # nodes are slotted (no __dict__ per instance), as graphs can hold millions of them
+    __slots__ = ("_label", "_description", "node_id", "_on_relation", "__weakref__")
+
+    def __init__(self, label: str = "", description: str = "", node_id: str = "") -> None:
+        self._label = label
+        self._description = description
+        self.node_id = node_id
+        # the ProvOntologyGraph the node belongs to registers its hook here
+        self._on_relation: RelationHook = _NO_GRAPH
+
+    @property
+    def label(self) -> str:
+        return self._label
+
+    @label.setter
+    def label(self, label: str) -> None:
+        # the graph is informed like for a relation, e.g., to update its rdflib graph
+        with self._on_relation.lock:
+            self._label = label
+            self._notify("label", label)
+
+    @property
+    def description(self) -> str:
+        return self._description
+
+    @description.setter
+    def description(self, description: str) -> None:
+        with self._on_relation.lock:
+            self._description = description
+            self._notify("description", description)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(label={self.label!r}, description={self.description!r}, node_id={self.node_id!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return (self.node_id, self.label, self.description) == (
+            other.node_id, other.label, other.description)  # type: ignore
+
+    __hash__ = None  # type: ignore (nodes are mutable)
 
-    @abstractmethod
     def __str__(self) -> str:
         """prints the node in a nice format"""
-        contents = f"id: {self.node_id}"
+        return "\n".join(self.iter_lines())
+
+    def iter_lines(self, max_items: Optional[int] = None) -> Iterator[str]:
+        """yields the lines of the node in a nice format, max_items limits
+        the number of related nodes that are listed per relation"""
+        yield f"id: {self.node_id}"
+        # multi-line labels and descriptions are split into lines of their own
         if self.label:
-            contents += f"\nlabel: {self.label}"
+            yield from f"label: {self.label}".splitlines()
         if self.description:
-            contents += f"\ndescription: {self.description}"
-        return contents
+            yield from f"description: {self.description}".splitlines()
+        yield from self._relation_lines(max_items)
+        yield "---"
+
+    @abstractmethod
+    def _relation_lines(self, max_items: Optional[int]) -> Iterator[str]:
+        """yields the lines of the relations (and times) of the node"""
+
+    def __getstate__(self) -> dict:
+        """nodes are pickled without the graph they belong to, e.g., to be
+        referenced by nodes of a graph in a worker process"""
+        state = {slot: getattr(self, slot) for cls in type(self).__mro__
+                 for slot in getattr(cls, "__slots__", ())}
+        del state["_on_relation"], state["__weakref__"]
+        return {slot: value for slot, value in state.items() if value is not _NO_RELATIONS}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()  # type: ignore
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    def _notify(self, relation: str, target: object) -> None:
+        """informs the graph the node belongs to about a new relation"""
+        self._on_relation(relation, self, target)
 
 
-@dataclass
 class Entity(Node):
     """ Class to create a PROV-O Entity object. 
     https://www.w3.org/TR/prov-o/#Entity """
 
-    _was_derived_from_entities: list['Entity'] = field(
-        init=False, default_factory=list)
-    _was_generated_by_activities: list['Activity'] = field(
-        init=False, default_factory=list)
-    _was_attributed_to_agents: list['Agent'] = field(
-        init=False, default_factory=list)
+    # related nodes are stored as id -> node, i.e., in insertion order and
+    # without duplicates
+    __slots__ = ("_was_derived_from_entities",
+                 "_was_generated_by_activities", "_was_attributed_to_agents")
 
-    def __str__(self) -> str:
-        """prints the entity in a nice format."""
-        contents = super().__str__()
+    def __init__(self, label: str = "", description: str = "", node_id: str = "") -> None:
+        super().__init__(label, description, node_id)
+        self._was_derived_from_entities: Mapping[str, 'Entity'] = _NO_RELATIONS
+        self._was_generated_by_activities: Mapping[str, 'Activity'] = _NO_RELATIONS
+        self._was_attributed_to_agents: Mapping[str, 'Agent'] = _NO_RELATIONS
+
+    def _relation_lines(self, max_items: Optional[int]) -> Iterator[str]:
         if self._was_derived_from_entities:
-            contents += f"\nwas derived from: {[item.label if item.label else item.node_id for item in self._was_derived_from_entities]}"
+            yield _related_line("was derived from", self._was_derived_from_entities, max_items)
         if self._was_generated_by_activities:
-            contents += f"\nwas generated by: {[item.label if item.label else item.node_id for item in self._was_generated_by_activities]}"
+            yield _related_line("was generated by", self._was_generated_by_activities, max_items)
         if self._was_attributed_to_agents:
-            contents += f"\nwas attributed to: {[item.label if item.label else item.node_id for item in self._was_attributed_to_agents]}"
-        contents += "\n---"
-        return contents
+            yield _related_line("was attributed to", self._was_attributed_to_agents, max_items)
 
     def was_derived_from(self, entity: 'Entity') -> None:
         """ implements the wasDerivedFrom property of PROV-O
@@ -96,7 +200,13 @@ class Entity(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Entity'>. 
                 In contradiction to this, the provided attribute is of the type {type(entity)}."""
             )
-        self._was_derived_from_entities.append(entity)
+        with self._on_relation.lock:
+            if entity.node_id in self._was_derived_from_entities:
+                return
+            if self._was_derived_from_entities is _NO_RELATIONS:
+                self._was_derived_from_entities = {}
+            self._was_derived_from_entities[entity.node_id] = entity  # type: ignore
+            self._notify("was_derived_from", entity)
 
     def was_generated_by(self, activity: 'Activity') -> None:
         """ implements the wasGeneratedBy property of PROV-O
@@ -108,7 +218,13 @@ class Entity(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Activity'>. 
                 In contradiction to this, the provided attribute is of the type {type(activity)}."""
             )
-        self._was_generated_by_activities.append(activity)
+        with self._on_relation.lock:
+            if activity.node_id in self._was_generated_by_activities:
+                return
+            if self._was_generated_by_activities is _NO_RELATIONS:
+                self._was_generated_by_activities = {}
+            self._was_generated_by_activities[activity.node_id] = activity  # type: ignore
+            self._notify("was_generated_by", activity)
 
     def was_attributed_to(self, agent: 'Agent') -> None:
         """ implements the wasAttributedTo property of PROV-O
@@ -120,39 +236,42 @@ class Entity(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Agent'>. 
                 In contradiction to this, the provided attribute is of the type {type(agent)}."""
             )
-        self._was_attributed_to_agents.append(agent)
+        with self._on_relation.lock:
+            if agent.node_id in self._was_attributed_to_agents:
+                return
+            if self._was_attributed_to_agents is _NO_RELATIONS:
+                self._was_attributed_to_agents = {}
+            self._was_attributed_to_agents[agent.node_id] = agent  # type: ignore
+            self._notify("was_attributed_to", agent)
 
 
-@dataclass
 class Activity(Node):
     """ Class to create a PROV-O Activity object.
     https://www.w3.org/TR/prov-o/#Activity """
 
-    _was_informed_by_activities: list['Activity'] = field(
-        init=False, default_factory=list)
-    _used_entities: list['Entity'] = field(init=False, default_factory=list)
-    _was_associated_with_agents: list['Agent'] = field(
-        init=False, default_factory=list)
-    # type: ignore (there is no default date that resolves to False)
-    _start_time: datetime = field(init=False, default_factory=lambda: None)
-    _end_time: datetime = field(
-        init=False, default_factory=lambda: None)  # type: ignore
+    __slots__ = ("_was_informed_by_activities", "_used_entities",
+                 "_was_associated_with_agents", "_start_time", "_end_time")
 
-    def __str__(self) -> str:
-        """prints the activity in a nice format."""
-        contents = super().__str__()
+    def __init__(self, label: str = "", description: str = "", node_id: str = "") -> None:
+        super().__init__(label, description, node_id)
+        self._was_informed_by_activities: Mapping[str, 'Activity'] = _NO_RELATIONS
+        self._used_entities: Mapping[str, 'Entity'] = _NO_RELATIONS
+        self._was_associated_with_agents: Mapping[str, 'Agent'] = _NO_RELATIONS
+        # there is no default date that resolves to False
+        self._start_time: Optional[datetime] = None
+        self._end_time: Optional[datetime] = None
+
+    def _relation_lines(self, max_items: Optional[int]) -> Iterator[str]:
         if self._start_time:
-            contents += f"\nstart time: {self._start_time}"
+            yield f"start time: {self._start_time}"
         if self._end_time:
-            contents += f"\nend time: {self._end_time}"
+            yield f"end time: {self._end_time}"
         if self._was_informed_by_activities:
-            contents += f"\nwas informed by: {[item.label if item.label else item.node_id for item in self._was_informed_by_activities]}"
+            yield _related_line("was informed by", self._was_informed_by_activities, max_items)
         if self._used_entities:
-            contents += f"\nused: {[item.label if item.label else item.node_id for item in self._used_entities]}"
+            yield _related_line("used", self._used_entities, max_items)
         if self._was_associated_with_agents:
-            contents += f"\nwas associated with: {[item.label if item.label else item.node_id for item in self._was_associated_with_agents]}"
-        contents += "\n---"
-        return contents
+            yield _related_line("was associated with", self._was_associated_with_agents, max_items)
 
     def get_start_time(self) -> datetime:
         """returns the start time of the activity"""
@@ -180,7 +299,13 @@ class Activity(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Activity'>. 
                 In contradiction to this, the provided attribute is of the type {type(activity)}."""
             )
-        self._was_informed_by_activities.append(activity)
+        with self._on_relation.lock:
+            if activity.node_id in self._was_informed_by_activities:
+                return
+            if self._was_informed_by_activities is _NO_RELATIONS:
+                self._was_informed_by_activities = {}
+            self._was_informed_by_activities[activity.node_id] = activity  # type: ignore
+            self._notify("was_informed_by", activity)
 
     def used(self, entity: 'Entity') -> None:
         """ implements the used property of PROV-O
@@ -192,7 +317,13 @@ class Activity(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Entity'>. 
                 In contradiction to this, the provided attribute is of the type {type(entity)}."""
             )
-        self._used_entities.append(entity)
+        with self._on_relation.lock:
+            if entity.node_id in self._used_entities:
+                return
+            if self._used_entities is _NO_RELATIONS:
+                self._used_entities = {}
+            self._used_entities[entity.node_id] = entity  # type: ignore
+            self._notify("used", entity)
 
     def was_associated_with(self, agent: 'Agent') -> None:
         """ implements the wasAssociatedWith property of PROV-O
@@ -204,7 +335,13 @@ class Activity(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Agent'>. 
                 In contradiction to this, the provided attribute is of the type {type(agent)}."""
             )
-        self._was_associated_with_agents.append(agent)
+        with self._on_relation.lock:
+            if agent.node_id in self._was_associated_with_agents:
+                return
+            if self._was_associated_with_agents is _NO_RELATIONS:
+                self._was_associated_with_agents = {}
+            self._was_associated_with_agents[agent.node_id] = agent  # type: ignore
+            self._notify("was_associated_with", agent)
 
     def started_at_time(self, start_time: datetime) -> None:
         """ implements the startedAtTime property of PROV-O
@@ -213,7 +350,9 @@ class Activity(Node):
         if not isinstance(start_time, datetime):
             raise NoDateTime(
                 "The attribute `start_time` of the method `started_at_time` has to be a `datetime` object.")
-        self._start_time = start_time
+        with self._on_relation.lock:
+            self._start_time = start_time
+            self._notify("started_at_time", start_time)
 
     def ended_at_time(self, end_time: datetime) -> None:
         """ implements the endedAtTime property of PROV-O
@@ -223,24 +362,24 @@ class Activity(Node):
             raise NoDateTime(
                 "The attribute `end_time` of the method `ended_at_time` has to be a `datetime` object.")
 
-        self._end_time = end_time
+        with self._on_relation.lock:
+            self._end_time = end_time
+            self._notify("ended_at_time", end_time)
 
 
-@dataclass
 class Agent(Node):
     """ Class to create a PROV-O Agent object.
     https://www.w3.org/TR/prov-o/#Agent """
 
-    _acted_on_behalf_of_agents: list['Agent'] = field(
-        init=False, default_factory=list)
+    __slots__ = ("_acted_on_behalf_of_agents",)
 
-    def __str__(self) -> str:
-        """prints the agent in a nice format."""
-        contents = super().__str__()
+    def __init__(self, label: str = "", description: str = "", node_id: str = "") -> None:
+        super().__init__(label, description, node_id)
+        self._acted_on_behalf_of_agents: Mapping[str, 'Agent'] = _NO_RELATIONS
+
+    def _relation_lines(self, max_items: Optional[int]) -> Iterator[str]:
         if self._acted_on_behalf_of_agents:
-            contents += f"\nacted on behalf of: {[item.label if item.label else item.node_id for item in self._acted_on_behalf_of_agents]}"
-        contents += "\n---"
-        return contents
+            yield _related_line("acted on behalf of", self._acted_on_behalf_of_agents, max_items)
 
     def acted_on_behalf_of(self, agent: 'Agent') -> None:
         """ implements the actedOnBehalfOf property of PROV-O
@@ -252,4 +391,10 @@ class Agent(Node):
                 attribute has to be of type <class 'provo.startingpointclasses.Agent'>. 
                 In contradiction to this, the provided attribute is of the type {type(agent)}."""
             )
-        self._acted_on_behalf_of_agents.append(agent)
+        with self._on_relation.lock:
+            if agent.node_id in self._acted_on_behalf_of_agents:
+                return
+            if self._acted_on_behalf_of_agents is _NO_RELATIONS:
+                self._acted_on_behalf_of_agents = {}
+            self._acted_on_behalf_of_agents[agent.node_id] = agent  # type: ignore
+            self._notify("acted_on_behalf_of", agent)
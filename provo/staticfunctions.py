@@ -1,4 +1,17 @@
 # from provo.startingpointclasses import Activity, Agent, Entity
+import re
+from typing import Optional
+
+from rdflib import Literal, URIRef
+
+_NTRIPLES_LINE = re.compile(
+    r'\s*<([^>]*)>\s*<([^>]*)>\s*'
+    r'(?:<([^>]*)>|"((?:[^"\\]|\\.)*)"(?:@([A-Za-z][A-Za-z0-9-]*)|\^\^<([^>]*)>)?)'
+    r'\s*(?:<[^>]*>\s*)?\.\s*(?:#.*)?'
+)
+_NTRIPLES_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+_NTRIPLES_ESCAPED_CHARS = {"t": "\t", "b": "\b", "n": "\n", "r": "\r",
+                           "f": "\f", '"': '"', "'": "'", "\\": "\\"}
 
 
 def update_dict(dict_old: dict, dict_with_updates: dict) -> dict:
@@ -15,3 +28,52 @@ def update_dict(dict_old: dict, dict_with_updates: dict) -> dict:
 
 def get_option(option, sub_option, default_option):
     return option[sub_option] if option.get(sub_option) else default_option
+
+
+def ntriples_line(triple: tuple) -> str:
+    """formats an rdflib triple as N-Triples line, equivalent to
+    the rows written by rdflib's N-Triples serializer"""
+
+    subject, predicate, obj = triple
+    if isinstance(obj, Literal):
+        encoded = '"%s"' % obj.replace("\\", "\\\\").replace("\n", "\\n").replace(
+            '"', '\\"').replace("\r", "\\r")
+        if obj.language:
+            obj = f"{encoded}@{obj.language}"
+        elif obj.datatype:
+            obj = f"{encoded}^^<{obj.datatype}>"
+        else:
+            obj = encoded
+    else:
+        obj = f"<{obj}>"
+    return f"<{subject}> <{predicate}> {obj} .\n"
+
+
+def _unescape_ntriples(match: re.Match) -> str:
+    code = match.group(1) or match.group(2)
+    if code:
+        return chr(int(code, 16))
+    return _NTRIPLES_ESCAPED_CHARS.get(match.group(3), match.group(0))
+
+
+def parse_ntriples_line(line: str) -> Optional[tuple]:
+    """parses an N-Triples (or N-Quads) line into a (subject, predicate, object)
+    tuple, subject and predicate are returned as str, the object as str if it is an
+    IRI or as rdflib Literal. returns None if the line contains no triple
+    (e.g., if it is empty or a comment) or a triple with blank nodes."""
+
+    match = _NTRIPLES_LINE.fullmatch(line)
+    if not match:
+        return None
+    subject, predicate, obj, lexical, language, datatype = match.groups()
+    if "\\" in line:
+        subject = _NTRIPLES_ESCAPE.sub(_unescape_ntriples, subject)
+        predicate = _NTRIPLES_ESCAPE.sub(_unescape_ntriples, predicate)
+    if obj is not None:
+        if "\\" in obj:
+            obj = _NTRIPLES_ESCAPE.sub(_unescape_ntriples, obj)
+        return subject, predicate, obj
+    if "\\" in lexical:
+        lexical = _NTRIPLES_ESCAPE.sub(_unescape_ntriples, lexical)
+    return subject, predicate, Literal(
+        lexical, lang=language, datatype=URIRef(datatype) if datatype else None)
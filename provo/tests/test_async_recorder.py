@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from rdflib import Graph
+
+from provo.asyncrecorder import AsyncProvRecorder, EventsNotApplied, RecorderClosed
+from provo.idvault import IdAlreadyUsed
+from provo.provontologygraph import ProvOntologyGraph
+
+
+def test_recorder_flushes_to_graph_and_file(tmp_path):
+    file_name = str(tmp_path / "provenance.nt")
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", thread_safe=True)
+
+    async def handle_requests() -> None:
+        async with AsyncProvRecorder(graph, file_name=file_name, batch_size=10) as recorder:
+            service = recorder.record_agent(id="service", label="Service")
+            for i in range(25):
+                request = recorder.record_activity(label=f"request {i}")
+                recorder.record_start_time(request, datetime(2023, 1, 1, 12, 0, i))
+                response = recorder.record_entity(id=f"response_{i}", use_default_namespace=True)
+                recorder.record_relation("was_generated_by", response, request)
+                recorder.record_relation("was_associated_with", request, service)
+                await recorder.drain()
+            await recorder.flush()
+            assert recorder.pending() == 0
+            assert len(graph._activities) == 25
+
+    asyncio.run(handle_requests())
+
+    assert graph.count_relations() == 50
+    assert graph.get_entity("response_24", use_default_namespace=True)._was_generated_by_activities
+    written = Graph().parse(file_name, format="nt")
+    # label and type of the agent, label, type and start time of the activities,
+    # type of the entities and the relations
+    assert len(written) == 2 + 25 * 3 + 25 + 50
+
+
+def test_recorder_backpressure():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+
+    async def produce() -> int:
+        recorder = AsyncProvRecorder(graph, batch_size=1000, max_pending=100)
+        most_pending = 0
+        for _ in range(1000):
+            recorder.record_entity()
+            most_pending = max(most_pending, recorder.pending())
+            await recorder.drain()
+        await recorder.close()
+        return most_pending
+
+    assert asyncio.run(produce()) == 100
+    assert len(graph._entities) == 1000
+
+
+def test_recorder_errors(tmp_path):
+    file_name = str(tmp_path / "provenance.nt")
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+
+    async def record_twice() -> AsyncProvRecorder:
+        recorder = AsyncProvRecorder(graph, file_name=file_name)
+        activity = recorder.record_activity(id="activity")
+        for i in range(8):
+            recorder.record_entity(id=f"e{i}")
+        recorder.record_entity(id="e3")
+        for i in (5, 6, 7, 7):
+            recorder.record_relation("was_generated_by", f"https://provo-example.org/e{i}", activity)
+        with pytest.raises(EventsNotApplied) as raised:
+            await recorder.flush()
+        await recorder.close()
+        return recorder, raised.value
+
+    recorder, error = asyncio.run(record_twice())
+    # the events after the failed one are applied and written as well
+    assert len(error.events) == 1
+    assert isinstance(error.events[0][1], IdAlreadyUsed)
+    assert len(graph._entities) == 8
+    assert graph.count_relations() == 3
+    written = Graph().parse(file_name, format="nt")
+    # types of the activity and the entities and the relations (once each)
+    assert len(written) == 1 + 8 + 3
+    with pytest.raises(RecorderClosed):
+        recorder.record_entity()
+
+
+def test_recorder_background_errors():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+
+    async def record() -> AsyncProvRecorder:
+        recorder = AsyncProvRecorder(graph, batch_size=10)
+        recorder.record_entity(id="e3")
+        for i in range(99):
+            recorder.record_entity(id=f"e{i}")
+            # only background flushes run, a failed event does not stop the later batches
+            while recorder._background:
+                await asyncio.sleep(0)
+        assert len(graph._entities) == 99
+        assert recorder.pending() == 0
+        with pytest.raises(EventsNotApplied) as raised:
+            await recorder.flush()
+        assert len(raised.value.events) == 1
+        # the error is raised once
+        await recorder.flush()
+        await recorder.close()
+        return recorder
+
+    recorder = asyncio.run(record())
+    assert recorder.pending() == 0
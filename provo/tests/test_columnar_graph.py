@@ -0,0 +1,90 @@
+from datetime import datetime
+
+import pytest
+import rdflib
+from rdflib import PROV, URIRef
+
+from provo.columnargraph import ColumnarProvOntologyGraph
+from provo.idvault import IdAlreadyUsed
+from provo.provontologygraph import NodeNotFound, ProvOntologyGraph
+from provo.startingpointclasses import InvalidProvClassForThisRelation, NoDateTime
+
+
+def build_graph(graph):
+    """adds the same nodes and relations to the object based or columnar graph"""
+
+    crime_data = graph.add_entity("crimeData", label="Crime Data")
+    chart = graph.add_entity("chart", label="Chart", description='a "chart"')
+    aggregation = graph.add_activity("aggregation", label="Aggregation")
+    illustration = graph.add_activity("illustration")
+    derek = graph.add_agent("derek", label="Derek")
+    newspaper = graph.add_agent("newspaper")
+
+    aggregation.used(crime_data)
+    aggregation.started_at_time(datetime(2011, 7, 14, 1, 1, 1))
+    aggregation.ended_at_time(datetime(2011, 7, 14, 2, 2, 2))
+    illustration.was_informed_by(aggregation)
+    chart.was_generated_by(illustration)
+    chart.was_derived_from(crime_data)
+    chart.was_attributed_to(derek)
+    derek.acted_on_behalf_of(newspaper)
+    return graph
+
+
+def test_same_triples_as_object_graph(tmp_path):
+    """tests if the columnar graph results in the same triples
+    as the object based graph"""
+
+    graph = build_graph(ProvOntologyGraph(namespace_abbreviation="ex"))
+    columnar_graph = build_graph(
+        ColumnarProvOntologyGraph(namespace_abbreviation="ex"))
+
+    assert len(columnar_graph) == 6
+    assert set(columnar_graph.get_rdflib_graph()) == set(graph.get_rdflib_graph())
+    columnar_graph.serialize_as_rdf(tmp_path / "graph.nt", export_format="nt")
+    assert set(rdflib.Graph().parse(tmp_path / "graph.nt", format="nt")) == set(
+        graph.get_rdflib_graph())
+    assert set(columnar_graph.to_prov_ontology_graph().get_rdflib_graph()) == set(
+        graph.get_rdflib_graph())
+
+
+def test_handles():
+    """tests the handles returned by the columnar graph"""
+
+    graph = build_graph(ColumnarProvOntologyGraph(namespace_abbreviation="ex"))
+    aggregation = graph.get_node("aggregation", use_default_namespace=True)
+    derek = graph.get_node("https://provo-example.org/derek")
+
+    assert aggregation.label == "Aggregation"
+    assert aggregation.get_start_time() == datetime(2011, 7, 14, 1, 1, 1)
+    assert aggregation == graph.get_node(aggregation.node_id)
+    aggregation.was_associated_with(derek)
+    assert (URIRef(aggregation.node_id), PROV.wasAssociatedWith,
+            URIRef(derek.node_id)) in graph.get_rdflib_graph()
+
+    with pytest.raises(InvalidProvClassForThisRelation):
+        aggregation.used(derek)
+    with pytest.raises(InvalidProvClassForThisRelation):
+        derek.acted_on_behalf_of(
+            build_graph(ColumnarProvOntologyGraph(namespace_abbreviation="ex")).get_node(derek.node_id))
+    with pytest.raises(NoDateTime):
+        aggregation.started_at_time("01.01.1980")  # type: ignore
+    with pytest.raises(IdAlreadyUsed):
+        graph.add_agent("derek")
+    with pytest.raises(NodeNotFound):
+        graph.get_node("derek")
+
+
+def test_summary_from_columns():
+    """tests if str() streamed from the columns equals the one of the object based graph"""
+
+    graph = build_graph(ColumnarProvOntologyGraph(namespace_abbreviation="ex"))
+    chart = graph.get_node("chart", use_default_namespace=True)
+    crime_data = graph.get_node("crimeData", use_default_namespace=True)
+    # relations of earlier rows after the ones of later rows, and a duplicate
+    crime_data.was_derived_from(chart)
+    chart.was_derived_from(crime_data)
+    object_graph = graph.to_prov_ontology_graph()
+
+    assert str(graph) == str(object_graph)
+    assert list(graph.iter_lines(limit=1, max_items=1)) == list(object_graph.iter_lines(limit=1, max_items=1))
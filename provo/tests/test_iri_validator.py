@@ -0,0 +1,43 @@
+from provo.irivalidator import is_valid_iri, is_valid_namespace
+
+
+def test_valid_iris():
+    """tests if valid IRIs, including non-ASCII ones, are accepted"""
+
+    valid_iris = [
+        "https://test.package/test",
+        "https://test.package#test",
+        "https://test.package/über",
+        "https://test.package/te%20st",
+        "https://test.package/test?query=value/with/slashes",
+        "http://[::1]:8080/test",
+        "urn:example:animal:ferret:nose",
+        "mailto:derek@example.org",
+    ]
+    for iri in valid_iris:
+        assert is_valid_iri(iri)
+
+
+def test_invalid_iris():
+    """tests if malformed IRIs are rejected, in the namespace
+    as well as in the local name"""
+
+    invalid_iris = [
+        "www.test.de",
+        "https://test.package/te st",
+        "https://test.package/te%2",
+        "https://test.package#te#st",
+        "https://te st.package/test",
+        "https://te^st.package",
+    ]
+    for iri in invalid_iris:
+        assert not is_valid_iri(iri)
+
+
+def test_trusted_iris():
+    """tests if trusted IRIs only get their namespace validated"""
+
+    assert is_valid_iri("https://test.package/te st", trusted=True)
+    assert not is_valid_iri("https://te st.package/test", trusted=True)
+    assert is_valid_namespace("https://test.package/")
+    assert is_valid_namespace.cache_info().currsize > 0
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+import pytest
+
+from provo.journal import JournalMismatch, read_journal
+from provo.provontologygraph import ProvOntologyGraph
+
+
+def record(graph: ProvOntologyGraph) -> None:
+    dataset = graph.add_entity(id="dataset", label="Data\tset\n", use_default_namespace=True)
+    job = graph.add_activity(id="job", description="Ünïcode", use_default_namespace=True)
+    job.started_at_time(datetime(2023, 1, 1, 12, 0))
+    job.started_at_time(datetime(2023, 1, 1, 13, 0))
+    job.used(dataset)
+    results = graph.add_entities(ids=[f"result_{i}" for i in range(3)])
+    graph.add_relations("was_generated_by", results, [job] * 3)
+    job.was_associated_with(graph.add_agent(label="Operator"))
+
+
+def test_replay_after_crash(tmp_path):
+    journal = str(tmp_path / "provenance.journal")
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal, journal_sync_every=4)
+    record(graph)
+    # the process crashes: the buffer of the journal is lost, except for the synced records
+    graph.sync_journal()
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write('["N",0,"https://provo-example.org/inco')
+
+    restored = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+
+    assert isomorphic(graph.get_rdflib_graph(), restored.get_rdflib_graph())
+    assert restored.get_entity("dataset", use_default_namespace=True).label == "Data\tset\n"
+    assert restored.get_activity("job", use_default_namespace=True).get_start_time() == datetime(2023, 1, 1, 13, 0)
+    assert restored.count_relations() == graph.count_relations() == 5
+    # further changes are appended to the same journal
+    restored.add_entity(id="report", use_default_namespace=True)
+    restored.close_journal()
+    again = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    assert len(again._entities) == 5
+
+
+def test_compact_journal(tmp_path):
+    journal = str(tmp_path / "provenance.journal")
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    record(graph)
+    graph.sync_journal()
+    records = len(list(read_journal(journal)))
+
+    graph.compact_journal(str(tmp_path / "provenance.nt"))
+
+    # the overwritten start time is dropped
+    assert len(list(read_journal(journal))) == records - 1
+    written = Graph().parse(str(tmp_path / "provenance.nt"), format="nt")
+    assert isomorphic(graph.get_rdflib_graph(), written)
+    graph.add_agent(id="auditor", use_default_namespace=True)
+    graph.close_journal()
+    restored = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    assert restored.get_agent("auditor", use_default_namespace=True)
+
+
+def test_replay_relations_to_foreign_nodes(tmp_path):
+    journal = str(tmp_path / "provenance.journal")
+    other_graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    dataset = other_graph.add_entity(id="dataset", use_default_namespace=True)
+    operator = other_graph.add_agent(id="operator", use_default_namespace=True)
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    job = graph.add_activity(id="job", use_default_namespace=True)
+    job.used(dataset)
+    job.was_associated_with(operator)
+    graph.close_journal()
+
+    restored = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    restored_job = restored.get_activity("job", use_default_namespace=True)
+    assert list(restored_job._used_entities) == [dataset.node_id]
+    assert list(restored_job._was_associated_with_agents) == [operator.node_id]
+    assert len(restored._nodes) == 1
+    assert isomorphic(graph.get_rdflib_graph(), restored.get_rdflib_graph())
+
+
+def test_replay_checks_header(tmp_path):
+    journal = str(tmp_path / "provenance.journal")
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    record(graph)
+    graph.close_journal()
+
+    with pytest.raises(JournalMismatch):
+        ProvOntologyGraph(namespace_abbreviation="ex", lang="de", journal=journal)
+    with pytest.raises(JournalMismatch):
+        ProvOntologyGraph(default_namespace="https://other.org/", namespace_abbreviation="other", journal=journal)
+
+
+def test_replay_changed_labels(tmp_path):
+    journal = str(tmp_path / "provenance.journal")
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+    entity = graph.add_entity(id="dataset", label="old", use_default_namespace=True)
+    entity.label = "new"
+    entity.description = "desc"
+    graph.close_journal()
+
+    restored = ProvOntologyGraph(namespace_abbreviation="ex", journal=journal)
+
+    restored_entity = restored.get_entity("dataset", use_default_namespace=True)
+    assert restored_entity.label == "new"
+    assert restored_entity.description == "desc"
+    assert isomorphic(graph.get_rdflib_graph(), restored.get_rdflib_graph())
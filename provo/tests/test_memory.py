@@ -0,0 +1,82 @@
+import tracemalloc
+from dataclasses import dataclass, field
+
+from provo.columnargraph import ColumnarProvOntologyGraph
+from provo.provontologygraph import ProvOntologyGraph
+from provo.startingpointclasses import Activity, Entity
+
+
+@dataclass
+class DataclassEntity:
+    """layout of the entities before they were slotted (for comparison)"""
+
+    label: str = ""
+    description: str = ""
+    node_id: str = ""
+    _on_relation: object = None
+    _was_derived_from_entities: dict = field(default_factory=dict)
+    _was_generated_by_activities: dict = field(default_factory=dict)
+    _was_attributed_to_agents: dict = field(default_factory=dict)
+
+
+def bytes_per_node(node_class, n: int = 10000) -> float:
+    """measures the memory that is allocated per node"""
+
+    node_ids = [f"https://test.package/{i}" for i in range(n)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [node_class(node_id=node_id) for node_id in node_ids]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(nodes) == n
+    return (after - before) / n
+
+
+def test_bytes_per_node():
+    """tests if slotted nodes without relations need considerably less memory
+    than the former dataclass nodes"""
+
+    before = bytes_per_node(DataclassEntity)
+    after = bytes_per_node(Entity)
+    print(f"bytes per entity: {before:.0f} (dataclass) -> {after:.0f} (slotted)")
+    assert after < before / 3
+
+
+def test_relations_are_allocated_lazily():
+    """tests if nodes share the empty relations until the first relation is added"""
+
+    entity, other_entity = Entity(node_id="https://test.package/entity"), Entity()
+    activity = Activity(node_id="https://test.package/activity")
+    assert entity._was_generated_by_activities is other_entity._was_derived_from_entities
+    assert not hasattr(entity, "__dict__")
+
+    entity.was_generated_by(activity)
+    assert list(entity._was_generated_by_activities.values()) == [activity]
+    assert not other_entity._was_generated_by_activities
+
+
+def bytes_per_graph_node(graph, n: int = 10000) -> float:
+    """measures the memory that is allocated per node (including its
+    id and one relation) when the nodes are added to the graph"""
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    previous_entity = graph.add_entity("entity", label="entity")
+    for i in range(n - 1):
+        entity = graph.add_entity(f"entity{i}", label="entity")
+        entity.was_derived_from(previous_entity)
+        previous_entity = entity
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / n
+
+
+def test_bytes_per_columnar_graph_node():
+    """tests if the columnar graph needs considerably less memory per node
+    than the object based graph"""
+
+    objects = bytes_per_graph_node(ProvOntologyGraph(namespace_abbreviation="ex"))
+    columns = bytes_per_graph_node(
+        ColumnarProvOntologyGraph(namespace_abbreviation="ex"))
+    print(f"bytes per node: {objects:.0f} (objects) -> {columns:.0f} (columns)")
+    assert columns < objects / 2.5
@@ -0,0 +1,120 @@
+from provo.provontologygraph import ProvOntologyGraph
+
+
+def build() -> ProvOntologyGraph:
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    data = graph.add_entity(id="data", label="Data")
+    result = graph.add_entity(id="result")
+    job = graph.add_activity(id="job", label="Job")
+    previous_job = graph.add_activity(id="prev")
+    alice = graph.add_agent(id="alice", label="Alice")
+    organization = graph.add_agent(id="org")
+    result.was_derived_from(data)
+    result.was_generated_by(job)
+    result.was_attributed_to(alice)
+    job.used(data)
+    job.was_informed_by(previous_job)
+    job.was_associated_with(alice)
+    alice.acted_on_behalf_of(organization)
+    return graph
+
+
+EXPECTED_FLOWCHART = r"""```mermaid
+flowchart LR
+classDef entity fill:#fffedf
+classDef entity color:#123456
+classDef entity stroke:#a4a4a4
+classDef entity stroke-width:1px
+classDef activity fill:#cfceff
+classDef activity color:#000000
+classDef activity stroke:#a4a4a4
+classDef activity stroke-width:1px
+classDef agent fill:#ffebc3
+classDef agent color:#000000
+classDef agent stroke:#a4a4a4
+classDef agent stroke-width:3px
+https://provo-example.org/data[<a style=color:inherit href=https://provo-example.org/data>Data</a>]:::entity
+https://provo-example.org/result[<a style=color:inherit href=https://provo-example.org/result>https://provo-example.org/result</a>]:::entity
+https://provo-example.org/data-- <a style=color:inherit href=https://www.w3.org/TR/prov-o/#wasDerivedFrom>originated from</a> -->https://provo-example.org/result
+https://provo-example.org/job[[<a style=color:inherit href=https://provo-example.org/job>Job</a>]]:::activity
+https://provo-example.org/prev-- <a style=color:inherit href=https://www.w3.org/TR/prov-o/#wasInformedBy>informed</a> -->https://provo-example.org/job
+https://provo-example.org/data-- <a style=color:inherit href=https://www.w3.org/TR/prov-o/#used>was used by</a> -->https://provo-example.org/job
+https://provo-example.org/prev[[<a style=color:inherit href=https://provo-example.org/prev>https://provo-example.org/prev</a>]]:::activity
+https://provo-example.org/alice[/<a style=color:inherit href=https://provo-example.org/alice>Alice</a>\]:::agent
+https://provo-example.org/org[/<a style=color:inherit href=https://provo-example.org/org>https://provo-example.org/org</a>\]:::agent
+```"""
+
+
+def test_mermaid_flowchart_output(tmp_path):
+    """tests the complete output for user options that change
+    the shapes, the styles and the direction of the relations"""
+
+    build().export_as_mermaid_flowchart(str(tmp_path / "flowchart.md"), {
+        "invert-relations": True,
+        "orientation": "LR",
+        "included-relations": ["was_derived_from", "was_informed_by", "used"],
+        "entity": {"shape": "[:]", "color": "#123456"},
+        "agent": {"stroke-width": "3px"},
+    })
+    with open(tmp_path / "flowchart.md", encoding="utf-8") as f:
+        assert f.read() == EXPECTED_FLOWCHART
+
+
+def build_shards(shards: int) -> ProvOntologyGraph:
+    """one activity per shard (by alice), merged by bob"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    alice = graph.add_agent(id="alice", label="Alice")
+    bob = graph.add_agent(id="bob", label="Bob")
+    data = graph.add_entity(id="data", label="Data")
+    merge = graph.add_activity(id="merge", label="Merge")
+    merge.was_associated_with(bob)
+    for i in range(shards):
+        shard = graph.add_activity(id=f"shard_{i}", label=f"Shard {i}")
+        shard.used(data)
+        shard.was_associated_with(alice)
+        part = graph.add_entity(id=f"part_{i}", label=f"Part {i}")
+        part.was_generated_by(shard)
+        merge.used(part)
+    return graph
+
+
+def flowchart_lines(graph: ProvOntologyGraph, file_name: str, options: dict) -> list[str]:
+    graph.export_as_mermaid_flowchart(file_name, options)
+    with open(file_name, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def test_mermaid_aggregation_by_label(tmp_path):
+    """tests if the size of the flowchart does not depend on the number of shards"""
+
+    options = {"aggregation": "label", "subgraphs": True}
+    small = flowchart_lines(build_shards(10), str(tmp_path / "small.md"), options)
+    large = flowchart_lines(build_shards(1000), str(tmp_path / "large.md"), options)
+    assert len(small) == len(large)
+    assert 'activity_aggregate_3[["Shard # (1000)"]]:::activity' in large
+    assert 'entity_aggregate_1(["Part # (1000)"]):::entity' in large
+    assert large.count("end") == 2
+    assert 'subgraph https://provo-example.org/alice-group ["Alice"]' in large
+    # edges between the same summary nodes are written once
+    assert len([line for line in large if line.startswith("activity_aggregate_3-")]) == 2
+
+
+def test_mermaid_aggregation_by_agent(tmp_path):
+    lines = flowchart_lines(build_shards(10), str(tmp_path / "agent.md"), {
+        "aggregation": "agent", "aggregation-min-count": 3})
+    assert 'activity_aggregate_2[["10 activities of Alice"]]:::activity' in lines
+    # merge is the only activity of bob
+    assert any(line.startswith("https://provo-example.org/merge[[") for line in lines)
+    assert not any(line.startswith("subgraph") for line in lines)
+
+
+def test_mermaid_aggregation_quotes_labels(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    agent = graph.add_agent(id="alice", label='Alice "the admin" (ops)')
+    for i in range(3):
+        graph.add_activity(id=f"run_{i}", label=f'Run "{i}" (nightly)').was_associated_with(agent)
+
+    lines = flowchart_lines(graph, str(tmp_path / "quoted.md"), {"aggregation": "label", "subgraphs": True})
+    assert 'activity_aggregate_0[["Run #quot;##quot; (nightly) (3)"]]:::activity' in lines
+    assert 'subgraph https://provo-example.org/alice-group ["Alice #quot;the admin#quot; (ops)"]' in lines
@@ -1,10 +1,12 @@
 
 import pytest
 
-from provo.provontologygraph import (NamespaceHasNoEndSymbol,
+from provo.idvault import IdAlreadyUsed
+from provo.provontologygraph import (BatchMalformed, NamespaceHasNoEndSymbol, NodeNotFound,
                                      NamespaceMalformed, PrefixNotAllowed,
                                      PrefixShorthandNotValid,
                                      ProvOntologyGraph)
+from provo.startingpointclasses import InvalidProvClassForThisRelation
 
 
 def test_graph_initialization():
@@ -32,3 +34,195 @@ def test_graph_initialization():
     for prefix in core_prefixes:
         with pytest.raises(PrefixNotAllowed):
             ProvOntologyGraph(namespace_abbreviation=prefix)
+
+
+def test_node_lookup():
+    """tests if nodes can be retrieved by their id"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    entity = graph.add_entity("entity")
+    activity = graph.add_activity()
+    agent = graph.add_agent("https://test.package/agent",
+                            use_default_namespace=False)
+
+    assert graph.get_node(entity.node_id) is entity
+    assert graph.get_entity("entity", use_default_namespace=True) is entity
+    assert graph.get_activity(activity.node_id) is activity
+    assert graph.get_agent("https://test.package/agent") is agent
+
+    with pytest.raises(NodeNotFound):
+        graph.get_node("entity")
+    with pytest.raises(NodeNotFound):
+        graph.get_agent(entity.node_id)
+
+
+def test_inverse_relations():
+    """tests if the inverse relations are indexed when relations are added"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    raw_data, result, chart = (graph.add_entity(id)
+                               for id in ("raw_data", "result", "chart"))
+    aggregation = graph.add_activity("aggregation")
+    illustration = graph.add_activity("illustration")
+    derek, newspaper = graph.add_agent("derek"), graph.add_agent("newspaper")
+
+    aggregation.used(raw_data)
+    illustration.used(raw_data)
+    result.was_generated_by(aggregation)
+    chart.was_generated_by(illustration)
+    chart.was_derived_from(result)
+    result.was_attributed_to(derek)
+    chart.was_attributed_to(derek)
+    illustration.was_informed_by(aggregation)
+    illustration.was_associated_with(derek)
+    derek.acted_on_behalf_of(newspaper)
+
+    assert graph.used_by(raw_data) == [aggregation, illustration]
+    assert graph.used_by(chart) == []
+    assert graph.generated(aggregation) == [result]
+    assert graph.derived(result) == [chart]
+    assert graph.attributed(derek) == [result, chart]
+    assert graph.informed(aggregation) == [illustration]
+    assert graph.associated(derek) == [illustration]
+    assert graph.instructed(newspaper) == [derek]
+
+
+def test_lineage():
+    """tests the traversal of the upstream and downstream lineage"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    raw_data, result, chart = (graph.add_entity(id)
+                               for id in ("raw_data", "result", "chart"))
+    aggregation = graph.add_activity("aggregation")
+    illustration = graph.add_activity("illustration")
+    derek = graph.add_agent("derek")
+
+    aggregation.used(raw_data)
+    result.was_generated_by(aggregation)
+    illustration.used(result)
+    chart.was_generated_by(illustration)
+    chart.was_attributed_to(derek)
+    chart.was_derived_from(result)
+    # cycles do not lead to endless traversals
+    raw_data.was_derived_from(chart)
+
+    assert graph.ancestors(chart, relations=["was_generated_by", "used"]) == [
+        illustration, result, aggregation, raw_data]
+    assert graph.ancestors(chart, max_depth=1) == [result, illustration, derek]
+    assert graph.ancestors(chart) == [
+        result, illustration, derek, aggregation, raw_data]
+    assert graph.descendants(result, relations=["was_derived_from"]) == [
+        chart, raw_data]
+    assert graph.descendants(raw_data) == [aggregation, result, chart, illustration]
+
+    # the cached results are invalidated by new relations
+    unrelated = graph.add_entity("unrelated")
+    assert unrelated not in graph.ancestors(chart)
+    aggregation.used(unrelated)
+    assert unrelated in graph.ancestors(chart)
+
+
+def test_lineage_cache():
+    """tests if only the cached results a new relation changes are dropped
+    and if the cache is bounded"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    source = graph.add_entity("source")
+    activity = graph.add_activity("activity")
+    activity.used(source)
+    other_source = graph.add_entity("other_source")
+    other_activity = graph.add_activity("other_activity")
+    other_activity.used(other_source)
+    assert graph.ancestors(activity) == [source]
+    assert graph.descendants(other_source) == [other_activity]
+    assert graph.descendants(source) == [activity]
+
+    # the ancestors of activity and the descendants of source do not change
+    derived = graph.add_entity("derived")
+    derived.was_derived_from(other_source)
+    assert len(graph._lineage_cache) == 2
+    assert graph.descendants(other_source) == [derived, other_activity]
+    result = graph.add_entity("result")
+    result.was_generated_by(activity)
+    assert graph.descendants(source) == [activity, result]
+    assert graph.ancestors(activity) == [source]
+
+    graph.lineage_cache_size = 5
+    entities = graph.add_entities(ids=[f"entity{i}" for i in range(10)])
+    for entity in entities:
+        graph.ancestors(entity)
+    assert len(graph._lineage_cache) == 5
+    assert set(graph._lineage_index) == {entity.node_id for entity in entities[5:]}
+
+
+def test_generated_ids():
+    """tests if nodes without id get generated ids in the default namespace, also
+    with use_default_namespace=True (the default), which used to register the
+    bare namespace as id of the first such node and to fail for the second one"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    nodes = [graph.add_entity(), graph.add_entity(), graph.add_activity(use_default_namespace=True),
+             graph.add_agent(id="", use_default_namespace=False)]
+
+    node_ids = {node.node_id for node in nodes}
+    assert len(node_ids) == 4
+    assert graph.default_namespace not in node_ids
+    assert all(node_id.startswith(graph.default_namespace) for node_id in node_ids)
+    assert all(len(node_id) == len(graph.default_namespace) + 36 for node_id in node_ids)
+
+
+def test_no_relation_duplication():
+    """tests if relations that are added repeatedly are only stored once"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    entity = graph.add_entity("entity")
+    activity = graph.add_activity("activity")
+    for _ in range(3):
+        entity.was_generated_by(activity)
+        activity.used(entity)
+
+    assert list(entity._was_generated_by_activities.values()) == [activity]
+    assert list(activity._used_entities.values()) == [entity]
+    assert graph.generated(activity) == [entity]
+    assert graph.count_relations() == 2
+
+
+def test_batches():
+    """tests the creation of nodes and relations in batches"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    entities = graph.add_entities(
+        ids=["raw", "", "chart"], labels=["Raw", "Anonymous", "Chart"])
+    activities = graph.add_activities(labels=["Aggregation", "Illustration"])
+    agents = graph.add_agents(["derek"], descriptions=["a person"])
+
+    assert [entity.label for entity in entities] == ["Raw", "Anonymous", "Chart"]
+    assert entities[0].node_id == "https://provo-example.org/raw"
+    assert entities[1].node_id.startswith("https://provo-example.org/")
+    assert len({activity.node_id for activity in activities}) == 2
+    assert graph.get_agent("derek", use_default_namespace=True) is agents[0]
+
+    graph.add_relations("was_generated_by", entities[1:], activities)
+    graph.add_relations("used", [activities[0].node_id], [entities[0].node_id])
+    assert graph.generated(activities[1]) == [entities[2]]
+    assert graph.used_by(entities[0]) == [activities[0]]
+
+    with pytest.raises(BatchMalformed):
+        graph.add_entities(ids=["a", "b"], labels=["A"])
+    with pytest.raises(BatchMalformed):
+        graph.add_relations("generated", entities[1:], activities)
+    with pytest.raises(BatchMalformed):
+        graph.add_relations("used", activities, entities)
+    with pytest.raises(InvalidProvClassForThisRelation):
+        graph.add_relations("used", entities[:1], entities[:1])
+    # a batch with an invalid row partway through adds none of its relations
+    relation_count = graph.count_relations()
+    with pytest.raises(InvalidProvClassForThisRelation):
+        graph.add_relations("used", activities * 2, [entities[1], entities[2], agents[0], entities[0]])
+    with pytest.raises(NodeNotFound):
+        graph.add_relations("used", activities, [entities[1], "https://provo-example.org/unknown"])
+    assert graph.count_relations() == relation_count
+    assert graph.used_by(entities[1]) == []
+    with pytest.raises(IdAlreadyUsed):
+        graph.add_entities(ids=["new", "raw"])
+    assert len(graph._entities) == 3
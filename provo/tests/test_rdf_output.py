@@ -1,10 +1,12 @@
 
 import pprint
 from datetime import datetime
-from rdflib import FOAF, RDF, Literal, URIRef  # type: ignore
+from rdflib import FOAF, PROV, RDF, RDFS, XSD, Literal, URIRef  # type: ignore
 
+import pytest
 import rdflib
 from pathlib import Path
+from provo.idvault import IdAlreadyUsed
 from provo.provontologygraph import ProvOntologyGraph
 
 THIS_DIR = Path(__file__).resolve().parent
@@ -144,3 +146,112 @@ def test_graph_isomorphism_long_ex():
 
     # Assert that the sets of triples are equal
     assert set(rdflib_graph) == set(target_graph)
+
+
+def test_incremental_rdflib_graph(tmp_path):
+    """tests if the cached rdflib graph is updated with nodes, relations and
+    labels that were added or changed after the first call of get_rdflib_graph,
+    and if triples added by the user are not serialized"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    entity = graph.add_entity("entity", label="entity")
+    activity = graph.add_activity("activity")
+    entity.was_generated_by(activity)
+    activity.started_at_time(datetime(2011, 7, 14, 1, 1, 1))
+
+    rdflib_graph = graph.get_rdflib_graph()
+    triple_count = len(rdflib_graph)
+    rdflib_graph.add((URIRef(entity.node_id), RDFS.seeAlso, URIRef("https://example.org")))
+
+    agent = graph.add_agent("agent")
+    entity.was_attributed_to(agent)
+    activity.started_at_time(datetime(2011, 7, 14, 2, 2, 2))
+    entity.label = "renamed entity"
+    activity.description = "an activity"
+
+    graph.serialize_as_rdf(tmp_path / "graph.ttl")
+    assert graph.get_rdflib_graph() is rdflib_graph
+    assert len(rdflib_graph) == triple_count + 4
+    assert (URIRef(entity.node_id), PROV.wasAttributedTo,
+            URIRef(agent.node_id)) in rdflib_graph
+    assert list(rdflib_graph.objects(URIRef(activity.node_id), PROV.startedAtTime)) == [
+        Literal(datetime(2011, 7, 14, 2, 2, 2), datatype=XSD.dateTime)]
+    assert list(rdflib_graph.objects(URIRef(entity.node_id), RDFS.label)) == [
+        Literal("renamed entity", lang="en")]
+    assert (URIRef(activity.node_id), RDFS.comment, Literal("an activity", lang="en")) in rdflib_graph
+    # the triple of the user is only part of the returned graph
+    assert (URIRef(entity.node_id), RDFS.seeAlso, None) in rdflib_graph
+    serialized = rdflib.Graph().parse(tmp_path / "graph.ttl")
+    assert set(serialized) == set(rdflib_graph) - {
+        (URIRef(entity.node_id), RDFS.seeAlso, URIRef("https://example.org"))}
+
+
+def test_streamed_ntriples(tmp_path):
+    """tests if the streamed n-triples and n-quads contain
+    the same triples as the rdflib graph"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    entity = graph.add_entity("entity", label='an "entity"',
+                              description="line 1\nline 2 \\")
+    origin = graph.add_entity(label="origin")
+    activity = graph.add_activity("activity", label="Aktivität")
+    agent = graph.add_agent("agent")
+    instructor = graph.add_agent("instructor")
+    entity.was_derived_from(origin)
+    entity.was_generated_by(activity)
+    entity.was_attributed_to(agent)
+    activity.used(origin)
+    activity.was_informed_by(activity)
+    activity.was_associated_with(agent)
+    activity.started_at_time(datetime(2011, 7, 14, 1, 1, 1))
+    activity.ended_at_time(datetime(2011, 7, 14, 2, 2, 2))
+    agent.acted_on_behalf_of(instructor)
+
+    graph.serialize_as_rdf(tmp_path / "graph.nt", export_format="nt")
+    graph.serialize_as_rdf(tmp_path / "graph.nq", export_format="nquads")
+    # the rdflib graph of the other formats is not kept either
+    graph.serialize_as_rdf(tmp_path / "graph.ttl")
+    assert graph._rdflib_graph is None
+
+    streamed_graph = rdflib.Graph().parse(tmp_path / "graph.nt", format="nt")
+    streamed_dataset = rdflib.Dataset().parse(
+        tmp_path / "graph.nq", format="nquads")
+    assert set(streamed_graph) == set(graph.get_rdflib_graph())
+    assert set(streamed_dataset.triples((None, None, None))) == set(
+        graph.get_rdflib_graph())
+
+
+def test_read_graph(tmp_path):
+    """tests if a serialized graph is read again completely,
+    from turtle as well as from n-triples"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    entity = graph.add_entity("entity", label='an "entity"',
+                              description="line 1\nline 2")
+    origin = graph.add_entity(label="Ursprung")
+    activity = graph.add_activity("activity", label="activity")
+    agent = graph.add_agent("agent")
+    instructor = graph.add_agent("instructor")
+    entity.was_derived_from(origin)
+    entity.was_generated_by(activity)
+    entity.was_attributed_to(agent)
+    activity.used(origin)
+    activity.was_informed_by(activity)
+    activity.started_at_time(datetime(2011, 7, 14, 1, 1, 1))
+    activity.ended_at_time(datetime(2011, 7, 14, 2, 2, 2))
+    activity.was_associated_with(agent)
+    agent.acted_on_behalf_of(instructor)
+
+    for export_format in ("turtle", "nt", "json-ld"):
+        file_name = tmp_path / f"graph.{export_format}"
+        graph.serialize_as_rdf(file_name, export_format=export_format)
+        read_graph = ProvOntologyGraph(namespace_abbreviation="ex")
+        read_graph.read_graph(file_name, import_format=export_format)
+        assert set(read_graph.get_rdflib_graph()) == set(graph.get_rdflib_graph())
+        assert len(read_graph._entities) == 2
+        assert len(read_graph._activities) == 1
+        assert len(read_graph._agents) == 2
+
+        with pytest.raises(IdAlreadyUsed):
+            read_graph.read_graph(file_name, import_format=export_format)
+        assert len(read_graph._entities) == 2
@@ -0,0 +1,78 @@
+import pytest
+from rdflib import PROV, RDF, Graph
+from rdflib.compare import isomorphic
+
+from provo.provontologygraph import NodeSelection, ProvOntologyGraph, SelectionMalformed
+
+
+def build(graph: ProvOntologyGraph) -> None:
+    """two independent pipelines of 20 steps each"""
+
+    for pipeline in ("a", "b"):
+        previous = graph.add_entity(id=f"{pipeline}_input", label="Input")
+        for i in range(20):
+            step = graph.add_activity(id=f"{pipeline}_step_{i}", label=f"Step {i}")
+            step.used(previous)
+            output = graph.add_entity(id=f"{pipeline}_output_{i}")
+            output.was_generated_by(step)
+            output.was_derived_from(previous)
+            previous = output
+
+
+def ids(graph: Graph) -> set:
+    return {str(subject) for subject in graph.subjects(RDF.type, None)}
+
+
+def test_lineage_selection():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(graph)
+    output = graph.get_entity("a_output_2", use_default_namespace=True)
+
+    lineage = graph.get_rdflib_graph(NodeSelection(seeds=[output]))
+    assert ids(lineage) == {f"https://provo-example.org/{id}" for id in (
+        "a_input", "a_step_0", "a_output_0", "a_step_1", "a_output_1", "a_step_2", "a_output_2")}
+    # relations to nodes outside of the selection are left out
+    derived = graph.get_rdflib_graph(NodeSelection(
+        seeds=[output.node_id], depth=1, relations=["was_derived_from"]))
+    assert ids(derived) == {"https://provo-example.org/a_output_1", "https://provo-example.org/a_output_2"}
+    assert len(list(derived.triples((None, PROV.wasGeneratedBy, None)))) == 0
+    assert len(list(derived.triples((None, PROV.wasDerivedFrom, None)))) == 1
+
+    downstream = graph.get_rdflib_graph(NodeSelection(seeds=[output], direction="downstream", depth=1))
+    assert ids(downstream) == {f"https://provo-example.org/{id}" for id in (
+        "a_output_2", "a_step_3", "a_output_3")}
+    both = graph.get_rdflib_graph(NodeSelection(seeds=[output], direction="both"))
+    assert len(ids(both)) == 41
+
+    # the full graph is not affected
+    assert len(ids(graph.get_rdflib_graph())) == 82
+    with pytest.raises(SelectionMalformed):
+        graph.get_rdflib_graph(NodeSelection(seeds=[output], direction="sideways"))
+
+
+def test_predicate_selection(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(graph)
+    selection = NodeSelection(predicate=lambda node: node.node_id.startswith("https://provo-example.org/b_"))
+
+    graph.serialize_as_rdf(str(tmp_path / "b.nt"), export_format="nt", selection=selection)
+    streamed = Graph().parse(str(tmp_path / "b.nt"))
+    assert len(ids(streamed)) == 41
+    assert isomorphic(streamed, graph.get_rdflib_graph(selection))
+
+    graph.export_as_mermaid_flowchart(str(tmp_path / "b.md"), selection=selection)
+    with open(tmp_path / "b.md", encoding="utf-8") as f:
+        flowchart = f.read()
+    assert "https://provo-example.org/b_step_0" in flowchart
+    assert "https://provo-example.org/a_" not in flowchart
+
+
+def test_selection_of_spilled_nodes(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", max_resident_nodes=10)
+    build(graph)
+    reference = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(reference)
+    selection = NodeSelection(seeds=["https://provo-example.org/a_output_5"], depth=4)
+
+    assert isomorphic(graph.get_rdflib_graph(selection), reference.get_rdflib_graph(selection))
+    assert len(ids(graph.get_rdflib_graph(selection))) == 9
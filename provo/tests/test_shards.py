@@ -0,0 +1,111 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
+import pytest
+from rdflib.compare import isomorphic
+
+from provo.idvault import IdAlreadyUsed
+from provo.provontologygraph import GraphShard, NodeNotFound, ProvOntologyGraph
+from provo.startingpointclasses import Entity, InvalidProvClassForThisRelation
+
+
+def record_shard(worker: int, input: Entity) -> GraphShard:
+    """records the provenance of a worker, the input belongs to the graph of the parent"""
+
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    job = graph.add_activity(id=f"job_{worker}", label=f"Job {worker}", use_default_namespace=True)
+    job.started_at_time(datetime(2023, 1, worker + 1))
+    result = graph.add_entity(id=f"result_{worker}", use_default_namespace=True)
+    result.was_generated_by(job)
+    job.used(input)
+    return graph.to_shard()
+
+
+def test_merge_graphs():
+    first = ProvOntologyGraph(namespace_abbreviation="ex")
+    second = ProvOntologyGraph(namespace_abbreviation="ex")
+    dataset = first.add_entity(id="dataset", label="Dataset", use_default_namespace=True)
+    analysis = second.add_activity(id="analysis", use_default_namespace=True)
+    analysis.used(dataset)
+    analysis.ended_at_time(datetime(2023, 5, 1))
+    analyst = second.add_agent(label="Analyst")
+    analysis.was_associated_with(analyst)
+
+    merged = ProvOntologyGraph.from_shards([first, second])
+
+    assert merged.namespace_abbreviation == "ex"
+    assert merged.get_entity("dataset", use_default_namespace=True).label == "Dataset"
+    assert merged.used_by(merged.get_node(dataset.node_id)) == [merged.get_node(analysis.node_id)]
+    assert merged.get_activity(analysis.node_id).get_end_time() == datetime(2023, 5, 1)
+    assert merged.count_relations() == 2
+    assert len(merged.get_rdflib_graph()) == len(first.get_rdflib_graph()) + len(second.get_rdflib_graph())
+    expected = ProvOntologyGraph(namespace_abbreviation="ex")
+    expected.merge(first)
+    expected.merge(second.to_shard())
+    assert isomorphic(expected.get_rdflib_graph(), merged.get_rdflib_graph())
+
+
+def test_merge_detects_collisions():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    graph.add_entity(id="dataset", use_default_namespace=True)
+    other = ProvOntologyGraph(namespace_abbreviation="ex")
+    other.add_entity(id="report", use_default_namespace=True)
+    other.add_activity(id="dataset", use_default_namespace=True)
+
+    with pytest.raises(IdAlreadyUsed):
+        graph.merge(other)
+    # nothing of the other graph was added
+    assert len(graph._id_vault) == 1
+    assert len(graph._entities) == 1
+
+    dangling = ProvOntologyGraph(namespace_abbreviation="ex")
+    dangling.add_activity().used(other.get_entity("report", use_default_namespace=True))
+    with pytest.raises(NodeNotFound):
+        graph.merge(dangling)
+    assert len(graph._activities) == 0
+
+    def shard(relations: dict, start_times: dict = {}) -> GraphShard:
+        return GraphShard(
+            default_namespace=graph.default_namespace, namespace_abbreviation="ex", lang="en",
+            node_classes=bytes([1]), node_ids=("https://provo-example.org/job",), labels=("",),
+            descriptions=("",), relations=relations, start_times=start_times, end_times={})
+
+    dataset = "https://provo-example.org/dataset"
+    for invalid, error in (
+            # the source of "used" has to be an activity
+            (shard({"used": ((dataset,), (dataset,))}), InvalidProvClassForThisRelation),
+            (shard({"used": (("https://provo-example.org/unknown",), (dataset,))}), NodeNotFound),
+            (shard({}, {dataset: datetime(2023, 1, 1)}), InvalidProvClassForThisRelation)):
+        with pytest.raises(error):
+            graph.merge(invalid)
+        assert len(graph._id_vault) == 1
+        assert len(graph._activities) == 0
+        assert graph.count_relations() == 0
+
+
+def test_shards_of_worker_processes():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", thread_safe=True)
+    input = graph.add_entity(id="input", use_default_namespace=True)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        shards = list(executor.map(record_shard, range(4), repeat(input)))
+    graph.merge(*shards)
+
+    assert len(graph._activities) == 4
+    assert len(graph.used_by(graph.get_entity("input", use_default_namespace=True))) == 4
+    assert graph.get_activity("job_3", use_default_namespace=True).get_start_time() == datetime(2023, 1, 4)
+    assert graph.count_relations() == 8
+
+
+def test_shard_is_compact():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    activity = graph.add_activity()
+    for entity in graph.add_entities(labels=[f"entity {i}" for i in range(1000)]):
+        entity.was_generated_by(activity)
+    shard = graph.to_shard()
+
+    assert pickle.loads(pickle.dumps(shard)) == shard
+    # the ids of the relations are pickled as references to the node ids
+    assert len(pickle.dumps(shard)) < 2 * len(pickle.dumps(shard.node_ids + shard.labels))
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from provo.provontologygraph import ProvOntologyGraph
+
+
+def build(graph: ProvOntologyGraph) -> None:
+    """a pipeline of 50 steps, each step uses the previous output"""
+
+    operator = graph.add_agent(id="operator", label="Operator", use_default_namespace=True)
+    previous = graph.add_entity(id="input", label="Input", use_default_namespace=True)
+    for i in range(50):
+        step = graph.add_activity(id=f"step_{i}", label=f"Step {i}", use_default_namespace=True)
+        step.started_at_time(datetime(2023, 1, 1, 0, i))
+        step.used(previous)
+        step.was_associated_with(operator)
+        output = graph.add_entity(id=f"output_{i}", use_default_namespace=True)
+        output.was_generated_by(step)
+        output.was_derived_from(previous)
+        previous = output
+
+
+def test_nodes_are_evicted(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", max_resident_nodes=20,
+                              spill_file=str(tmp_path / "spill.sqlite"))
+    build(graph)
+    reference = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(reference)
+
+    assert len(graph._nodes) <= 20
+    assert len(graph._spill) + len(graph._nodes) == 102
+    assert graph.count_relations() == reference.count_relations() == 200
+
+    graph.serialize_as_rdf(str(tmp_path / "spilled.nt"), export_format="nt")
+    reference.serialize_as_rdf(str(tmp_path / "reference.nt"), export_format="nt")
+    assert isomorphic(Graph().parse(str(tmp_path / "spilled.nt")),
+                      Graph().parse(str(tmp_path / "reference.nt")))
+    assert str(graph).count("---") == str(reference).count("---")
+    assert len(graph._nodes) <= 20
+
+
+def test_nodes_are_faulted_in(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", max_resident_nodes=20)
+    build(graph)
+
+    step = graph.get_activity("step_0", use_default_namespace=True)
+    assert step.get_start_time() == datetime(2023, 1, 1, 0, 0)
+    assert [entity.node_id for entity in graph.generated(step)] == [
+        "https://provo-example.org/output_0"]
+    first_input = graph.get_entity("input", use_default_namespace=True)
+    assert len(graph.descendants(first_input, relations=["was_derived_from"])) == 50
+    last_output = graph.get_entity("output_49", use_default_namespace=True)
+    assert len(graph.ancestors(last_output)) == 101
+    assert len(graph.associated(graph.get_agent("operator", use_default_namespace=True))) == 50
+    assert len(graph._nodes) <= 20
+
+    # relations added to evicted nodes are merged with the stored ones
+    step.used(first_input)
+    step.used(graph.add_entity(label="Configuration"))
+    assert graph.count_relations() == 201
+    assert len(graph.get_activity("step_0", use_default_namespace=True)._used_entities) == 2
+
+
+def test_mermaid_over_spilled_nodes(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", max_resident_nodes=20)
+    build(graph)
+    reference = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(reference)
+
+    graph.export_as_mermaid_flowchart(str(tmp_path / "spilled.md"))
+    reference.export_as_mermaid_flowchart(str(tmp_path / "reference.md"))
+
+    with open(tmp_path / "spilled.md", encoding="utf-8") as spilled, \
+            open(tmp_path / "reference.md", encoding="utf-8") as expected:
+        assert sorted(spilled.read().splitlines()) == sorted(expected.read().splitlines())
+
+
+def test_recently_used_nodes_stay_in_memory(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", max_resident_nodes=20,
+                              spill_file=str(tmp_path / "spill.sqlite"))
+    operator = graph.add_agent(id="operator", use_default_namespace=True)
+    job = graph.add_activity(id="job", use_default_namespace=True)
+    for i in range(100):
+        graph.add_entity(id=f"entity_{i}", use_default_namespace=True)
+        # the least recently used nodes are evicted, not the first ones added
+        assert operator.node_id in graph._nodes
+        assert job.node_id in graph._nodes
+        graph.get_node(operator.node_id)
+        job.was_associated_with(graph.add_agent())
+
+    assert "https://provo-example.org/entity_0" not in graph._nodes
@@ -0,0 +1,112 @@
+from datetime import datetime
+
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from provo.idvault import IdAlreadyUsed
+from provo.provontologygraph import NodeNotFound, ProvOntologyGraph
+from provo.sqlitegraph import SQLiteProvOntologyGraph
+from provo.startingpointclasses import InvalidProvClassForThisRelation
+
+
+def build(graph) -> None:
+    """works for both graphs, as the handles provide the methods of the nodes"""
+
+    dataset = graph.add_entity(id="dataset", label="Dataset", use_default_namespace=True)
+    analysis = graph.add_activity(id="analysis", description="Analysis", use_default_namespace=True)
+    analysis.started_at_time(datetime(2023, 5, 1, 8, 0))
+    analysis.ended_at_time(datetime(2023, 5, 1, 9, 0))
+    analysis.used(dataset)
+    analyst = graph.add_agent(id="analyst", use_default_namespace=True)
+    report = graph.add_entity(id="report", use_default_namespace=True)
+    report.was_generated_by(analysis)
+    report.was_derived_from(dataset)
+    report.was_attributed_to(analyst)
+    graph.add_relations("was_associated_with", [analysis], [analyst])
+
+
+def test_sqlite_graph_persists_across_runs(tmp_path):
+    file_name = str(tmp_path / "provenance.sqlite")
+    with SQLiteProvOntologyGraph(file_name, namespace_abbreviation="ex") as graph:
+        build(graph)
+
+    reopened = SQLiteProvOntologyGraph(file_name)
+    assert reopened.namespace_abbreviation == "ex"
+    assert len(reopened) == 4
+    assert reopened.count_relations() == 5
+    analysis = reopened.get_activity("analysis", use_default_namespace=True)
+    assert analysis.get_start_time() == datetime(2023, 5, 1, 8, 0)
+    assert analysis.description == "Analysis"
+    # append to the graph of the previous run
+    review = reopened.add_activity(id="review", use_default_namespace=True)
+    review.used(reopened.get_entity("report", use_default_namespace=True))
+    reopened.close()
+
+    graph = SQLiteProvOntologyGraph(file_name)
+    assert len(graph) == 5
+    assert [node.node_id for node in graph.used_by(graph.get_entity("report", use_default_namespace=True))] == [
+        "https://provo-example.org/review"]
+    graph.close()
+
+
+def test_sqlite_graph_queries(tmp_path):
+    graph = SQLiteProvOntologyGraph(str(tmp_path / "provenance.sqlite"), namespace_abbreviation="ex")
+    build(graph)
+    dataset = graph.get_entity("dataset", use_default_namespace=True)
+    report = graph.get_entity("report", use_default_namespace=True)
+
+    assert graph.derived(dataset) == [report]
+    assert [node.node_id for node in graph.relation_targets(report, "was_generated_by")] == [
+        "https://provo-example.org/analysis"]
+    assert {node.node_id for node in graph.descendants(dataset)} == {
+        "https://provo-example.org/analysis", "https://provo-example.org/report"}
+    assert len(graph.ancestors(report)) == 3
+    assert graph.ancestors(report, max_depth=1, relations=["was_derived_from"]) == [dataset]
+
+    # relations are stored once
+    report.was_derived_from(dataset)
+    assert graph.count_relations() == 5
+    with pytest.raises(IdAlreadyUsed):
+        graph.add_entity(id="dataset", use_default_namespace=True)
+    with pytest.raises(IdAlreadyUsed):
+        graph.add_entities(ids=["first", "dataset"])
+    assert len(graph) == 4
+    with pytest.raises(NodeNotFound):
+        graph.get_agent("dataset", use_default_namespace=True)
+    with pytest.raises(InvalidProvClassForThisRelation):
+        graph.add_relations("used", [dataset], [report])
+    assert len(graph.add_activities(labels=["first", "second"])) == 2
+    assert graph.get_node(graph.add_agents(ids=["agent"])[0].node_id).label == ""
+
+
+def test_sqlite_graph_export(tmp_path):
+    graph = SQLiteProvOntologyGraph(str(tmp_path / "provenance.sqlite"), namespace_abbreviation="ex")
+    build(graph)
+    reference = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(reference)
+    reference_graph = reference.get_rdflib_graph()
+    sqlite_graph = graph.get_rdflib_graph()
+    assert isomorphic(sqlite_graph, reference_graph)
+
+    graph.serialize_as_rdf(str(tmp_path / "provenance.nt"), export_format="nt")
+    assert isomorphic(Graph().parse(str(tmp_path / "provenance.nt")), sqlite_graph)
+    converted = graph.to_prov_ontology_graph()
+    assert converted.count_relations() == 5
+    assert isomorphic(converted.get_rdflib_graph(), reference_graph)
+
+
+def test_sqlite_graph_summary_and_flowchart(tmp_path):
+    graph = SQLiteProvOntologyGraph(str(tmp_path / "provenance.sqlite"), namespace_abbreviation="ex")
+    build(graph)
+    reference = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(reference)
+
+    # both are streamed from the database, without an object based graph
+    assert str(graph) == str(reference)
+    for name, options in (("default", {}), ("aggregated", {"aggregation": "agent", "subgraphs": True})):
+        graph.export_as_mermaid_flowchart(str(tmp_path / f"{name}.md"), options)
+        reference.export_as_mermaid_flowchart(str(tmp_path / f"{name}_reference.md"), options)
+        with open(tmp_path / f"{name}.md", encoding="utf-8") as f, \
+                open(tmp_path / f"{name}_reference.md", encoding="utf-8") as reference_f:
+            assert f.read() == reference_f.read()
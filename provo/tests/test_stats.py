@@ -0,0 +1,88 @@
+import tracemalloc
+
+from provo.provontologygraph import ProvOntologyGraph
+
+
+def build(graph: ProvOntologyGraph) -> None:
+    """an activity that uses three entities and generates one"""
+
+    job = graph.add_activity(id="job")
+    operator = graph.add_agent(id="operator")
+    job.was_associated_with(operator)
+    inputs = [graph.add_entity(id=f"input_{i}") for i in range(3)]
+    for entity in inputs:
+        job.used(entity)
+    result = graph.add_entity(id="result")
+    result.was_generated_by(job)
+    result.was_derived_from(inputs[0])
+    # relations are counted once
+    result.was_derived_from(inputs[0])
+
+
+def test_stats_counters():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    build(graph)
+    stats = graph.stats()
+
+    assert stats.nodes == {"entity": 4, "activity": 1, "agent": 1}
+    assert stats.relations["used"] == 3
+    assert stats.relations["was_derived_from"] == 1
+    assert sum(stats.relations.values()) == graph.count_relations() == 6
+    # job: 4 outgoing relations, result: 2, the inputs and the operator: none
+    assert stats.out_degrees == {0: 4, 2: 1, 4: 1}
+    # input_0: 2 incoming relations, job, operator and the other inputs: 1, result: none
+    assert stats.in_degrees == {0: 1, 1: 4, 2: 1}
+    assert stats.ids == 6
+    assert stats.approximate_bytes > 6 * 100
+    assert stats.timings == {}
+
+    # the counters of a graph that is merged from shards are the same
+    shard_graph = ProvOntologyGraph.from_shards([graph.to_shard()], namespace_abbreviation="ex")
+    assert shard_graph.stats().in_degrees == stats.in_degrees
+
+
+def test_stats_timings(tmp_path):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", profile=True)
+    build(graph)
+    graph.serialize_as_rdf(str(tmp_path / "graph.ttl"))
+    graph.export_as_mermaid_flowchart(str(tmp_path / "graph.md"))
+    graph.get_rdflib_graph()
+
+    timings = graph.stats().timings
+    assert set(timings) == {"get_rdflib_graph", "serialize_as_rdf", "export_as_mermaid_flowchart"}
+    assert all(timing > 0 for timing in timings.values())
+
+
+def measure(entities: int, relations_per_entity: int) -> tuple[int, int]:
+    """returns the memory that tracemalloc measures for a graph and its estimate"""
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    activity = graph.add_activity(id="activity")
+    added = []
+    for i in range(entities):
+        entity = graph.add_entity(id=f"entity{i}", label="entity")
+        if relations_per_entity:
+            entity.was_generated_by(activity)
+        for origin in added[-(relations_per_entity - 1):] if relations_per_entity > 1 else ():
+            entity.was_derived_from(origin)
+        added.append(entity)
+    measured = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return measured, graph.stats().approximate_bytes
+
+
+def test_approximate_bytes():
+    """tests if the estimated memory has the order of magnitude of the memory
+    that tracemalloc measures (the exact numbers depend on the python version
+    and the allocator) and grows with the number of nodes and relations"""
+
+    estimates = []
+    for relations_per_entity in (0, 1, 3):
+        measured, estimated = measure(5000, relations_per_entity)
+        print(f"{relations_per_entity} relations per entity: {measured} bytes measured, {estimated} estimated")
+        assert measured / 10 < estimated < measured * 10
+        assert measure(2500, relations_per_entity)[1] < estimated
+        estimates.append(estimated)
+    assert estimates == sorted(estimates)
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from provo.provontologygraph import ProvOntologyGraph
+
+
+def build(entities: int) -> ProvOntologyGraph:
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    activity = graph.add_activity(id="job", label="Job")
+    for i in range(entities):
+        entity = graph.add_entity(id=f"entity_{i}", label=f"Entity {i}")
+        activity.used(entity)
+        entity.was_generated_by(activity)
+    return graph
+
+
+def test_summary_lines():
+    graph = build(3)
+    summary = StringIO()
+    graph.write_summary(summary)
+    assert summary.getvalue() == "\n".join(graph.iter_lines()) == str(graph)
+    assert "        used: ['Entity 0', 'Entity 1', 'Entity 2']" in graph.iter_lines()
+    assert str(graph.get_activity("job", use_default_namespace=True)).splitlines()[-2:] == [
+        "used: ['Entity 0', 'Entity 1', 'Entity 2']", "---"]
+
+
+def test_summary_is_truncated():
+    graph = build(50)
+    lines = list(graph.iter_lines(limit=10, max_items=2))
+    assert "        used: ['Entity 0', 'Entity 1', ... (48 more)]" in lines
+    assert "        ... (40 more entities)" in lines
+    assert sum(line.startswith("        id: ") for line in lines) == 11
+
+    # str() lists at most summary_limit nodes per class
+    graph.summary_limit = 5
+    assert str(graph).count("id: ") == 6
+    assert "        ... (45 more entities)" in str(graph).splitlines()
+
+
+def test_summary_multi_line_description():
+    graph = ProvOntologyGraph(namespace_abbreviation="ex")
+    graph.add_entity(id="report", label="Report", description="first line\nsecond line")
+    lines = str(graph).splitlines()
+    assert lines[lines.index("        description: first line") + 1] == "        second line"
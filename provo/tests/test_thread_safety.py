@@ -0,0 +1,85 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from provo.idvault import IdAlreadyUsed
+from provo.provontologygraph import ProvOntologyGraph
+
+
+@pytest.fixture
+def frequent_thread_switches():
+    """lets the interpreter switch threads as often as possible to provoke races"""
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_concurrent_recording(frequent_thread_switches):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", thread_safe=True)
+    activity = graph.add_activity(label="shared activity")
+    agent = graph.add_agent(label="shared agent")
+
+    def record(worker: int) -> None:
+        for i in range(200):
+            entity = graph.add_entity(label=f"entity {worker}-{i}")
+            activity.used(entity)
+            entity.was_generated_by(activity)
+            entity.was_attributed_to(agent)
+            # the same relation reported by several threads is only stored once
+            activity.was_associated_with(agent)
+        graph.add_entities(labels=[f"batch {worker}-{i}" for i in range(50)])
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(record, range(8)))
+
+    assert len(graph._entities) == 8 * 250
+    assert len(graph._id_vault) == 8 * 250 + 2
+    assert len({entity.node_id for entity in graph._entities}) == 8 * 250
+    assert len(activity._used_entities) == 8 * 200
+    assert graph.used_by(graph._entities[0]) == [activity]
+    assert len(graph.generated(activity)) == 8 * 200
+    assert len(graph.attributed(agent)) == 8 * 200
+    assert graph.associated(agent) == [activity]
+    assert graph.count_relations() == 3 * 8 * 200 + 1
+    assert len(graph.get_rdflib_graph()) == 8 * 250 * 2 + 8 * 200 * 3 + 1 + 2 * 2
+
+
+def test_concurrent_export(frequent_thread_switches):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", thread_safe=True)
+    activity = graph.add_activity()
+
+    def record() -> None:
+        for _ in range(1000):
+            activity.used(graph.add_entity())
+
+    def export() -> int:
+        return max(len(graph.get_rdflib_graph()) for _ in range(20))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        recorders = [executor.submit(record) for _ in range(2)]
+        exporters = [executor.submit(export) for _ in range(2)]
+        for future in recorders + exporters:
+            future.result()
+
+    assert len(graph.get_rdflib_graph()) == 2000 * 2 + 1
+    assert graph.count_relations() == 2000
+
+
+def test_concurrent_ids(frequent_thread_switches):
+    graph = ProvOntologyGraph(namespace_abbreviation="ex", thread_safe=True)
+
+    def add(_: int) -> bool:
+        try:
+            graph.add_entity(id="shared", use_default_namespace=True)
+        except IdAlreadyUsed:
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        added = list(executor.map(add, range(64)))
+
+    assert added.count(True) == 1
+    assert len(graph._entities) == 1
@@ -1,3 +1,5 @@
+import logging
+
 import pytest
 from provo.idvault import IdAlreadyUsed, IdMalformed, IdVault
 from validators import url
@@ -43,3 +45,49 @@ def test_id_validation():
         test_id = f"te{symbol}st"
         with pytest.raises(IdMalformed):
             vault._raise_exception_if_uri_invalid(namespace + test_id)
+
+def test_add_ids():
+    """tests if bulk added ids are registered and if the vault stays
+    unchanged when one of the ids is already used or malformed"""
+
+    vault = IdVault()
+    ids = [f"https://test.package/test{i}" for i in range(3)]
+    assert vault.add_ids(ids) == ids
+    assert list(vault.vault) == ids
+    for id in ids:
+        assert id in vault
+
+    with pytest.raises(IdAlreadyUsed):
+        vault.add_ids(["https://test.package/new", ids[0]])
+    with pytest.raises(IdAlreadyUsed):
+        vault.add_ids(["https://test.package/new", "https://test.package/new"])
+    with pytest.raises(IdMalformed):
+        vault.add_ids(["https://test.package/new", "https://test.package/ne w"])
+    assert "https://test.package/new" not in vault
+    assert len(vault) == 3
+
+
+def test_reserve():
+    """tests if reserved ids are unique, valid and registered"""
+
+    namespace = "https://test.package/"
+    vault = IdVault()
+    ids = vault.reserve(100, namespace=namespace)
+    assert len(set(ids)) == len(vault) == 100
+    for id in ids:
+        assert id.startswith(namespace)
+        assert url(id)  # type: ignore
+
+
+def test_id_logging(caplog):
+    """tests if registered ids are logged on debug level and nowhere else"""
+
+    vault = IdVault()
+    vault.add_id("https://test.package/silent")
+    assert not caplog.records
+
+    with caplog.at_level(logging.DEBUG, logger="provo.idvault"):
+        vault.add_id("https://test.package/test")
+        vault.generate("https://test.package/")
+    assert [record.generated for record in caplog.records] == [False, True]
+    assert caplog.records[0].node_id == "https://test.package/test"